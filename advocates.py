@@ -0,0 +1,254 @@
+# justice_agents/advocates.py
+import csv
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import NamedTuple
+
+from config import AgentProfile
+
+CSV_FILE = "advocates.csv"
+REGISTRY_DB_PATH = "./advocates.db"
+# System prompts kept in RAM; everything else stays on disk until asked for
+PROFILE_CACHE_SIZE = 256
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS advocates (
+  uid TEXT PRIMARY KEY,
+  name TEXT NOT NULL,
+  name_key TEXT NOT NULL,
+  definition TEXT NOT NULL DEFAULT '',
+  core_values TEXT NOT NULL DEFAULT '',
+  tone TEXT NOT NULL DEFAULT '',
+  system_prompt TEXT NOT NULL,
+  created_at REAL NOT NULL,
+  active INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_advocates_name ON advocates(name_key, created_at);
+CREATE INDEX IF NOT EXISTS idx_advocates_created ON advocates(created_at);
+CREATE INDEX IF NOT EXISTS idx_advocates_active ON advocates(created_at) WHERE active;
+CREATE TABLE IF NOT EXISTS registry_meta (
+  key TEXT PRIMARY KEY,
+  value TEXT NOT NULL
+);
+"""
+
+
+class AdvocateInfo(NamedTuple):
+    """Registry listing entry; the system prompt is loaded separately, on demand."""
+    uid: str
+    name: str
+    created_at: float
+    active: bool
+
+
+_INFO_COLUMNS = "uid, name, created_at, active"
+
+# --- ADVOCATE DATA HANDLING ---
+
+def build_system_prompt(answers: dict) -> str:
+    """Constructs a coherent system prompt from user answers."""
+    return f"""
+You are an advocate for the justice framework known as '{answers['name']}'.
+Your Core Philosophy: {answers['definition']}
+Your Core Values: Your guiding principles are {answers['values']}.
+Your Personality: You are {answers['tone']}. You engage in dialogue with this personality, consistently reflecting your core philosophy and values in your reasoning and communication style.
+Your Goal: To represent the '{answers['name']}' perspective clearly and persuasively in the Council of Justice.
+""".strip()
+
+
+class AdvocateRegistry:
+    """SQLite registry of user-created advocates, keyed by uid.
+
+    Lookups by uid, listings by creation time and name-prefix searches are
+    all index seeks, so they stay O(log n) however many advocates exist.
+    Listings return AdvocateInfo rows without the system prompt; profile()
+    loads a prompt only when an agent is actually built, through a small
+    LRU. Any number of advocates can be active (seated in the council) at
+    once. Rows from the legacy advocates.csv are imported on first open.
+    """
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, db_path=REGISTRY_DB_PATH, csv_path=CSV_FILE):
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(_SCHEMA)
+        self.conn.commit()
+        self.lock = threading.Lock()
+        self.profiles = OrderedDict()
+        if csv_path:
+            self._migrate_csv(csv_path)
+
+    @classmethod
+    def shared(cls, db_path=REGISTRY_DB_PATH) -> "AdvocateRegistry":
+        """Returns the process-wide registry for db_path, opening it on first use."""
+        key = os.path.abspath(db_path)
+        with cls._instances_lock:
+            registry = cls._instances.get(key)
+            if registry is None:
+                registry = cls._instances[key] = cls(db_path)
+            return registry
+
+    def _migrate_csv(self, csv_path: str):
+        """Imports advocates.csv once; the newest row becomes active, as it was the one loaded before."""
+        if not os.path.isfile(csv_path):
+            return
+        marker = f"migrated:{os.path.abspath(csv_path)}"
+        with self.lock:
+            if self.conn.execute("SELECT 1 FROM registry_meta WHERE key = ?", (marker,)).fetchone():
+                return
+            with open(csv_path, 'r', newline='', encoding='utf-8') as f:
+                rows = list(csv.DictReader(f))
+            # The CSV has no timestamps; file order is creation order
+            base = os.path.getmtime(csv_path) - len(rows)
+            with self.conn:
+                self.conn.executemany(
+                    """INSERT OR IGNORE INTO advocates
+                       (uid, name, name_key, definition, core_values, tone, system_prompt, created_at, active)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                    [
+                        (row['uid'], row['name'], row['name'].casefold(), row.get('definition', ''),
+                         row.get('values', ''), row.get('tone', ''), row['system_prompt'], base + i,
+                         int(i == len(rows) - 1))
+                        for i, row in enumerate(rows)
+                    ],
+                )
+                self.conn.execute("INSERT INTO registry_meta (key, value) VALUES (?, ?)", (marker, str(time.time())))
+        if rows:
+            print(f"✅ Imported {len(rows)} advocate(s) from {csv_path}")
+
+    def add(self, data: dict, active: bool = True) -> str:
+        """Saves a new advocate (the CreationForm answers plus system_prompt); returns its uid."""
+        uid = str(uuid.uuid4())
+        with self.lock, self.conn:
+            self.conn.execute(
+                """INSERT INTO advocates
+                   (uid, name, name_key, definition, core_values, tone, system_prompt, created_at, active)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (uid, data['name'], data['name'].casefold(), data['definition'], data['values'], data['tone'],
+                 data['system_prompt'], time.time(), int(active)),
+            )
+        return uid
+
+    def get(self, uid: str) -> AdvocateInfo | None:
+        with self.lock:
+            row = self.conn.execute(f"SELECT {_INFO_COLUMNS} FROM advocates WHERE uid = ?", (uid,)).fetchone()
+        return AdvocateInfo._make(row) if row else None
+
+    def profile(self, uid: str) -> AgentProfile | None:
+        """Loads the AgentProfile for uid, via the LRU of recently used profiles."""
+        with self.lock:
+            profile = self.profiles.get(uid)
+            if profile is None:
+                row = self.conn.execute("SELECT name, system_prompt FROM advocates WHERE uid = ?", (uid,)).fetchone()
+                if row is None:
+                    return None
+                profile = self.profiles[uid] = AgentProfile(name=row[0], system_prompt=row[1])
+                if len(self.profiles) > PROFILE_CACHE_SIZE:
+                    self.profiles.popitem(last=False)
+            self.profiles.move_to_end(uid)
+            return profile
+
+    def _infos(self, sql: str, params: tuple) -> list[AdvocateInfo]:
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return list(map(AdvocateInfo._make, rows))
+
+    def recent(self, limit: int = 50, before: float = None) -> list[AdvocateInfo]:
+        """Newest first; pass the last created_at seen as `before` for the next page."""
+        return self._infos(
+            f"""SELECT {_INFO_COLUMNS} FROM advocates WHERE created_at < ?
+                ORDER BY created_at DESC LIMIT ?""",
+            (before if before is not None else float("inf"), limit),
+        )
+
+    def search(self, prefix: str, limit: int = 50) -> list[AdvocateInfo]:
+        """Advocates whose name starts with prefix (case-insensitive), as a range seek on the name index."""
+        low = prefix.casefold()
+        return self._infos(
+            f"""SELECT {_INFO_COLUMNS} FROM advocates WHERE name_key >= ? AND name_key < ?
+                ORDER BY name_key, created_at LIMIT ?""",
+            (low, low + "\U0010ffff", limit),
+        )
+
+    def latest(self) -> AdvocateInfo | None:
+        found = self.recent(limit=1)
+        return found[0] if found else None
+
+    def active(self) -> list[AdvocateInfo]:
+        """The advocates seated in the council, oldest first."""
+        return self._infos(
+            f"SELECT {_INFO_COLUMNS} FROM advocates WHERE active ORDER BY created_at",
+            (),
+        )
+
+    def set_active(self, uid: str, active: bool = True):
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE advocates SET active = ? WHERE uid = ?", (int(active), uid))
+
+    def resolve(self, key: str) -> AdvocateInfo | None:
+        """Finds an advocate by uid, or else by exact name (the newest one of that name)."""
+        info = self.get(key)
+        if info is None:
+            # A seek to the newest entry of the name index, however many share the name
+            found = self._infos(
+                f"""SELECT {_INFO_COLUMNS} FROM advocates WHERE name_key = ?
+                    ORDER BY created_at DESC LIMIT 1""",
+                (key.casefold(),),
+            )
+            info = found[0] if found else None
+        return info
+
+    def count(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM advocates").fetchone()[0]
+
+    def iter_profiles(self, batch_size: int = 500):
+        """Yields (uid, profile) for every advocate, oldest first, a page at a time."""
+        # (created_at, uid) is the page key, so advocates sharing a timestamp across a page boundary are kept
+        after = (float("-inf"), "")
+        while True:
+            with self.lock:
+                rows = self.conn.execute(
+                    """SELECT uid, name, system_prompt, created_at FROM advocates
+                       WHERE (created_at, uid) > (?, ?) ORDER BY created_at, uid LIMIT ?""",
+                    (*after, batch_size),
+                ).fetchall()
+            if not rows:
+                return
+            for uid, name, system_prompt, created_at in rows:
+                yield uid, AgentProfile(name=name, system_prompt=system_prompt)
+            after = (rows[-1][3], rows[-1][0])
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def save_advocate(data: dict) -> str:
+    """Saves a new advocate to the registry, seated in the council; returns its uid."""
+    uid = AdvocateRegistry.shared().add(data)
+    print(f"✅ Saved your advocate under ID: {uid}\n")
+    return uid
+
+def load_latest_advocate() -> AgentProfile | None:
+    """Loads the most recently created advocate."""
+    registry = AdvocateRegistry.shared()
+    latest = registry.latest()
+    if latest is None:
+        return None
+    print(f"✅ Loaded most recent advocate: {latest.name}")
+    return registry.profile(latest.uid)
+
+def load_active_advocates() -> list[tuple[str, AgentProfile]]:
+    """Loads every advocate seated in the council as (uid, profile) pairs."""
+    registry = AdvocateRegistry.shared()
+    return [(info.uid, registry.profile(info.uid)) for info in registry.active()]
+
+def load_advocates() -> list[tuple[str, AgentProfile]]:
+    """Loads every saved advocate as (uid, profile) pairs."""
+    return list(AdvocateRegistry.shared().iter_profiles())
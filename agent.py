@@ -1,94 +1,189 @@
 # justice_agents/agent.py
-import os
-from config import AgentProfile, MODEL_NAME
-from memory import ChatMemory
+import time
 
-# Attempt to import and configure LLM clients
-try:
-    import google.generativeai as genai
-    GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY")
-    if GOOGLE_API_KEY:
-        genai.configure(api_key=GOOGLE_API_KEY)
-except (ImportError, Exception):
-    genai = None
-    GOOGLE_API_KEY = None
+from backends import LLMBackend, default_backend
+from cache import ResponseCache, cache_key
+from config import AgentProfile
+from context import ContextBuilder, estimate_tokens
+from memory import ChatMemory
+from metrics import TOKEN_BUCKETS, metrics
+from resilience import RateLimited
 
 
+class CallCancelled(Exception):
+    """Raised out of an agent call whose turn was cancelled; its reply is never stored."""
 
 
 class JusticeAgent:
-    def __init__(self, profile: AgentProfile, db_path="./justice_memory.db"):
+    def __init__(self, profile: AgentProfile, db_path="./justice_memory.db", cache: ResponseCache = None,
+                 backend: LLMBackend = None):
         self.profile = profile
-        self.memory = ChatMemory(db_path)
-        self.model_preference = "gemini"  # Default to Gemini
-
-    def _get_llm_client(self):
-        """Determines which LLM client to use based on availability."""
-        if genai and GOOGLE_API_KEY:
-            return genai.GenerativeModel(MODEL_NAME)
-        else:
-            return None
+        self.memory = ChatMemory.shared(db_path)
+        self.context_builder = ContextBuilder(self.memory)
+        self.cache = cache
+        # Gemini unless told otherwise; the backend owns and reuses the clients
+        self.backend = backend or default_backend()
 
     def _build_context(self, session_id: str) -> list[dict]:
-        """Builds a structured history for the LLM prompt."""
-        history = self.memory.get_recent(session_id)
-        
-        # Limit history to the last 12 turns
-        recent_history = history[-12:]
-        
-        # Format for Gemini/OpenAI API
-        formatted_history = []
-        for m in recent_history:
-            # Gemini uses 'user' and 'model', OpenAI uses 'user' and 'assistant'
-            role = 'assistant' if m['role'] == 'assistant' else 'user'
-            # Prepend agent name for clarity in the context
-            content = f"[{m['agent']}]: {m['content']}"
-            formatted_history.append({"role": role, "content": content})
-            
-        return formatted_history
-
-    def generate_response(self, session_id: str, initial_prompt: str = None, max_tokens: int = 100) -> str:
-        """Generates a response based on the conversation history."""
-        client = self._get_llm_client()
-        if not client:
-            return f"({self.profile.name} is silent as no LLM client is configured.)"
+        """Builds a structured history for the LLM prompt, within the token budget."""
+        return self.context_builder.build(session_id, self.profile.system_prompt)
 
+    def _prepare_history(self, session_id: str, initial_prompt: str = None) -> list[dict]:
+        """Builds the Gemini-formatted history for the next model call."""
         history = self._build_context(session_id)
-        
+
         # If there's an initial prompt (like the user's first message), add it
         if initial_prompt:
              history.append({"role": "user", "content": f"[User]: {initial_prompt}"})
 
-        try:
-            if client:
-                # Gemini uses 'parts' and a different role system
-                gemini_history = []
-                for turn in history:
-                    # Gemini uses 'user' for user turns and 'model' for its own turns
-                    role = 'user' if turn['role'] == 'user' else 'model'
-                    gemini_history.append({'role': role, 'parts': [turn['content']]})
-
-                model = genai.GenerativeModel(
-                    MODEL_NAME,
-                    system_instruction=self.profile.system_prompt
-                )
-                generation_config = genai.types.GenerationConfig(
-                    max_output_tokens=max_tokens
-                )
-                response = model.generate_content(
-                    gemini_history,
-                    generation_config=generation_config
-                )
-                reply = response.text.strip()
-            else:
-                 reply = f"({self.profile.name} has no configured LLM.)"
+        # Gemini uses 'parts' and a different role system
+        gemini_history = []
+        for turn in history:
+            # Gemini uses 'user' for user turns and 'model' for its own turns
+            role = 'user' if turn['role'] == 'user' else 'model'
+            gemini_history.append({'role': role, 'parts': [turn['content']]})
+        return gemini_history
+
+    def _cached_reply(self, gemini_history: list[dict], max_tokens: int):
+        """Returns (cache key, cached reply or None); both are None when caching is off."""
+        if not self.cache:
+            return None, None
+        key = cache_key(self.profile.system_prompt, gemini_history, {"max_output_tokens": max_tokens},
+                        self.backend.identity)
+        reply = self.cache.get(key)
+        metrics.inc("council_cache_total", agent=self.profile.name, result="miss" if reply is None else "hit")
+        return key, reply
+
+    def _observe_call(self, outcome: str, started: float, gemini_history=None, reply: str = None,
+                      first_token: float = None):
+        """Records one model call: outcome, latency, time to first token and token counts."""
+        name = self.profile.name
+        metrics.inc("council_calls_total", agent=name, outcome=outcome)
+        metrics.observe("council_latency_seconds", time.perf_counter() - started, agent=name)
+        if first_token is not None:
+            metrics.observe("council_ttft_seconds", first_token - started, agent=name)
+        if gemini_history is not None:
+            prompt = estimate_tokens(self.profile.system_prompt) + sum(
+                estimate_tokens(part) for turn in gemini_history for part in turn['parts']
+            )
+            metrics.observe("council_prompt_tokens", prompt, TOKEN_BUCKETS, agent=name)
+        if reply:
+            metrics.observe("council_output_tokens", estimate_tokens(reply), TOKEN_BUCKETS, agent=name)
 
+    def _reflection(self, error: Exception) -> str:
+        """The in-character stand-in shown when a call fails."""
+        return f"({self.profile.name} experiences a moment of reflection... Error: {error})"
+
+    def generate_response(self, session_id: str, initial_prompt: str = None, max_tokens: int = 100,
+                          history: list[dict] = None, record: bool = True, raise_errors: bool = False,
+                          cancelled=None) -> str:
+        """Generates a response based on the conversation history.
+
+        `history` replaces the prompt built from memory (e.g. a snapshot shared
+        by several agents), and `record=False` leaves storing the reply to the
+        caller. A failed call returns an in-character note that is never
+        stored, or raises when `raise_errors` is set. `cancelled()` is asked
+        before and after the model call; once it returns True the call raises
+        CallCancelled and its reply is dropped.
+        """
+        if not self.backend.available:
+            return f"({self.profile.name} is silent as no LLM client is configured.)"
+
+        started = time.perf_counter()
+        gemini_history = None
+        try:
+            gemini_history = history if history is not None else self._prepare_history(session_id, initial_prompt)
+            key, reply = self._cached_reply(gemini_history, max_tokens)
+            outcome = "cached" if reply is not None else "ok"
+            if reply is None:
+                if cancelled and cancelled():
+                    raise CallCancelled(self.profile.name)
+                reply = self.backend.generate(self.profile.system_prompt, gemini_history, max_tokens).strip()
+                # A blocking call cannot be interrupted, but a reply that lands too late is not kept
+                if cancelled and cancelled():
+                    raise CallCancelled(self.profile.name)
+                if self.cache:
+                    self.cache.put(key, reply)
+        except CallCancelled:
+            self._observe_call("cancelled", started, gemini_history)
+            raise
         except Exception as e:
-            reply = f"({self.profile.name} experiences a moment of reflection... Error: {e})"
+            self._observe_call("error", started, gemini_history)
+            if raise_errors:
+                raise
+            # Failures are shown, but never remembered as part of the debate
+            return self._reflection(e)
+        self._observe_call(outcome, started, gemini_history, reply)
 
         # Add the generated reply to memory
-        self.memory.add(session_id, self.profile.name, "assistant", reply)
+        if record:
+            self.memory.add(session_id, self.profile.name, "assistant", reply)
         return reply
 
+    def stream_response(self, session_id: str, initial_prompt: str = None, max_tokens: int = 100,
+                        cancelled=None):
+        """Yields the reply in chunks as the backend produces them.
+
+        The complete reply is written to memory once, after the stream ends.
+        A stream that fails is not written at all; one that never got past
+        the rate limiter raises RateLimited. `cancelled()` is asked
+        between chunks; once it returns True the backend stream is closed and
+        CallCancelled is raised in place of the rest of the reply.
+        """
+        if not self.backend.available:
+            yield f"({self.profile.name} is silent as no LLM client is configured.)"
+            return
+
+        chunks = []
+        started = time.perf_counter()
+        first_token = None
+        gemini_history = None
+        try:
+            gemini_history = self._prepare_history(session_id, initial_prompt)
+            key, cached = self._cached_reply(gemini_history, max_tokens)
+            outcome = "cached" if cached is not None else "ok"
+            if cached is not None:
+                chunks.append(cached)
+                first_token = time.perf_counter()
+                yield cached
+            else:
+                if cancelled and cancelled():
+                    raise CallCancelled(self.profile.name)
+                stream = self.backend.stream(self.profile.system_prompt, gemini_history, max_tokens)
+                try:
+                    for text in stream:
+                        # Closing the stream below stops the backend from producing the rest
+                        if cancelled and cancelled():
+                            raise CallCancelled(self.profile.name)
+                        if not text:
+                            continue
+                        # Leading whitespace is dropped to match the non-streaming reply
+                        if not chunks:
+                            text = text.lstrip()
+                            first_token = time.perf_counter()
+                        chunks.append(text)
+                        yield text
+                finally:
+                    stream.close()
+                if cancelled and cancelled():
+                    raise CallCancelled(self.profile.name)
+                if self.cache:
+                    self.cache.put(key, "".join(chunks).strip())
+        except CallCancelled:
+            self._observe_call("cancelled", started, gemini_history, first_token=first_token)
+            raise
+        except RateLimited:
+            # Callers such as the server report this as saturation, not as an in-character error
+            self._observe_call("rate_limited", started, gemini_history, first_token=first_token)
+            raise
+        except Exception as e:
+            self._observe_call("error", started, gemini_history, first_token=first_token)
+            yield self._reflection(e) if not chunks else f" {self._reflection(e)}"
+            return
+
+        reply = "".join(chunks).strip()
+        self._observe_call(outcome, started, gemini_history, reply, first_token)
+        self.memory.add(session_id, self.profile.name, "assistant", reply)
+
     def end_session(self, session_id: str):
         self.memory.delete_session(session_id)
\ No newline at end of file
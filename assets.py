@@ -0,0 +1,80 @@
+# justice_agents/assets.py
+import threading
+
+import pygame
+
+
+class AssetManager:
+    """Process-wide image cache.
+
+    Files are decoded once (optionally ahead of time on a background thread)
+    and every converted, scaled variant is kept by (path, size, alpha), so
+    views can be rebuilt or resized without touching the disk again. While
+    a preload is still running, get() can hand out a flat placeholder so the
+    first frame does not wait for the decode.
+    """
+    def __init__(self):
+        self._raw = {}
+        # Paths queued for the preloader and not decoded yet
+        self._pending = set()
+        self._surfaces = {}
+        self._lock = threading.Lock()
+        self._preloader = None
+
+    def _load_raw(self, path):
+        with self._lock:
+            image = self._raw.get(path)
+        if image is None:
+            image = pygame.image.load(path)
+            with self._lock:
+                image = self._raw.setdefault(path, image)
+        return image
+
+    def preload(self, paths):
+        """Decodes image files on a background thread so the first frame doesn't wait on disk."""
+        paths = list(paths)
+        with self._lock:
+            self._pending.update(path for path in paths if path not in self._raw)
+
+        def run():
+            for path in paths:
+                try:
+                    self._load_raw(path)
+                except (pygame.error, FileNotFoundError):
+                    # get() will raise on the main thread where it can be reported
+                    pass
+                with self._lock:
+                    self._pending.discard(path)
+        self._preloader = threading.Thread(target=run, name="asset-preload", daemon=True)
+        self._preloader.start()
+
+    def ready(self, paths) -> bool:
+        """True unless one of the paths is still waiting for the preloader."""
+        with self._lock:
+            return not self._pending.intersection(paths)
+
+    def get(self, path, size=None, alpha=False, placeholder=None):
+        """Returns the display-ready surface for path, scaled to size if given.
+
+        With a `placeholder` colour, a file that is not decoded yet is not
+        waited for; a flat surface of that colour (and size) comes back
+        instead, and is not cached. Must be called after the display mode is
+        set, since conversion to the display format happens here.
+        """
+        size = tuple(int(v) for v in size) if size else None
+        key = (path, size, alpha)
+        surface = self._surfaces.get(key)
+        if surface is None and placeholder is not None and not self.ready([path]):
+            surface = pygame.Surface(size or (1, 1), pygame.SRCALPHA if alpha else 0)
+            surface.fill(placeholder)
+            return surface
+        if surface is None:
+            image = self._load_raw(path)
+            surface = image.convert_alpha() if alpha else image.convert()
+            if size:
+                surface = pygame.transform.scale(surface, size)
+            self._surfaces[key] = surface
+        return surface
+
+
+assets = AssetManager()
@@ -0,0 +1,478 @@
+# justice_agents/backends.py
+"""LLM backends used by JusticeAgent.
+
+Every backend takes the same inputs: the agent's system prompt, the
+Gemini-formatted history ({'role': 'user'|'model', 'parts': [...]}) and
+max_tokens. GeminiBackend talks to the real API, FakeBackend produces
+deterministic offline replies with simulated latency, and CassetteBackend
+records another backend's replies to a JSONL file or replays them.
+ResilientBackend wraps any of them with rate limiting, retries and a
+circuit breaker.
+"""
+import hashlib
+import importlib.util
+import json
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from cache import cache_key
+from config import MODEL_NAME, RATE_LIMIT_BURST, RATE_LIMIT_MAX_WAIT, RETRY_ATTEMPTS
+from resilience import (CircuitBreaker, CircuitOpen, RateLimited, backoff_delay, is_throttle, is_transient,
+                        rate_limiter)
+
+GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY")
+
+# google.generativeai takes about a second to import, so it is loaded and
+# configured on first use (or by a warm-up thread), never at import time
+_genai = None
+_genai_lock = threading.Lock()
+
+
+def load_genai():
+    """Imports and configures google.generativeai once; returns None if it is unusable."""
+    global _genai
+    with _genai_lock:
+        if _genai is None:
+            try:
+                import google.generativeai as genai
+                if GOOGLE_API_KEY:
+                    genai.configure(api_key=GOOGLE_API_KEY)
+                _genai = genai
+            except Exception:
+                _genai = False
+        return _genai or None
+
+
+def genai_installed() -> bool:
+    """True if google.generativeai can be imported, without importing it."""
+    try:
+        return importlib.util.find_spec("google.generativeai") is not None
+    except ImportError:
+        return False
+
+BACKENDS = ("gemini", "fake", "record", "replay")
+DEFAULT_CASSETTE = "./council_cassette.jsonl"
+# (system prompt, max_tokens) pairs whose Gemini clients are kept for reuse
+GEMINI_CLIENT_CACHE_SIZE = 64
+
+
+class LLMBackend:
+    """Interface every backend implements."""
+    name = "base"
+
+    @property
+    def available(self) -> bool:
+        return True
+
+    @property
+    def identity(self) -> str:
+        """Names whatever decides the reply text; part of every response-cache key."""
+        return self.name
+
+    def generate(self, system_prompt: str, history: list[dict], max_tokens: int) -> str:
+        raise NotImplementedError
+
+    def stream(self, system_prompt: str, history: list[dict], max_tokens: int):
+        """Yields the reply in chunks; backends without streaming yield it whole."""
+        yield self.generate(system_prompt, history, max_tokens)
+
+    def warm_up(self, system_prompts, max_tokens: int):
+        """Does any slow one-off setup ahead of the first call; a no-op by default."""
+
+
+def start_warm_up(backend: LLMBackend, system_prompts, max_tokens: int) -> threading.Thread:
+    """Runs backend.warm_up on a daemon thread so startup never waits for it."""
+    thread = threading.Thread(target=backend.warm_up, args=(list(system_prompts), max_tokens),
+                              name="backend-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+class GeminiBackend(LLMBackend):
+    """Google Gemini via google.generativeai.
+
+    Models and generation configs are built once per (system prompt,
+    max_tokens) and reused, so agents that keep their profile never pay for
+    client setup on the hot path. The least recently used clients are
+    dropped past GEMINI_CLIENT_CACHE_SIZE.
+    """
+    name = "gemini"
+
+    def __init__(self, model_name: str = MODEL_NAME, client_cache_size: int = GEMINI_CLIENT_CACHE_SIZE):
+        self.model_name = model_name
+        self.client_cache_size = client_cache_size
+        self._clients = OrderedDict()
+        self._clients_lock = threading.Lock()
+        self._installed = None
+
+    @property
+    def identity(self) -> str:
+        return self.model_name
+
+    @property
+    def available(self) -> bool:
+        if not GOOGLE_API_KEY:
+            return False
+        if self._installed is None:
+            self._installed = genai_installed()
+        return self._installed
+
+    @property
+    def rate_key(self) -> str:
+        """Identifies the API key for rate limiting without keeping the key itself."""
+        return hashlib.sha256((GOOGLE_API_KEY or "").encode("utf-8")).hexdigest()[:12]
+
+    def _client(self, system_prompt: str, max_tokens: int):
+        key = (system_prompt, max_tokens)
+        with self._clients_lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._clients.move_to_end(key)
+                return client
+        genai = load_genai()
+        model = genai.GenerativeModel(
+            self.model_name,
+            system_instruction=system_prompt
+        )
+        generation_config = genai.types.GenerationConfig(
+            max_output_tokens=max_tokens
+        )
+        client = (model, generation_config)
+        with self._clients_lock:
+            self._clients[key] = client
+            while len(self._clients) > self.client_cache_size:
+                self._clients.popitem(last=False)
+        return client
+
+    def warm_up(self, system_prompts, max_tokens):
+        if not self.available or load_genai() is None:
+            return
+        for system_prompt in system_prompts:
+            self._client(system_prompt, max_tokens)
+
+    def generate(self, system_prompt, history, max_tokens):
+        model, generation_config = self._client(system_prompt, max_tokens)
+        response = model.generate_content(history, generation_config=generation_config)
+        return response.text.strip()
+
+    def stream(self, system_prompt, history, max_tokens):
+        model, generation_config = self._client(system_prompt, max_tokens)
+        response = model.generate_content(history, generation_config=generation_config, stream=True)
+        for part in response:
+            if part.text:
+                yield part.text
+
+
+_FAKE_WORDS = (
+    "justice fairness outcome harm community merit welfare duty evidence "
+    "consequence trust repair balance principle society burden benefit "
+    "responsibility dignity equity choice cost value risk reason"
+).split()
+
+
+class FakeBackend(LLMBackend):
+    """Offline stand-in with deterministic replies and simulated timing.
+
+    The reply depends only on the seed and the inputs, never on call order,
+    so concurrent runs are reproducible. Time to first token is drawn from a
+    normal distribution around `latency`, and tokens then arrive at about
+    `tokens_per_second`.
+    """
+    name = "fake"
+
+    def __init__(self, latency: float = 0.6, latency_jitter: float = 0.2,
+                 tokens_per_second: float = 50.0, tokens_jitter: float = 10.0,
+                 seed: int = 0, chunk_tokens: int = 4):
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.tokens_per_second = tokens_per_second
+        self.tokens_jitter = tokens_jitter
+        self.seed = seed
+        self.chunk_tokens = chunk_tokens
+
+    @property
+    def identity(self) -> str:
+        # Timing settings never change the words, only the seed does
+        return f"fake:{self.seed}"
+
+    def _rng(self, system_prompt, history, max_tokens) -> random.Random:
+        digest = hashlib.sha256(
+            json.dumps([self.seed, system_prompt, history, max_tokens], sort_keys=True).encode("utf-8")
+        ).digest()
+        return random.Random(int.from_bytes(digest[:8], "big"))
+
+    def _plan(self, system_prompt, history, max_tokens):
+        """Returns (first-token delay, per-token delay, words) for a call."""
+        rng = self._rng(system_prompt, history, max_tokens)
+        first_token = max(0.0, rng.gauss(self.latency, self.latency_jitter))
+        rate = max(1.0, rng.gauss(self.tokens_per_second, self.tokens_jitter))
+        count = rng.randint(max(1, max_tokens // 3), max(1, max_tokens))
+        words = [rng.choice(_FAKE_WORDS) for _ in range(count)]
+        words[0] = words[0].capitalize()
+        return first_token, 1.0 / rate, words
+
+    def generate(self, system_prompt, history, max_tokens):
+        first_token, per_token, words = self._plan(system_prompt, history, max_tokens)
+        time.sleep(first_token + per_token * len(words))
+        return " ".join(words) + "."
+
+    def stream(self, system_prompt, history, max_tokens):
+        first_token, per_token, words = self._plan(system_prompt, history, max_tokens)
+        time.sleep(first_token)
+        for i in range(0, len(words), self.chunk_tokens):
+            chunk = words[i:i + self.chunk_tokens]
+            time.sleep(per_token * len(chunk))
+            text = " ".join(chunk)
+            yield (text if i == 0 else " " + text) + ("." if i + self.chunk_tokens >= len(words) else "")
+
+
+class CassetteMiss(KeyError):
+    """Raised in replay mode when a prompt was never recorded."""
+
+
+class CassetteBackend(LLMBackend):
+    """Records another backend's replies to JSONL, or replays them offline.
+
+    In replay mode `realtime=True` reproduces the recorded chunk timings, so
+    production transcripts can be replayed to spot latency regressions in
+    the rest of the pipeline.
+    """
+    name = "cassette"
+
+    def __init__(self, path: str = DEFAULT_CASSETTE, mode: str = "replay",
+                 inner: LLMBackend = None, realtime: bool = False):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode!r}")
+        if mode == "record" and inner is None:
+            raise ValueError("Recording needs an inner backend.")
+        self.path = path
+        self.mode = mode
+        self.inner = inner
+        self.realtime = realtime
+        self.lock = threading.Lock()
+        self.entries = {}
+        if os.path.isfile(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.entries[entry["key"]] = entry
+
+    @property
+    def available(self) -> bool:
+        return self.mode == "replay" or self.inner.available
+
+    @property
+    def identity(self) -> str:
+        # Recording passes the inner backend's replies through; replays are whatever the file holds
+        return self.inner.identity if self.mode == "record" else f"cassette:{os.path.abspath(self.path)}"
+
+    def warm_up(self, system_prompts, max_tokens):
+        if self.inner is not None:
+            self.inner.warm_up(system_prompts, max_tokens)
+
+    @staticmethod
+    def _key(system_prompt, history, max_tokens) -> str:
+        return cache_key(system_prompt, history, {"max_output_tokens": max_tokens})
+
+    def _record(self, key, system_prompt, history, max_tokens, chunks):
+        entry = {
+            "key": key,
+            "system_prompt": system_prompt,
+            "history": history,
+            "max_tokens": max_tokens,
+            "chunks": chunks,
+        }
+        with self.lock:
+            self.entries[key] = entry
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def _replay(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            raise CassetteMiss(key)
+        return entry["chunks"]
+
+    def stream(self, system_prompt, history, max_tokens):
+        key = self._key(system_prompt, history, max_tokens)
+        if self.mode == "replay":
+            elapsed = 0.0
+            for offset, text in self._replay(key):
+                if self.realtime and offset > elapsed:
+                    time.sleep(offset - elapsed)
+                    elapsed = offset
+                yield text
+            return
+
+        chunks = []
+        start = time.perf_counter()
+        for text in self.inner.stream(system_prompt, history, max_tokens):
+            chunks.append([round(time.perf_counter() - start, 4), text])
+            yield text
+        self._record(key, system_prompt, history, max_tokens, chunks)
+
+    def generate(self, system_prompt, history, max_tokens):
+        return "".join(self.stream(system_prompt, history, max_tokens)).strip()
+
+
+class ResilientBackend(LLMBackend):
+    """Wraps a backend with rate limiting, retries and a circuit breaker.
+
+    Every call takes a token from the bucket shared by all callers of the
+    same API key and model, and raises RateLimited if none arrives within
+    `max_wait` seconds. Transient errors are retried with jittered
+    exponential backoff; quota errors also slow the bucket down. Once the
+    breaker opens, calls fail at once with CircuitOpen instead of queueing
+    behind a dead service.
+
+    With `hedge_after` set, a generate() call still running after that many
+    seconds gets a duplicate request, if the bucket has a token to spare,
+    and whichever copy answers first wins. Streams are retried only until
+    their first chunk arrives, and are never hedged.
+    """
+    name = "resilient"
+
+    def __init__(self, inner: LLMBackend, attempts: int = RETRY_ATTEMPTS, hedge_after: float = None,
+                 breaker: CircuitBreaker = None, limiter=None, max_wait: float = RATE_LIMIT_MAX_WAIT):
+        self.inner = inner
+        self.attempts = max(1, attempts)
+        self.max_wait = max_wait
+        self.hedge_after = hedge_after
+        self.breaker = breaker or CircuitBreaker()
+        self.limiter = limiter or rate_limiter(
+            getattr(inner, "rate_key", inner.name), getattr(inner, "model_name", inner.name)
+        )
+        self._hedges = None
+
+    @property
+    def available(self) -> bool:
+        return self.inner.available
+
+    @property
+    def identity(self) -> str:
+        return self.inner.identity
+
+    def warm_up(self, system_prompts, max_tokens):
+        self.inner.warm_up(system_prompts, max_tokens)
+
+    def _admit(self):
+        if not self.breaker.allow():
+            raise CircuitOpen(f"{self.inner.name} is failing; not calling it for now.")
+        if not self.limiter.acquire(self.max_wait):
+            raise RateLimited(f"No {self.inner.name} request allowed within {self.max_wait:g}s.")
+
+    def _succeeded(self):
+        self.breaker.success()
+        self.limiter.recover()
+
+    def _retry(self, error: Exception, attempt: int) -> bool:
+        """Records a failed attempt; backs off and returns True if it is worth another."""
+        if not is_transient(error):
+            # The service answered, so this says nothing about its health
+            self.breaker.success()
+            return False
+        self.breaker.failure()
+        if is_throttle(error):
+            self.limiter.throttle()
+        if attempt + 1 >= self.attempts:
+            return False
+        time.sleep(backoff_delay(attempt))
+        return True
+
+    def _hedged(self, system_prompt, history, max_tokens) -> str:
+        if self.hedge_after is None:
+            return self.inner.generate(system_prompt, history, max_tokens)
+        if self._hedges is None:
+            self._hedges = ThreadPoolExecutor(thread_name_prefix="hedge")
+        calls = {self._hedges.submit(self.inner.generate, system_prompt, history, max_tokens)}
+        done, pending = wait(calls, timeout=self.hedge_after)
+        if not done and self.limiter.try_acquire():
+            pending.add(self._hedges.submit(self.inner.generate, system_prompt, history, max_tokens))
+        # The first copy to succeed wins; the other is left to finish and is ignored
+        error = None
+        while pending or done:
+            for call in done:
+                if call.exception() is None:
+                    return call.result()
+                error = call.exception()
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        raise error
+
+    def generate(self, system_prompt, history, max_tokens):
+        for attempt in range(self.attempts):
+            self._admit()
+            try:
+                reply = self._hedged(system_prompt, history, max_tokens)
+            except Exception as e:
+                if self._retry(e, attempt):
+                    continue
+                raise
+            self._succeeded()
+            return reply
+
+    def stream(self, system_prompt, history, max_tokens):
+        for attempt in range(self.attempts):
+            self._admit()
+            started = False
+            try:
+                for text in self.inner.stream(system_prompt, history, max_tokens):
+                    started = True
+                    yield text
+            except Exception as e:
+                # Chunks already shown cannot be taken back, so only a silent failure is retried
+                if not started and self._retry(e, attempt):
+                    continue
+                # As in _retry, only errors that say something about the service's health count
+                if started:
+                    if is_transient(e):
+                        self.breaker.failure()
+                    else:
+                        self.breaker.success()
+                raise
+            self._succeeded()
+            return
+
+
+_gemini_backend = None
+_default_backend = None
+
+
+def default_backend() -> LLMBackend:
+    """Returns the process-wide resilient Gemini backend shared by agents built without one."""
+    global _default_backend, _gemini_backend
+    if _default_backend is None:
+        _gemini_backend = GeminiBackend()
+        _default_backend = ResilientBackend(_gemini_backend)
+    return _default_backend
+
+
+def make_backend(name: str = "gemini", cassette: str = DEFAULT_CASSETTE, hedge_after: float = None,
+                 rate_limit: float = None, rate_burst: int = RATE_LIMIT_BURST, **options) -> LLMBackend:
+    """Builds a backend from its command-line name (see BACKENDS).
+
+    Gemini calls always go through ResilientBackend; `hedge_after` turns on
+    hedged requests for them, and `rate_limit` (requests per second, with
+    `rate_burst` on top) sets the quota of their shared bucket.
+    """
+    if name in ("gemini", "record"):
+        gemini = default_backend()
+        if rate_limit is not None:
+            gemini.limiter.configure(rate_limit, rate_burst)
+        if hedge_after is not None:
+            # Same clients, rate limit and circuit breaker as the default, plus hedging
+            gemini = ResilientBackend(_gemini_backend, hedge_after=hedge_after, breaker=gemini.breaker)
+        if name == "gemini":
+            return gemini
+        return CassetteBackend(cassette, mode="record", inner=gemini)
+    if name == "fake":
+        return FakeBackend(**options)
+    if name == "replay":
+        return CassetteBackend(cassette, mode="replay", **options)
+    raise ValueError(f"Unknown backend: {name!r}")
@@ -0,0 +1,214 @@
+# justice_agents/batch.py
+"""Headless council runs over a file of scenarios.
+
+    python batch.py scenarios.jsonl --out results.jsonl --agents utilitarian,rawl --workers 8
+
+Scenarios are JSONL objects or CSV rows with a `prompt` field and an optional
+`id`. Each (scenario, agent) pair becomes one job on a bounded worker pool,
+and every reply is appended to the output as soon as it lands. Re-running
+with --resume skips the pairs already answered in the output file; calls
+that failed are written with an `error` field and tried again.
+"""
+import argparse
+import csv
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+
+from advocates import AdvocateRegistry
+from agent import JusticeAgent
+from backends import BACKENDS, DEFAULT_CASSETTE, make_backend
+from cache import CACHE_MODES, ResponseCache
+from config import AGENTS, RATE_LIMIT_BURST, RATE_LIMIT_PER_SECOND
+from memory import ChatMemory
+from metrics import metrics
+
+BATCH_DB_PATH = "./batch_memory.db"
+
+
+def read_scenarios(path: str):
+    """Yields (scenario_id, prompt) pairs from a .jsonl or .csv file."""
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.endswith(".csv"):
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for index, row in enumerate(rows):
+            yield str(row.get("id") or index), row["prompt"]
+
+
+def select_profiles(agent_keys: str, advocates: str) -> dict:
+    """Resolves the profiles to run, keyed by profile key or `custom:<uid>`."""
+    keys = list(AGENTS) if agent_keys == "all" else [k for k in agent_keys.split(",") if k]
+    unknown = [k for k in keys if k not in AGENTS]
+    if unknown:
+        raise SystemExit(f"Unknown agent(s): {', '.join(unknown)}. Choose from: {', '.join(AGENTS)}")
+    profiles = {key: AGENTS[key] for key in keys}
+
+    registry = AdvocateRegistry.shared()
+    if advocates == "all":
+        saved = registry.iter_profiles()
+    else:
+        if advocates == "latest":
+            found = [registry.latest()]
+        elif advocates == "active":
+            found = registry.active()
+        else:
+            wanted = [key for key in advocates.split(",") if key]
+            found = [registry.resolve(key) for key in wanted]
+            missing = [key for key, info in zip(wanted, found) if info is None]
+            if missing:
+                raise SystemExit(f"Unknown advocate(s): {', '.join(missing)}")
+        saved = [(info.uid, registry.profile(info.uid)) for info in found if info]
+    for uid, profile in saved:
+        profiles[f"custom:{uid}"] = profile
+    return profiles
+
+
+def select_agents(agent_keys: str, advocates: str, db_path: str, cache=None, backend=None) -> dict:
+    """Builds the agents to run, keyed by profile key or `custom:<uid>`."""
+    return {key: JusticeAgent(profile, db_path=db_path, cache=cache, backend=backend)
+            for key, profile in select_profiles(agent_keys, advocates).items()}
+
+
+def completed_jobs(out_path: str) -> set:
+    """Returns the (scenario_id, agent) pairs already answered in out_path; failed ones are redone."""
+    done = set()
+    if not os.path.isfile(out_path):
+        return done
+    with open(out_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A torn final line from an interrupted run is simply redone
+                continue
+            if not record.get("error"):
+                done.add((record["scenario_id"], record["agent"]))
+    return done
+
+
+def drop_torn_tail(out_path: str):
+    """Cuts a partly written last line off out_path, so appended records start on a line of their own."""
+    if not os.path.isfile(out_path):
+        return
+    with open(out_path, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        # Only the tail is read, a block at a time, so huge outputs stay cheap to resume
+        while end > 0:
+            start = max(0, end - 4096)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b"\n")
+            if newline >= 0:
+                f.truncate(start + newline + 1)
+                return
+            end = start
+        f.truncate(0)
+
+
+def run_job(agent: JusticeAgent, agent_key: str, scenario_id: str, prompt: str, max_tokens: int,
+            keep_session: bool = False) -> dict:
+    # Each agent gets its own session so replies are independent of each other
+    session_id = f"batch:{scenario_id}:{agent_key}"
+    agent.end_session(session_id)
+    agent.memory.add(session_id, "User", "user", prompt)
+    start = time.perf_counter()
+    error = None
+    try:
+        reply = agent.generate_response(session_id, max_tokens=max_tokens, raise_errors=True)
+    except Exception as e:
+        # Recorded as a failure, not as a reply, so --resume tries it again
+        reply, error = None, f"{type(e).__name__}: {e}"
+    latency = time.perf_counter() - start
+    if not keep_session:
+        agent.end_session(session_id)
+    record = {
+        "scenario_id": scenario_id,
+        "agent": agent_key,
+        "agent_name": agent.profile.name,
+        "prompt": prompt,
+        "reply": reply,
+        "latency_s": round(latency, 4),
+    }
+    if error:
+        record["error"] = error
+    return record
+
+
+def iter_jobs(scenarios, agents: dict, skip: set):
+    for scenario_id, prompt in scenarios:
+        for key, agent in agents.items():
+            if (scenario_id, key) not in skip:
+                yield agent, key, scenario_id, prompt
+
+
+def run_batch(scenarios, agents: dict, out_path: str, workers: int = 8,
+              max_tokens: int = 100, resume: bool = False, keep_sessions: bool = False) -> int:
+    """Runs every job and streams results to out_path; returns the number written."""
+    skip = completed_jobs(out_path) if resume else set()
+    if resume:
+        drop_torn_tail(out_path)
+    jobs = iter_jobs(scenarios, agents, skip)
+    write_lock = threading.Lock()
+    written = 0
+
+    with open(out_path, "a" if resume else "w", encoding='utf-8') as out, \
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as pool:
+        def submit(batch):
+            return {pool.submit(run_job, *job, max_tokens, keep_sessions) for job in batch}
+
+        # Keep a bounded window of jobs in flight so huge inputs are never fully queued
+        pending = submit(islice(jobs, workers * 2))
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                record = future.result()
+                with write_lock:
+                    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    out.flush()
+                written += 1
+            pending |= submit(islice(jobs, len(done)))
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run scenario files through the Justice Council without the GUI.")
+    parser.add_argument("scenarios", help="Path to a .jsonl or .csv file of scenarios.")
+    parser.add_argument("--out", default="results.jsonl", help="Output JSONL path.")
+    parser.add_argument("--agents", default="all", help="Comma-separated profile keys from config.AGENTS, or 'all'.")
+    parser.add_argument("--advocates", default="", help="Custom advocates to include: 'all', 'latest', 'active' or comma-separated uids or names.")
+    parser.add_argument("--workers", type=int, default=8, help="Maximum number of concurrent agent calls.")
+    parser.add_argument("--max_tokens", type=int, default=100, help="Maximum number of tokens for agent responses.")
+    parser.add_argument("--resume", action="store_true", help="Skip jobs already present in the output file.")
+    parser.add_argument("--cache", choices=CACHE_MODES, default="off", help="Response cache mode.")
+    parser.add_argument("--backend", choices=BACKENDS, default="gemini", help="LLM backend.")
+    parser.add_argument("--cassette", default=DEFAULT_CASSETTE, help="Cassette file for the record and replay backends.")
+    parser.add_argument("--hedge_after", type=float, default=None, help="Seconds before a slow Gemini call gets a hedged duplicate request (off by default).")
+    parser.add_argument("--rate_limit", type=float, default=RATE_LIMIT_PER_SECOND, help="Gemini requests per second allowed for this API key; throttled calls recover up to this rate.")
+    parser.add_argument("--rate_burst", type=int, default=RATE_LIMIT_BURST, help="Gemini requests allowed at once on top of --rate_limit.")
+    parser.add_argument("--db", default=BATCH_DB_PATH, help="Memory database used for batch sessions.")
+    parser.add_argument("--keep_sessions", action="store_true", help="Keep each job's session in --db instead of deleting it once the reply is written.")
+    parser.add_argument("--metrics_out", help="Write call and SQLite metrics here when done (.prom for Prometheus text, JSON otherwise).")
+    args = parser.parse_args()
+
+    cache = ResponseCache(mode=args.cache) if args.cache != "off" else None
+    backend = make_backend(args.backend, args.cassette, hedge_after=args.hedge_after,
+                           rate_limit=args.rate_limit, rate_burst=args.rate_burst)
+    # Jobs are independent cases, so none may recall another's turns; opened before the agents share it
+    ChatMemory.shared(args.db, recall=False)
+    agents = select_agents(args.agents, args.advocates, args.db, cache, backend)
+    start = time.perf_counter()
+    written = run_batch(read_scenarios(args.scenarios), agents, args.out,
+                        workers=args.workers, max_tokens=args.max_tokens, resume=args.resume,
+                        keep_sessions=args.keep_sessions)
+    elapsed = time.perf_counter() - start
+    print(f"Wrote {written} replies to {args.out} in {elapsed:.1f}s.")
+    if args.metrics_out:
+        metrics.export(args.metrics_out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+# justice_agents/benchmarks/bench_client_reuse.py
+"""Per-call client setup overhead: rebuilding GenerativeModel vs. reusing it.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_client_reuse
+
+No request is sent; only the client construction on the hot path is timed.
+"""
+import os
+import timeit
+
+# Model construction never touches the network, but backends.py only
+# enables Gemini when a key is present.
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-placeholder")
+
+from backends import GeminiBackend, load_genai  # noqa: E402
+from config import AGENTS, MODEL_NAME  # noqa: E402
+
+genai = load_genai()
+
+
+def per_call_rebuild(system_prompt, max_tokens):
+    """The pre-caching hot path: one throwaway model, then the real one."""
+    genai.GenerativeModel(MODEL_NAME)
+    model = genai.GenerativeModel(MODEL_NAME, system_instruction=system_prompt)
+    config = genai.types.GenerationConfig(max_output_tokens=max_tokens)
+    return model, config
+
+
+def run(number: int = 2000) -> dict:
+    backend = GeminiBackend()
+    system_prompt = AGENTS["utilitarian"].system_prompt
+    before = timeit.timeit(lambda: per_call_rebuild(system_prompt, 100), number=number) / number
+    backend._client(system_prompt, 100)
+    after = timeit.timeit(lambda: backend._client(system_prompt, 100), number=number) / number
+    return {"rebuild_us": before * 1e6, "reuse_us": after * 1e6}
+
+
+if __name__ == "__main__":
+    if genai is None:
+        raise SystemExit("google-generativeai is not installed.")
+    result = run()
+    print(f"rebuild per call: {result['rebuild_us']:9.2f} us")
+    print(f"reused client:    {result['reuse_us']:9.2f} us")
+    print(f"speed-up:         {result['rebuild_us'] / result['reuse_us']:9.1f}x")
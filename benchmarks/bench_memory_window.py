@@ -0,0 +1,46 @@
+# justice_agents/benchmarks/bench_memory_window.py
+"""Context-window reads on long sessions: full fetch + slice vs. SQL LIMIT.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_memory_window [--rows 10000 20000 50000]
+"""
+import argparse
+import os
+import tempfile
+import timeit
+
+from memory import ChatMemory
+
+WINDOW = 12
+
+
+def fill(memory: ChatMemory, session_id: str, rows: int):
+    with memory.batch():
+        for i in range(rows):
+            role = "user" if i % 5 == 0 else "assistant"
+            memory.add(session_id, f"agent-{i % 5}", role, f"turn {i} " + "lorem ipsum " * 20)
+
+
+def run(row_counts=(10_000, 20_000, 50_000), number: int = 50) -> list[dict]:
+    results = []
+    for rows in row_counts:
+        with tempfile.TemporaryDirectory() as tmp:
+            memory = ChatMemory(os.path.join(tmp, "bench.db"))
+            fill(memory, "long-session", rows)
+            # A second session checks the index keeps other rows out of the scan
+            fill(memory, "other-session", rows // 10)
+            full = timeit.timeit(lambda: memory.get_recent("long-session")[-WINDOW:], number=number) / number
+            windowed = timeit.timeit(lambda: memory.get_last("long-session", WINDOW), number=number) / number
+            memory.close()
+        results.append({"rows": rows, "get_recent_ms": full * 1e3, "get_last_ms": windowed * 1e3})
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 20_000, 50_000])
+    args = parser.parse_args()
+    print(f"{'rows':>8} {'get_recent[-12:]':>18} {'get_last(12)':>14}")
+    for r in run(args.rows):
+        print(f"{r['rows']:>8} {r['get_recent_ms']:>15.3f} ms {r['get_last_ms']:>11.3f} ms")
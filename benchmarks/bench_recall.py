@@ -0,0 +1,127 @@
+# justice_agents/benchmarks/bench_recall.py
+"""Recall index cost and quality at 100k+ stored messages.
+
+Fills a RecallIndex with synthetic council turns, each about one of a few
+hundred cases and padded with common vocabulary, then measures add
+throughput, fitting the lists, single and batched top-k query latency, and
+how many of the top hits are about a different case than the query (for
+the index and for an exact scan of every row). Session-scoped queries,
+which is what the server's prompts run, are timed for a long session
+(a tenth of the rows) and a short one:
+
+    python -m benchmarks.bench_recall [--rows 100000]
+"""
+import argparse
+import random
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from recall import RecallIndex, embed
+
+CASES = 300
+K = 5
+# Rows in each short session; the first tenth of the rows form one long session
+SHORT_SESSION = 50
+_SYLLABLES = "ba ce di fo gu ka le mi no pu ra se ti vo zu".split()
+
+
+def _word(rng: random.Random, syllables: int) -> str:
+    return "".join(rng.choice(_SYLLABLES) for _ in range(syllables))
+
+
+def make_corpus(rows: int, queries: int, seed: int = 0):
+    """Returns (texts, text_cases, queries, query_cases) for synthetic turns."""
+    rng = random.Random(seed)
+    common = [_word(rng, 2) for _ in range(3_000)]
+    weights = [1 / (rank + 1) ** 0.8 for rank in range(len(common))]
+    case_words = [[_word(rng, 4) for _ in range(20)] for _ in range(CASES)]
+
+    def turn(case):
+        return " ".join(rng.choices(case_words[case], k=8) + rng.choices(common, weights, k=20))
+
+    text_cases = [rng.randrange(CASES) for _ in range(rows)]
+    query_cases = [rng.randrange(CASES) for _ in range(queries)]
+    return [turn(c) for c in text_cases], text_cases, [turn(c) for c in query_cases], query_cases
+
+
+def _off_topic(hits, text_cases, query_cases) -> float:
+    pairs = [(text_cases[turn_id - 1], case) for found, case in zip(hits, query_cases) for turn_id in found]
+    return sum(a != b for a, b in pairs) / max(1, len(pairs))
+
+
+def session_of(turn_id: int, rows: int) -> str:
+    long_rows = rows // 10
+    return "long" if turn_id <= long_rows else f"short-{(turn_id - long_rows - 1) // SHORT_SESSION}"
+
+
+def _latencies(index, query_texts, **options) -> list[float]:
+    samples = []
+    for text in query_texts:
+        start = time.perf_counter()
+        index.search([text], K, **options)
+        samples.append(time.perf_counter() - start)
+    return sorted(samples)
+
+
+def run(rows: int = 100_000, queries: int = 200) -> dict:
+    texts, text_cases, query_texts, query_cases = make_corpus(rows, queries)
+    prefix = f"recall.rows={rows}"
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        # Lists are fitted once, below, rather than by background passes mid-fill
+        index = RecallIndex(tmp, train_rows=rows + 1)
+        start = time.perf_counter()
+        for offset in range(0, rows, 1_000):
+            # Message ids are 1-based, like the messages table
+            ids = list(range(offset + 1, min(rows, offset + 1_000) + 1))
+            index.add(ids, texts[offset:offset + 1_000], [session_of(turn_id, rows) for turn_id in ids])
+        results[f"{prefix}.add_per_s"] = rows / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        index.train()
+        results[f"{prefix}.train_ms"] = (time.perf_counter() - start) * 1e3
+
+        for text in query_texts[:20]:
+            index.search([text], K)
+        samples, hits = [], []
+        for text in query_texts:
+            start = time.perf_counter()
+            found = index.search([text], K)[0]
+            samples.append(time.perf_counter() - start)
+            hits.append([turn_id for turn_id, _ in found])
+        samples.sort()
+        results[f"{prefix}.query_p50_ms"] = statistics.median(samples) * 1e3
+        results[f"{prefix}.query_p95_ms"] = samples[int(len(samples) * 0.95)] * 1e3
+
+        batch = query_texts[:16]
+        start = time.perf_counter()
+        for _ in range(10):
+            index.search(batch, K)
+        results[f"{prefix}.batch16_per_query_ms"] = (time.perf_counter() - start) / (10 * len(batch)) * 1e3
+        results[f"{prefix}.off_topic_at_{K}"] = _off_topic(hits, text_cases, query_cases)
+
+        for name, session in (("long", "long"), ("short", session_of(rows, rows))):
+            samples = _latencies(index, query_texts, session=session)
+            results[f"{prefix}.session_{name}_query_p50_ms"] = statistics.median(samples) * 1e3
+            results[f"{prefix}.session_{name}_query_p95_ms"] = samples[int(len(samples) * 0.95)] * 1e3
+
+        # Reference: the same queries ranked against every row, IDF-weighted like the index
+        matrix = index.vectors[:index.count].astype(np.float32)
+        weighted = embed(query_texts[:50], index.dim) * (np.log((1.0 + index.count) / (1.0 + index.df)) + 1.0)
+        scores = matrix @ weighted.T
+        exact = [(np.argsort(-scores[:, j])[:K] + 1).tolist() for j in range(len(weighted))]
+        results[f"{prefix}.exact_off_topic_at_{K}"] = _off_topic(exact, text_cases, query_cases)
+        index.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+    for name, value in run(args.rows, args.queries).items():
+        print(f"{name:<44} {value:>12.3f}")
@@ -0,0 +1,54 @@
+# justice_agents/benchmarks/bench_sharded.py
+"""How sharded batch throughput scales with worker processes.
+
+Runs the same synthetic scenario file through sharded.run_sharded with the
+offline fake backend at zero latency, so every reply costs only the
+council's own work (prompt building, JSON, SQLite), for 1, 2, 4, ... up
+to one process per core:
+
+    python -m benchmarks.bench_sharded [--scenarios 2000]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from batch import read_scenarios, select_profiles
+from config import RATE_LIMIT_BURST, RATE_LIMIT_PER_SECOND
+from sharded import run_sharded
+
+
+def run(scenarios: int = 2_000) -> dict:
+    profiles = select_profiles("all", "")
+    counts = [1]
+    while counts[-1] * 2 <= (os.cpu_count() or 1):
+        counts.append(counts[-1] * 2)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "scenarios.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            for i in range(scenarios):
+                f.write(json.dumps({"id": f"case-{i}", "prompt": f"Case {i}: who should bear the cost?"}) + "\n")
+        options = {
+            "db": os.path.join(tmp, "batch.db"), "max_tokens": 60, "keep_sessions": False, "workers": 4,
+            "cache": "off", "backend": "fake", "cassette": None, "hedge_after": None,
+            "rate_limit": RATE_LIMIT_PER_SECOND, "rate_burst": RATE_LIMIT_BURST,
+            "backend_options": {"latency": 0.0, "latency_jitter": 0.0, "tokens_per_second": float("inf")},
+        }
+        for processes in counts:
+            start = time.perf_counter()
+            written = run_sharded(read_scenarios(path), profiles, os.path.join(tmp, "out.jsonl"), options,
+                                  processes=processes, progress_every=0)
+            rate = written / (time.perf_counter() - start)
+            results[f"sharded.processes={processes}.replies_per_s"] = rate
+            results[f"sharded.processes={processes}.speedup"] = rate / results["sharded.processes=1.replies_per_s"]
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenarios", type=int, default=2_000)
+    args = parser.parse_args()
+    for name, value in run(args.scenarios).items():
+        print(f"{name:<44} {value:>12.3f}")
@@ -0,0 +1,62 @@
+# justice_agents/benchmarks/bench_startup.py
+"""Cold-start cost: module import time and time to the first frame.
+
+Each measurement is a fresh interpreter. Import times come from
+`python -X importtime`; the first frame comes from `main.py --startup_probe`
+on the SDL dummy driver with the offline backend. Run from the repository root:
+
+    python -m benchmarks.bench_startup [--runs 5]
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ENTRY_MODULES = ("main", "batch", "server")
+_IMPORT_LINE = re.compile(r"import time:\s+\d+ \|\s+(\d+) \| (\s*)(\S+)")
+_PROBE_LINE = re.compile(r"first frame (\d+) ms")
+
+
+def import_times(module: str) -> dict:
+    """Returns the cumulative import microseconds of every top-level import in `python -c 'import module'`."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, check=True)
+    times = {}
+    for match in _IMPORT_LINE.finditer(result.stderr):
+        cumulative, indent, name = match.groups()
+        if not indent:
+            times[name] = int(cumulative)
+    return times
+
+
+def first_frame_ms() -> float:
+    env = dict(os.environ, SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy")
+    with tempfile.TemporaryDirectory() as tmp:
+        # A scratch working directory keeps the probe away from the real memory database
+        for name in ("resources", "advocates.csv"):
+            if os.path.exists(name):
+                os.symlink(os.path.abspath(name), os.path.join(tmp, name))
+        result = subprocess.run([sys.executable, os.path.abspath("main.py"), "--backend", "fake", "--startup_probe"],
+                                capture_output=True, text=True, check=True, env=env, cwd=tmp)
+    return float(_PROBE_LINE.search(result.stdout).group(1))
+
+
+def run(runs: int = 5) -> dict:
+    results = {}
+    for module in ENTRY_MODULES:
+        samples = [import_times(module) for _ in range(runs)]
+        # Pulling pygame or the Gemini SDK into an entry point's import shows up here as a jump
+        results[f"startup.import_{module}_ms"] = statistics.median(s[module] for s in samples) / 1e3
+    results["startup.first_frame_ms"] = statistics.median(first_frame_ms() for _ in range(runs))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    for name, value in run(args.runs).items():
+        print(f"{name:<40} {value:>10.1f}")
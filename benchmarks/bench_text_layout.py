@@ -0,0 +1,87 @@
+# justice_agents/benchmarks/bench_text_layout.py
+"""Frame time of wrapped-text drawing against reply length.
+
+Compares the original per-frame word wrap with the cached layout in
+gui.render_wrapped_text, both for a static reply redrawn every frame and
+for a reply streamed in 24-character chunks. Runs headless:
+
+    python -m benchmarks.bench_text_layout
+"""
+import os
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame  # noqa: E402
+
+from gui import TextLayoutCache, render_wrapped_text  # noqa: E402
+import gui  # noqa: E402
+
+WORDS = "the council weighs harm and benefit across every member of the community".split()
+CHUNK = 24
+
+
+def legacy_render_wrapped_text(text, font, color, rect, surface):
+    """The pre-cache implementation: re-wraps and re-renders on every frame."""
+    padding = 10
+    x, y = rect.x + padding, rect.y + padding
+    max_width = rect.width - 2 * padding
+    line_height = font.get_linesize()
+    for para in text.split("\n"):
+        line = ""
+        for word in para.split(" "):
+            candidate = f"{line} {word}".strip()
+            if font.size(candidate)[0] <= max_width:
+                line = candidate
+            else:
+                if y + line_height > rect.bottom - padding: return
+                surface.blit(font.render(line, True, color), (x, y))
+                y += line_height
+                line = word
+        if line:
+            if y + line_height > rect.bottom - padding: return
+            surface.blit(font.render(line, True, color), (x, y))
+            y += line_height
+
+
+def make_text(length):
+    words = []
+    while sum(len(w) + 1 for w in words) < length:
+        words.append(WORDS[len(words) % len(WORDS)])
+    return " ".join(words)[:length]
+
+
+def time_frames(draw, texts, font, rect, surface):
+    start = time.perf_counter()
+    for text in texts:
+        draw(text, font, (0, 0, 0), rect, surface)
+    return (time.perf_counter() - start) / len(texts)
+
+
+def run(lengths=(250, 1000, 4000, 16000), rect_height=800, static_frames=60) -> list[dict]:
+    pygame.init()
+    surface = pygame.Surface((1080, rect_height + 20))
+    font = pygame.font.Font(None, 24)
+    rect = pygame.Rect(0, 0, 1080, rect_height)
+    results = []
+    for length in lengths:
+        text = make_text(length)
+        stream = [text[:i] for i in range(CHUNK, length + CHUNK, CHUNK)]
+        gui._text_layouts = TextLayoutCache()
+        row = {
+            "chars": length,
+            "static_legacy_ms": time_frames(legacy_render_wrapped_text, [text] * static_frames, font, rect, surface) * 1e3,
+            "static_cached_ms": time_frames(render_wrapped_text, [text] * static_frames, font, rect, surface) * 1e3,
+            "stream_legacy_ms": time_frames(legacy_render_wrapped_text, stream, font, rect, surface) * 1e3,
+        }
+        gui._text_layouts = TextLayoutCache()
+        row["stream_cached_ms"] = time_frames(render_wrapped_text, stream, font, rect, surface) * 1e3
+        results.append(row)
+    return results
+
+
+if __name__ == "__main__":
+    print(f"{'chars':>6} {'static old':>11} {'static new':>11} {'stream old':>11} {'stream new':>11}   (ms/frame)")
+    for r in run():
+        print(f"{r['chars']:>6} {r['static_legacy_ms']:>11.3f} {r['static_cached_ms']:>11.3f} "
+              f"{r['stream_legacy_ms']:>11.3f} {r['stream_cached_ms']:>11.3f}")
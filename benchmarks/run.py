@@ -0,0 +1,264 @@
+# justice_agents/benchmarks/run.py
+"""Benchmark suite for the council's hot paths, with baseline comparison.
+
+Runs offline against FakeBackend and a headless SDL dummy display:
+
+    python -m benchmarks.run --out baseline.json
+    python -m benchmarks.run --compare baseline.json     # exits 1 on regression
+
+Suites:
+    memory   ChatMemory add throughput and get_recent/get_last latency as rows grow
+    context  JusticeAgent._build_context cost against session length, recall included
+    recall   recall index add rate, top-k query latency (whole index and per session) and hit quality at 100k messages
+    render   render_wrapped_text and full/streaming ChatGUI frame times
+    e2e      council turns per second with 1..N agents and simulated LLM latency
+    startup  entry-point import times and time to first frame, in fresh interpreters
+
+Every result is a flat metric name -> number. Names ending in `_per_s` are
+better when higher, all others (timings) when lower.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+from agent import JusticeAgent  # noqa: E402
+from backends import FakeBackend  # noqa: E402
+from config import AGENTS, AgentProfile  # noqa: E402
+from memory import ChatMemory  # noqa: E402
+
+SUITES = ("memory", "context", "recall", "render", "e2e", "startup")
+# Differences smaller than this (in ms) are noise, whatever the ratio
+NOISE_FLOOR_MS = 0.05
+
+
+def _fill(memory: ChatMemory, session_id: str, rows: int, offset: int = 0):
+    with memory.batch():
+        for i in range(offset, offset + rows):
+            role = "user" if i % 5 == 0 else "assistant"
+            memory.add(session_id, f"agent-{i % 5}", role, f"turn {i} " + "lorem ipsum " * 20)
+
+
+def bench_memory(quick: bool) -> dict:
+    results = {}
+    steps = (1_000, 5_000) if quick else (1_000, 10_000, 50_000)
+    with tempfile.TemporaryDirectory() as tmp:
+        # The recall index has its own suite; this one measures the SQLite paths
+        memory = ChatMemory(os.path.join(tmp, "memory.db"), recall=False)
+        rows = 0
+        for target in steps:
+            # Individual adds, the way agents write, committed by the write-behind flusher
+            start = time.perf_counter()
+            for i in range(rows, target):
+                memory.add("long-session", f"agent-{i % 5}", "assistant", f"turn {i} " + "lorem ipsum " * 20)
+            memory.flush()
+            results[f"memory.rows={target}.add_per_s"] = (target - rows) / (time.perf_counter() - start)
+            rows = target
+            number = 5 if target >= 10_000 else 20
+            results[f"memory.rows={target}.get_recent_ms"] = (
+                timeit.timeit(lambda: memory.get_recent("long-session"), number=number) / number * 1e3
+            )
+            memory.hot.clear()
+            results[f"memory.rows={target}.get_last_cold_ms"] = (
+                timeit.timeit(lambda: (memory.hot.clear(), memory.get_last("long-session", 12)), number=50) / 50 * 1e3
+            )
+            results[f"memory.rows={target}.get_last_ms"] = (
+                timeit.timeit(lambda: memory.get_last("long-session", 12), number=500) / 500 * 1e3
+            )
+        memory.close()
+    return results
+
+
+def bench_context(quick: bool) -> dict:
+    results = {}
+    lengths = (10, 100, 1_000) if quick else (10, 100, 1_000, 10_000)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "context.db")
+        agent = JusticeAgent(AGENTS["utilitarian"], db_path=db_path, backend=FakeBackend())
+        # Opened now rather than on the startup timer, so every build pays for its recall query
+        agent.memory.open_recall()
+        for length in lengths:
+            session_id = f"session-{length}"
+            _fill(agent.memory, session_id, length)
+            start = time.perf_counter()
+            agent._build_context(session_id)
+            # The first build folds the older turns into the rolling summary
+            results[f"context.turns={length}.first_build_ms"] = (time.perf_counter() - start) * 1e3
+            results[f"context.turns={length}.build_ms"] = (
+                timeit.timeit(lambda: agent._build_context(session_id), number=200) / 200 * 1e3
+            )
+        agent.memory.close()
+    return results
+
+
+def bench_render(quick: bool) -> dict:
+    import pygame
+    import gui
+    from benchmarks.bench_text_layout import make_text
+
+    pygame.init()
+    screen = pygame.display.set_mode((1560, 878))
+    font = pygame.font.Font(None, 24)
+    rect = pygame.Rect(0, 0, 1080, 800)
+    results = {}
+
+    for length in (1_000, 4_000):
+        text = make_text(length)
+        gui._text_layouts = gui.TextLayoutCache()
+        frames = [text[:i] for i in range(24, length + 24, 24)]
+        start = time.perf_counter()
+        for frame in frames:
+            gui.render_wrapped_text(frame, font, (0, 0, 0), rect, screen)
+        results[f"render.text.chars={length}.stream_frame_ms"] = (time.perf_counter() - start) / len(frames) * 1e3
+        results[f"render.text.chars={length}.static_frame_ms"] = (
+            timeit.timeit(lambda: gui.render_wrapped_text(text, font, (0, 0, 0), rect, screen), number=100) / 100 * 1e3
+        )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "render.db")
+        agents = {key: JusticeAgent(profile, db_path=db_path, backend=FakeBackend()) for key, profile in AGENTS.items()}
+        # Enough history that older entries are paged out, as in a long session
+        chat_gui = gui.ChatGUI(agents, 1560, 878, ChatMemory.shared(db_path))
+        for i in range(50 if quick else 500):
+            chat_gui.chat_history.append(f"Agent {i % 4}: " + make_text(300))
+        chat_gui.draw(screen)
+
+        def full_frame():
+            chat_gui.invalidate()
+            chat_gui.draw(screen)
+
+        def streaming_frame():
+            chat_gui.append_reply("utilitarian", " justice and welfare")
+            chat_gui.draw(screen)
+
+        results["render.frame.full_ms"] = timeit.timeit(full_frame, number=20) / 20 * 1e3
+        results["render.frame.streaming_ms"] = timeit.timeit(streaming_frame, number=200) / 200 * 1e3
+        results["render.frame.idle_ms"] = timeit.timeit(lambda: chat_gui.draw(screen), number=1000) / 1000 * 1e3
+        ChatMemory.shared(db_path).close()
+    pygame.quit()
+    return results
+
+
+def bench_e2e(quick: bool, latency: float = 0.05) -> dict:
+    from dispatcher import CouncilDispatcher
+
+    results = {}
+    turns = 5 if quick else 20
+    profiles = list(AGENTS.values())
+    backend = FakeBackend(latency=latency, latency_jitter=latency / 5, tokens_per_second=2_000)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "e2e.db")
+        for count in (1, 2, 4, 8):
+            agents = [
+                JusticeAgent(AgentProfile(f"{p.name} {i}", p.system_prompt), db_path=db_path, backend=backend)
+                for i, p in enumerate(profiles[j % len(profiles)] for j in range(count))
+            ]
+            dispatcher = CouncilDispatcher(max_concurrency=count, stream=True)
+            memory = agents[0].memory
+            memory.open_recall()
+            session_id = memory.create_session()
+            start = time.perf_counter()
+            for turn in range(turns):
+                memory.add(session_id, "User", "user", f"Case {turn}: who should bear the cost?")
+                dispatcher.submit_turn(agents, session_id, max_tokens=60)
+                while dispatcher.busy:
+                    dispatcher.poll()
+                    time.sleep(0.001)
+            elapsed = time.perf_counter() - start
+            dispatcher.shutdown()
+            results[f"e2e.agents={count}.turns_per_s"] = turns / elapsed
+            results[f"e2e.agents={count}.replies_per_s"] = turns * count / elapsed
+        memory.close()
+    return results
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def run(suites=SUITES, quick: bool = False, latency: float = 0.05) -> dict:
+    from benchmarks import bench_recall, bench_startup
+
+    benches = {"memory": bench_memory, "context": bench_context, "render": bench_render,
+               "recall": lambda quick: bench_recall.run(rows=20_000 if quick else 100_000),
+               "startup": lambda quick: bench_startup.run(runs=2 if quick else 5)}
+    results = {}
+    for suite in suites:
+        print(f"Running {suite}...", file=sys.stderr)
+        if suite == "e2e":
+            results.update(bench_e2e(quick, latency))
+        else:
+            results.update(benches[suite](quick))
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "quick": quick,
+            "latency": latency,
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """Prints current vs. baseline; returns the metrics that regressed by more than threshold."""
+    regressions = []
+    print(f"{'metric':<48} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, value in current.items():
+        if name not in baseline:
+            print(f"{name:<48} {'-':>12} {value:>12.3f}")
+            continue
+        before = baseline[name]
+        change = (value - before) / before if before else 0.0
+        higher_is_better = name.endswith("_per_s")
+        worse = -change if higher_is_better else change
+        regressed = worse > threshold and (higher_is_better or value - before > NOISE_FLOOR_MS)
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<48} {before:>12.3f} {value:>12.3f} {change:>+7.0%}{flag}")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the council's hot paths.")
+    parser.add_argument("--suites", nargs="+", choices=SUITES, default=list(SUITES))
+    parser.add_argument("--quick", action="store_true", help="Smaller sizes, for a fast sanity run.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated LLM time to first token (seconds) for e2e.")
+    parser.add_argument("--out", default="benchmark_results.json", help="Where to write the results JSON.")
+    parser.add_argument("--compare", help="Baseline results JSON to compare against.")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Relative slowdown that counts as a regression.")
+    args = parser.parse_args()
+
+    report = run(args.suites, args.quick, args.latency)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(report['results'])} metrics to {args.out}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report["results"], baseline["results"], args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}.", file=sys.stderr)
+            sys.exit(1)
+    else:
+        for name, value in report["results"].items():
+            print(f"{name:<48} {value:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# justice_agents/cache.py
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from config import CACHE_CAPACITY, CACHE_DB_PATH, CACHE_TTL_SECONDS, MODEL_NAME
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+  key TEXT PRIMARY KEY,
+  reply TEXT NOT NULL,
+  expires_at REAL NOT NULL
+);
+"""
+
+CACHE_MODES = ("on", "off", "readonly")
+# Expired rows are deleted on open and then at most this often, from put()
+_PURGE_INTERVAL = 60 * 60
+
+
+def cache_key(system_prompt: str, history: list, generation_config: dict, model: str = MODEL_NAME) -> str:
+    """Hashes everything that determines a reply: model, persona, prompt and config.
+
+    `model` is the backend's identity (see LLMBackend.identity), so replies
+    from the offline fake never answer for Gemini.
+    """
+    payload = json.dumps(
+        [model, system_prompt, history, generation_config],
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Two-tier reply cache: an in-memory LRU in front of a SQLite table, both with TTL.
+
+    In "readonly" mode lookups are served but nothing new is stored, which
+    suits replaying a recorded demo without growing the cache. A writable
+    cache deletes its expired rows when opened and then hourly as it stores
+    new ones.
+    """
+    def __init__(self, db_path=CACHE_DB_PATH, mode: str = "on",
+                 capacity: int = CACHE_CAPACITY, ttl_seconds: float = CACHE_TTL_SECONDS):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode: {mode!r}")
+        self.mode = mode
+        self.capacity = capacity
+        self.ttl_seconds = ttl_seconds
+        # key -> (reply, expires_at), least recently used first
+        self.lru = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(_SCHEMA)
+        self.conn.commit()
+        self._next_purge = 0.0
+        if mode == "on":
+            self.purge_expired()
+
+    def _remember(self, key: str, reply: str, expires_at: float):
+        self.lru[key] = (reply, expires_at)
+        self.lru.move_to_end(key)
+        if len(self.lru) > self.capacity:
+            self.lru.popitem(last=False)
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self.lock:
+            entry = self.lru.get(key)
+            if entry is not None:
+                reply, expires_at = entry
+                if expires_at > now:
+                    self.lru.move_to_end(key)
+                    self.hits += 1
+                    return reply
+                # Expired in memory as on disk; a fresher row may still have been stored since
+                del self.lru[key]
+            row = self.conn.execute(
+                "SELECT reply, expires_at FROM responses WHERE key = ? AND expires_at > ?",
+                (key, now),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._remember(key, *row)
+            self.hits += 1
+            self.disk_hits += 1
+            return row[0]
+
+    def put(self, key: str, reply: str):
+        if self.mode != "on":
+            return
+        expires_at = time.time() + self.ttl_seconds
+        with self.lock:
+            self._remember(key, reply, expires_at)
+            with self.conn:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, reply, expires_at) VALUES (?, ?, ?)",
+                    (key, reply, expires_at),
+                )
+                if time.monotonic() >= self._next_purge:
+                    self._purge_locked()
+
+    def _purge_locked(self) -> int:
+        self._next_purge = time.monotonic() + _PURGE_INTERVAL
+        return self.conn.execute(
+            "DELETE FROM responses WHERE expires_at <= ?", (time.time(),)
+        ).rowcount
+
+    def purge_expired(self) -> int:
+        with self.lock, self.conn:
+            return self._purge_locked()
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries_in_memory": len(self.lru),
+            }
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
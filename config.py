@@ -89,3 +89,69 @@ Challenge advantage for the few.
 Balance equity with realism.""",
     ),
 }
+
+# --- Memory retention ---
+# Messages older than this are pruned from justice_memory.db.
+MEMORY_RETENTION_SECONDS = 24 * 60 * 60
+# Hard caps on the messages table; the oldest rows go first.
+MEMORY_MAX_ROWS = 50_000
+MEMORY_MAX_BYTES = 32 * 1024 * 1024
+# How often the background pruner runs.
+MEMORY_PRUNE_INTERVAL = 60.0
+
+# --- Context window ---
+# Approximate prompt budget per call, system prompt included.
+CONTEXT_TOKEN_BUDGET = 2048
+# Share of that budget the rolling summary of older turns may use.
+SUMMARY_TOKEN_BUDGET = 256
+# Most recent turns considered for the verbatim window.
+CONTEXT_MAX_TURNS = 64
+
+# --- Recall ---
+# Earlier turns most similar to the newest one are added to each prompt. The scope is
+# "session" (the prompt's own session only) or "all" (every session in the store); stores
+# shared by several users keep "session", and the single-user GUI opens its own with "all".
+RECALL_ENABLED = True
+RECALL_SCOPE = "session"
+RECALL_TOP_K = 3
+# Share of the context budget the recalled turns may use, and the weakest match worth sending.
+RECALL_TOKEN_BUDGET = 256
+RECALL_MIN_SCORE = 0.2
+# Hashed embedding width, and the inverted-file index used once it is large:
+# lists, rows scanned per query, and the size at which the lists are first fitted.
+RECALL_DIM = 512
+RECALL_LISTS = 512
+RECALL_CANDIDATES = 1024
+RECALL_TRAIN_ROWS = 2048
+
+# --- Response cache ---
+CACHE_DB_PATH = "./response_cache.db"
+# Entries kept in the in-memory LRU tier.
+CACHE_CAPACITY = 512
+# Lifetime of persisted entries.
+CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+
+# --- Sessions ---
+# Recent turns kept in RAM per active session, and how many sessions stay hot.
+SESSION_CACHE_TURNS = 64
+SESSION_CACHE_SESSIONS = 32
+
+# --- Deliberation ---
+# Output tokens shared by all agents speaking in one round.
+ROUND_TOKEN_BUDGET = 400
+# Replies at least this similar to the agent's previous one count as repeats.
+REPEAT_SIMILARITY = 0.8
+
+# --- Resilience ---
+# Requests per second allowed per (API key, model), and the burst on top of it.
+RATE_LIMIT_PER_SECOND = 1.0
+RATE_LIMIT_BURST = 5
+# Longest a call waits for a token before giving up with RateLimited.
+RATE_LIMIT_MAX_WAIT = 30.0
+# Attempts per call, and the bounds of the jittered exponential backoff between them.
+RETRY_ATTEMPTS = 4
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 8.0
+# Consecutive failures that open the circuit, and how long it stays open.
+BREAKER_FAILURES = 5
+BREAKER_RESET_SECONDS = 30.0
@@ -0,0 +1,127 @@
+# justice_agents/context.py
+import re
+
+from config import CONTEXT_MAX_TURNS, CONTEXT_TOKEN_BUDGET, RECALL_TOKEN_BUDGET, RECALL_TOP_K, SUMMARY_TOKEN_BUDGET
+from memory import ChatMemory, Turn
+
+# Longest excerpt of a single turn kept in the rolling summary
+_SUMMARY_LINE_CHARS = 160
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap local token estimate (~4 characters per token for English text)."""
+    return (len(text) + 3) // 4
+
+
+def format_turn(turn: Turn) -> dict:
+    # Gemini uses 'user' and 'model', OpenAI uses 'user' and 'assistant'
+    role = 'assistant' if turn.role == 'assistant' else 'user'
+    # Prepend agent name for clarity in the context
+    return {"role": role, "content": f"[{turn.agent}]: {turn.content}"}
+
+
+def clip_turn(turn: Turn, tokens: int) -> str:
+    """The turn as `agent: text`, cut to roughly `tokens` tokens."""
+    text = turn.content.strip()
+    if estimate_tokens(text) > tokens:
+        text = text[:max(0, tokens * 4 - 3)].rstrip() + "..."
+    return f"{turn.agent}: {text}"
+
+
+def summarize_turn(turn: Turn) -> str:
+    """Condenses a turn to its opening sentence, clipped to a fixed length."""
+    text = _SENTENCE_END.split(turn.content.strip(), maxsplit=1)[0]
+    if len(text) > _SUMMARY_LINE_CHARS:
+        text = text[:_SUMMARY_LINE_CHARS - 3].rstrip() + "..."
+    return f"{turn.agent}: {text}"
+
+
+class ContextBuilder:
+    """Builds a prompt history that fits a token budget.
+
+    The newest turns are kept verbatim, newest first, until the budget runs
+    out. Turns that fall out of that window are folded into a per-session
+    rolling summary stored next to the messages, so each turn is summarised
+    once, when it leaves the window, rather than on every call. When the
+    memory has a recall index, a few earlier turns most similar to the
+    newest user message are added too, within their own budget: from the
+    same session, or from any session when the store's recall_scope is
+    "all".
+    """
+    def __init__(self, memory: ChatMemory, token_budget: int = CONTEXT_TOKEN_BUDGET,
+                 summary_budget: int = SUMMARY_TOKEN_BUDGET, max_turns: int = CONTEXT_MAX_TURNS,
+                 recall_k: int = RECALL_TOP_K, recall_budget: int = RECALL_TOKEN_BUDGET):
+        self.memory = memory
+        self.token_budget = token_budget
+        self.summary_budget = summary_budget
+        self.max_turns = max_turns
+        self.recall_k = recall_k
+        self.recall_budget = recall_budget
+
+    def _fold(self, session_id: str, summary: str, last_id: int, window_start: int) -> str:
+        """Adds every turn between the summary and the window to the summary."""
+        folded = self.memory.get_range(session_id, last_id, window_start)
+        if not folded:
+            return summary
+        lines = summary.split("\n") if summary else []
+        lines.extend(summarize_turn(turn) for turn in folded)
+        # Rolling: the oldest lines give way once the summary outgrows its budget
+        total = sum(estimate_tokens(line) + 1 for line in lines)
+        while len(lines) > 1 and total > self.summary_budget:
+            total -= estimate_tokens(lines.pop(0)) + 1
+        summary = "\n".join(lines)
+        self.memory.set_summary(session_id, summary, folded[-1].id)
+        return summary
+
+    def _has_older(self, recent: list[Turn], kept: list[Turn], last_id: int) -> bool:
+        """True if the session has turns after last_id that did not make it into the window."""
+        if len(kept) < len(recent):
+            return recent[-len(kept) - 1].id > last_id
+        # Every fetched turn fit; older ones may exist only if the fetch was cut off
+        return len(recent) >= self.max_turns and recent[0].id > last_id
+
+    def _related(self, session_id: str, window: list[Turn]) -> str:
+        """Earlier turns most like the newest user message in the window, one line each."""
+        query = next((turn for turn in reversed(window) if turn.role == "user"), window[-1])
+        scope = session_id if self.memory.recall_scope == "session" else None
+        turns = self.memory.related(query.content, self.recall_k, exclude={turn.id for turn in window},
+                                    session_id=scope)
+        return "\n".join(clip_turn(turn, self.recall_budget // len(turns)) for turn in turns)
+
+    def build(self, session_id: str, system_prompt: str = "") -> list[dict]:
+        """Returns the formatted history for session_id within the token budget."""
+        summary, last_id = self.memory.get_summary(session_id)
+        # Sessions are resumable, so the window is bounded by the budget rather than by age
+        recent = self.memory.get_last(session_id, self.max_turns, minutes=None)
+
+        # The system prompt is re-sent with every request, so it is paid for first
+        recall_budget = self.recall_budget if self.memory.recall is not None and self.recall_k else 0
+        remaining = self.token_budget - estimate_tokens(system_prompt) - self.summary_budget - recall_budget
+        window = []
+        kept = []
+        for turn in reversed(recent):
+            if turn.id <= last_id:
+                break
+            entry = format_turn(turn)
+            cost = estimate_tokens(entry["content"])
+            if window and cost > remaining:
+                break
+            remaining -= cost
+            window.append(entry)
+            kept.append(turn)
+            window_start = turn.id
+        window.reverse()
+        kept.reverse()
+
+        # Ids are global, so a gap below the window says nothing; only fold
+        # when the session itself has unsummarised turns older than the window
+        if window and self._has_older(recent, kept, last_id):
+            summary = self._fold(session_id, summary, last_id, window_start)
+
+        related = self._related(session_id, kept) if recall_budget and kept else ""
+        if related:
+            window.insert(0, {"role": "user", "content": f"[Related earlier turns]:\n{related}"})
+        if summary:
+            window.insert(0, {"role": "user", "content": f"[Summary of earlier deliberation]:\n{summary}"})
+        return window
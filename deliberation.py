@@ -0,0 +1,122 @@
+# justice_agents/deliberation.py
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from agent import CallCancelled
+from config import REPEAT_SIMILARITY, ROUND_TOKEN_BUDGET
+from metrics import metrics
+
+PASS_TOKEN = "PASS"
+_WORD = re.compile(r"\w+")
+
+
+def _round_instruction(round_index: int, rounds: int) -> str:
+    return (
+        f"[Moderator]: Round {round_index + 1} of {rounds}. Respond to the points the other council "
+        f"members have raised so far. If you have nothing new to add, reply only with {PASS_TOKEN}."
+    )
+
+
+def similarity(a: str, b: str) -> float:
+    """Jaccard overlap of the two replies' word sets."""
+    words_a = set(_WORD.findall(a.lower()))
+    words_b = set(_WORD.findall(b.lower()))
+    if not words_a or not words_b:
+        return 0.0
+    return len(words_a & words_b) / len(words_a | words_b)
+
+
+class DeliberationEngine:
+    """Runs several rounds of council debate over one session.
+
+    In each round every agent still in the debate answers the same snapshot
+    of the transcript, concurrently, so a round costs about one agent's
+    latency. Replies are stored together once the round ends, and the next
+    round sees them all. An agent leaves when it passes, starts repeating
+    itself or its call fails, and the round's token budget is split among
+    the agents still speaking, which bounds the total cost at
+    rounds * round_token_budget.
+    """
+    def __init__(self, agents, rounds: int = 3, round_token_budget: int = ROUND_TOKEN_BUDGET,
+                 max_tokens: int = 100, executor: ThreadPoolExecutor = None,
+                 repeat_similarity: float = REPEAT_SIMILARITY):
+        self.agents = list(agents)
+        self.rounds = rounds
+        self.round_token_budget = round_token_budget
+        self.max_tokens = max_tokens
+        self.executor = executor
+        self.repeat_similarity = repeat_similarity
+
+    def _finished_speaking(self, reply: str, previous: str | None) -> bool:
+        if reply.strip().strip(".!").upper() == PASS_TOKEN:
+            return True
+        return previous is not None and similarity(reply, previous) >= self.repeat_similarity
+
+    def run(self, session_id: str, on_reply=None, cancelled=None) -> list[list[tuple]]:
+        """Runs the debate; returns the (agent, reply) pairs of each round.
+
+        on_reply(agent, round_index, reply) is called from worker threads as
+        each reply lands. An agent for which cancelled(agent) turns True
+        leaves the debate, and a reply it was still waiting for is dropped.
+        """
+        if not self.agents:
+            return []
+        cancelled = cancelled or (lambda agent=None: False)
+        memory = self.agents[0].memory
+        speaking = list(self.agents)
+        last_reply = {}
+        transcript = []
+        executor = self.executor or ThreadPoolExecutor(max_workers=len(self.agents))
+        try:
+            for round_index in range(self.rounds):
+                speaking = [agent for agent in speaking if not cancelled(agent)]
+                if not speaking:
+                    break
+                max_tokens = max(1, min(self.max_tokens, self.round_token_budget // len(speaking)))
+                # Every prompt is built before any call starts, so all agents see the same transcript
+                snapshots = {}
+                for agent in speaking:
+                    history = agent._prepare_history(session_id)
+                    if round_index:
+                        history.append({'role': 'user', 'parts': [_round_instruction(round_index, self.rounds)]})
+                    snapshots[agent] = history
+
+                submitted = time.perf_counter()
+
+                def ask(agent):
+                    metrics.observe("council_queue_wait_seconds", time.perf_counter() - submitted,
+                                    agent=agent.profile.name)
+                    try:
+                        reply = agent.generate_response(session_id, max_tokens=max_tokens, history=snapshots[agent],
+                                                        record=False, raise_errors=True,
+                                                        cancelled=partial(cancelled, agent))
+                    except CallCancelled:
+                        return agent, None
+                    except Exception as e:
+                        if on_reply:
+                            on_reply(agent, round_index, agent._reflection(e))
+                        return agent, None
+                    if on_reply and not self._finished_speaking(reply, last_reply.get(agent)):
+                        on_reply(agent, round_index, reply)
+                    return agent, reply
+
+                results = list(executor.map(ask, speaking))
+
+                spoken = []
+                for agent, reply in results:
+                    # A failed or cancelled call is not stored, and the agent sits out the rest
+                    if reply is None or cancelled(agent) or self._finished_speaking(reply, last_reply.get(agent)):
+                        speaking.remove(agent)
+                        continue
+                    last_reply[agent] = reply
+                    spoken.append((agent, reply))
+                with memory.batch():
+                    for agent, reply in spoken:
+                        memory.add(session_id, agent.profile.name, "assistant", reply)
+                transcript.append(spoken)
+        finally:
+            if self.executor is None:
+                executor.shutdown(wait=False)
+        return transcript
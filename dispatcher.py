@@ -0,0 +1,200 @@
+# justice_agents/dispatcher.py
+import queue
+import threading
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from functools import partial
+
+from agent import CallCancelled
+from metrics import metrics
+
+DEFAULT_MAX_CONCURRENCY = 5
+# How long shutdown waits for cancelled calls to wind down before memory is closed
+SHUTDOWN_GRACE_SECONDS = 2.0
+
+
+class TurnHandle:
+    """The pending agent calls of one council turn, cancellable together or one agent at a time.
+
+    Workers ask `cancelled(agent)` between steps; a cancelled call stops at
+    the next chunk (or drops its reply when the blocking call returns), and
+    nothing it produces afterwards is stored or shown. Only calls still
+    pending are stopped: an agent that had already finished keeps its reply.
+    """
+    def __init__(self, agents):
+        self.agents = list(agents)
+        self.pending = set(self.agents)
+        self.futures = {}
+        # Agents whose call was cut off while pending; their events are dropped
+        self.stopped = set()
+        self._superseded = False
+        self._lock = threading.Lock()
+
+    def cancelled(self, agent=None) -> bool:
+        """True once `agent`'s call is stopped, or, without an agent, once the whole turn is cancelled."""
+        if agent is None:
+            return self._superseded
+        return agent in self.stopped
+
+    @property
+    def done(self) -> bool:
+        return not self.pending
+
+    def cancel(self, agents=None) -> list:
+        """Cancels the given agents' calls (all of them by default).
+
+        Returns the agents that were still pending, so the caller can mark
+        their replies as cut off. Calls still queued never start.
+        """
+        with self._lock:
+            if agents is None:
+                self._superseded = True
+                stopped, self.pending = list(self.pending), set()
+            else:
+                stopped = [agent for agent in agents if agent in self.pending]
+                self.pending.difference_update(stopped)
+            self.stopped.update(stopped)
+            futures = [self.futures.get(agent) for agent in stopped]
+        for future in futures:
+            if future is not None:
+                future.cancel()
+        return stopped
+
+    def _finish(self, agent):
+        with self._lock:
+            self.pending.discard(agent)
+
+
+class CouncilDispatcher:
+    """Fans a council turn out to every active agent on a bounded thread pool.
+
+    Replies are pushed onto a queue as (agent, text, done) events so the GUI
+    loop can drain them between frames without ever blocking on the network.
+    In streaming mode each chunk is its own event; otherwise a single event
+    carries the whole reply. `done` marks the end of one reply. Every turn
+    gets a TurnHandle, and events of a cancelled call are never polled.
+    """
+    def __init__(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY, stream: bool = True):
+        self.max_concurrency = max(1, max_concurrency)
+        self.stream = stream
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency,
+            thread_name_prefix="council",
+        )
+        self.results = queue.SimpleQueue()
+        self.in_flight = 0
+        self._count_lock = threading.Condition()
+        self.turns = []
+
+    def _started(self):
+        with self._count_lock:
+            self.in_flight += 1
+
+    def _finished(self):
+        with self._count_lock:
+            self.in_flight -= 1
+            self._count_lock.notify_all()
+
+    def _run(self, turn: TurnHandle, agent, session_id: str, max_tokens: int, submitted: float):
+        metrics.observe("council_queue_wait_seconds", time.perf_counter() - submitted, agent=agent.profile.name)
+        cancelled = partial(turn.cancelled, agent)
+        try:
+            if self.stream:
+                for chunk in agent.stream_response(session_id, max_tokens=max_tokens, cancelled=cancelled):
+                    self.results.put((turn, agent, chunk, False))
+                reply = ""
+            else:
+                reply = agent.generate_response(session_id, max_tokens=max_tokens, cancelled=cancelled)
+        except CallCancelled:
+            reply = ""
+        except Exception as e:
+            reply = agent._reflection(e)
+        self.results.put((turn, agent, reply, True))
+        turn._finish(agent)
+        self._finished()
+
+    def _cancelled_before_start(self, future):
+        # A queued call that was cancelled never runs, so it is never counted down
+        if future.cancelled():
+            self._finished()
+
+    def _track(self, turn: TurnHandle) -> TurnHandle:
+        self.turns = [previous for previous in self.turns if not previous.done] + [turn]
+        return turn
+
+    def submit_turn(self, agents, session_id: str, max_tokens: int = 100) -> TurnHandle:
+        """Sends the same turn to all agents at once; returns its handle immediately."""
+        turn = self._track(TurnHandle(agents))
+        for agent in turn.agents:
+            self._started()
+            future = self.executor.submit(self._run, turn, agent, session_id, max_tokens, time.perf_counter())
+            turn.futures[agent] = future
+            future.add_done_callback(self._cancelled_before_start)
+        return turn
+
+    def submit_deliberation(self, engine, session_id: str) -> TurnHandle:
+        """Runs a multi-round deliberation in the background; returns its handle.
+
+        The engine drives its rounds from its own thread and fans each round
+        out on this dispatcher's pool; every reply arrives as one event.
+        Cancelling an agent makes it sit out the remaining rounds.
+        """
+        turn = self._track(TurnHandle(engine.agents))
+
+        def run():
+            try:
+                engine.run(session_id, on_reply=lambda agent, round_index, reply: self.results.put((turn, agent, reply, True)),
+                           cancelled=turn.cancelled)
+            except (CancelledError, RuntimeError):
+                # The pool was shut down under a turn cancelled at exit
+                if not turn.cancelled():
+                    raise
+            finally:
+                for agent in turn.agents:
+                    turn._finish(agent)
+                self._finished()
+
+        self._started()
+        threading.Thread(target=run, name="deliberation", daemon=True).start()
+        return turn
+
+    def cancel(self, agents=None) -> list:
+        """Cancels the given agents' calls (all calls by default) in every turn still in flight.
+
+        Returns the agents that were cut off.
+        """
+        stopped = []
+        for turn in self.turns:
+            stopped += turn.cancel(agents)
+        self.turns = [turn for turn in self.turns if not turn.done]
+        return stopped
+
+    def poll(self):
+        """Returns every (agent, text, done) event queued since the last poll.
+
+        Events from stopped calls are dropped: their turn was superseded, or
+        the agent was switched off, before the call finished. Calls that
+        had already finished still deliver their last events.
+        """
+        events = []
+        while True:
+            try:
+                turn, agent, text, done = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if agent not in turn.stopped:
+                events.append((agent, text, done))
+        return events
+
+    @property
+    def busy(self) -> bool:
+        """True while any request is running or has events left to poll."""
+        return self.in_flight > 0 or not self.results.empty()
+
+    def shutdown(self, wait: bool = True, grace: float = SHUTDOWN_GRACE_SECONDS):
+        """Stops the pool; with wait=False, in-flight calls are cancelled and given `grace` seconds to stop."""
+        if not wait:
+            self.cancel()
+        self.executor.shutdown(wait=wait, cancel_futures=True)
+        with self._count_lock:
+            self._count_lock.wait_for(lambda: self.in_flight <= 0, timeout=grace)
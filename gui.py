@@ -1,7 +1,15 @@
 
 
+import time
+import zlib
+from collections import OrderedDict
+
 import pygame
 
+from assets import assets
+from metrics import metrics
+from transcript import Transcript
+
 # --- UI Components ---
 
 class Button:
@@ -10,12 +18,15 @@ class Button:
         self.label = label
         self.color = color
         self.font = pygame.font.Font(None, 24)
+        # Labels never change, so they are rendered once
+        self.label_surface = self.font.render(self.label, True, (255, 255, 255))
+        self.dirty = True
 
     def draw(self, screen):
         pygame.draw.rect(screen, self.color, self.rect, border_radius=5)
-        label_surface = self.font.render(self.label, True, (255, 255, 255))
-        text_rect = label_surface.get_rect(center=self.rect.center)
-        screen.blit(label_surface, text_rect)
+        text_rect = self.label_surface.get_rect(center=self.rect.center)
+        screen.blit(self.label_surface, text_rect)
+        self.dirty = False
 
     def is_clicked(self, event):
         if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
@@ -24,40 +35,61 @@ class Button:
         return False
 
 class ToggleSwitch:
-    def __init__(self, x, y, width, height, label, is_on=True):
+    def __init__(self, x, y, width, height, label, is_on=True, key=None):
         self.rect = pygame.Rect(x, y, width, height)
         self.label = label
+        # The agent this switch controls; labels are display names and need not be unique
+        self.key = key if key is not None else label
         self.is_on = is_on
         self.font = pygame.font.Font(None, 24)
+        self.label_surface = self.font.render(self.label, True, (255, 255, 255))
+        self.dirty = True
 
     def draw(self, screen):
         color = (34, 139, 34) if self.is_on else (178, 34, 34)
         pygame.draw.rect(screen, color, self.rect, border_radius=5)
-        label_surface = self.font.render(self.label, True, (255, 255, 255))
-        text_rect = label_surface.get_rect(center=self.rect.center)
-        screen.blit(label_surface, text_rect)
+        text_rect = self.label_surface.get_rect(center=self.rect.center)
+        screen.blit(self.label_surface, text_rect)
+        self.dirty = False
 
     def handle_event(self, event):
         if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
             if self.rect.collidepoint(event.pos):
                 self.is_on = not self.is_on
+                self.dirty = True
                 return True
         return False
 
 class TextInputBox:
     def __init__(self, x, y, width, height, font):
         self.rect = pygame.Rect(x, y, width, height)
-        self.text = ""
+        self._text = ""
         self.font = font
         self.active = False
         self.color_active = pygame.Color('dodgerblue2')
         self.color_inactive = pygame.Color('lightgray')
         self.color = self.color_inactive
+        self.dirty = True
+        self.text_surface = None
+
+    @property
+    def text(self):
+        return self._text
+
+    @text.setter
+    def text(self, value):
+        if value != self._text:
+            self._text = value
+            self.text_surface = None
+            self.dirty = True
 
     def handle_event(self, event):
         if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-            self.active = self.rect.collidepoint(event.pos)
-            self.color = self.color_active if self.active else self.color_inactive
+            active = self.rect.collidepoint(event.pos)
+            if active != self.active:
+                self.active = active
+                self.color = self.color_active if self.active else self.color_inactive
+                self.dirty = True
         if event.type == pygame.KEYDOWN and self.active:
             if event.key == pygame.K_BACKSPACE:
                 self.text = self.text[:-1]
@@ -67,8 +99,10 @@ class TextInputBox:
     def draw(self, screen):
         pygame.draw.rect(screen, (255, 255, 255), self.rect)
         pygame.draw.rect(screen, self.color, self.rect, 2)
-        text_surface = self.font.render(self.text, True, (0, 0, 0))
-        screen.blit(text_surface, (self.rect.x + 5, self.rect.y + 5))
+        if self.text_surface is None:
+            self.text_surface = self.font.render(self.text, True, (0, 0, 0))
+        screen.blit(self.text_surface, (self.rect.x + 5, self.rect.y + 5))
+        self.dirty = False
 
 # --- Main UI Views ---
 
@@ -103,6 +137,17 @@ class CreationForm:
             self.input_boxes.append(box)
 
         self.save_button = Button(self.width / 2 - 100, start_y + len(self.questions) * y_padding, 200, 50, "Save Advocate")
+        self.title_surface = self.font_title.render("Create Your Justice Advocate", True, (255, 255, 255))
+        self.needs_full_redraw = True
+
+    def invalidate(self):
+        """Forces a full repaint on the next draw, e.g. after switching views."""
+        self.needs_full_redraw = True
+
+    @property
+    def dirty(self) -> bool:
+        """True when the next draw would repaint something."""
+        return self.needs_full_redraw or any(box.dirty for box in self.input_boxes)
 
     def handle_event(self, event):
         for box in self.input_boxes:
@@ -117,108 +162,512 @@ class CreationForm:
         return None
 
     def draw(self, screen):
-        screen.fill((20, 20, 40)) # Dark blue background
-        title_surface = self.font_title.render("Create Your Justice Advocate", True, (255, 255, 255))
-        screen.blit(title_surface, (self.width / 2 - title_surface.get_width() / 2, 50))
+        """Repaints what changed and returns the list of updated screen rects."""
+        if self.needs_full_redraw:
+            screen.fill((20, 20, 40)) # Dark blue background
+            screen.blit(self.title_surface, (self.width / 2 - self.title_surface.get_width() / 2, 50))
+
+            for label, pos in self.labels:
+                screen.blit(label, pos)
+            for box in self.input_boxes:
+                box.draw(screen)
 
-        for label, pos in self.labels:
-            screen.blit(label, pos)
+            self.save_button.draw(screen)
+            self.needs_full_redraw = False
+            return [screen.get_rect()]
+
+        dirty_rects = []
         for box in self.input_boxes:
-            box.draw(screen)
-        
-        self.save_button.draw(screen)
+            if box.dirty:
+                box.draw(screen)
+                dirty_rects.append(box.rect)
+        return dirty_rects
+
+BACKGROUND_IMAGE = "resources/background.jpg"
+DIALOGUE_BOX_IMAGE = "resources/dialogue_box.jpg"
+SPRITE_IMAGES = {
+    "Dr. Sam Iqbal": "resources/sprites/utilitarian.jpg",
+    "Amara Ndlovu": "resources/sprites/restorative.jpg",
+    "Jamie Reyes": "resources/sprites/meritocracy.jpg",
+    "Jordan Chex": "resources/sprites/rawlsian.jpg",
+}
+# Everything ChatGUI draws, for preloading at startup
+CHAT_ASSETS = [BACKGROUND_IMAGE, DIALOGUE_BOX_IMAGE, *SPRITE_IMAGES.values()]
+
+# How often the F3 metrics overlay refreshes while shown
+METRICS_REFRESH_SECONDS = 0.5
+
+SPRITE_SIZE = (60, 100)
+SPRITE_POSITIONS = {
+    "Dr. Sam Iqbal": (760, 530),
+    "Amara Ndlovu": (860, 415),
+    "Jamie Reyes": (650, 415),
+    "Jordan Chex": (760, 305),
+}
+# Custom advocates sit in rows to the right of the built-in four
+CUSTOM_SEAT_ORIGIN = (980, 260)
+CUSTOM_SEAT_STEP = (80, 120)
+CUSTOM_SEATS_PER_ROW = 6
+CUSTOM_SEAT_ROWS = 3
+
+def advocate_sprite(name, key, size=SPRITE_SIZE):
+    """A generated figure for a custom advocate: a color derived from its key, with its initials."""
+    color = pygame.Color(0)
+    color.hsva = (zlib.crc32(key.encode()) % 360, 55, 80, 100)
+    width, height = size
+    sprite = pygame.Surface(size, pygame.SRCALPHA)
+    pygame.draw.ellipse(sprite, color, (width // 4, 0, width // 2, height * 3 // 10))
+    pygame.draw.rect(sprite, color, (0, height // 3, width, height - height // 3), border_radius=12)
+    initials = "".join(word[0] for word in name.split()[:2]).upper()
+    label = pygame.font.Font(None, 28).render(initials, True, (255, 255, 255))
+    sprite.blit(label, label.get_rect(center=(width // 2, height * 2 // 3)))
+    return sprite
 
 class ChatGUI:
-    def __init__(self, agents, screen_width, screen_height):
+    def __init__(self, agents, screen_width, screen_height, memory=None):
         self.screen_width = screen_width
         self.screen_height = screen_height
-        self.screen = pygame.display.set_mode((self.screen_width, self.screen_height))
-        pygame.display.set_caption("Justice Council")
-
-        # Resources
-        self.background_image = pygame.image.load("resources/background.jpg").convert()
-        self.background_image = pygame.transform.scale(self.background_image, (self.screen_width, self.screen_height))
-        self.dialogue_box_image = pygame.image.load("resources/dialogue_box.jpg").convert_alpha()
-        self.dialogue_box_image = pygame.transform.scale(self.dialogue_box_image, (self.screen_width * 0.8, 150))
-        self.dialogue_box_rect = pygame.Rect(300, 700, 1080, 125)
 
-        # Sprites
-        self.sprites = {
-            "Dr. Sam Iqbal": pygame.transform.scale(pygame.image.load("resources/sprites/utilitarian.jpg").convert_alpha(), (60, 100)),
-            "Amara Ndlovu": pygame.transform.scale(pygame.image.load("resources/sprites/restorative.jpg").convert_alpha(), (60, 100)),
-            "Jamie Reyes": pygame.transform.scale(pygame.image.load("resources/sprites/meritocracy.jpg").convert_alpha(), (60, 100)),
-            "Jordan Chex": pygame.transform.scale(pygame.image.load("resources/sprites/rawlsian.jpg").convert_alpha(), (60, 100)),
-        }
+        self._load_images()
+        self.dialogue_box_rect = pygame.Rect(300, 700, 1080, 125)
+        self.dialogue_area = self.dialogue_box_image.get_rect(topleft=(self.screen_width * 0.1, 675))
 
         # State & UI
         self.font = pygame.font.Font(None, 24)
         self.agents = agents
-        self.chat_history = ["The Council is in session. What is the matter you bring before us?"]
+        self.agent_keys = {id(agent): key for key, agent in agents.items()}
+        # Older entries are paged out to memory, so the transcript stays bounded in RAM
+        self.chat_history = Transcript(memory)
+        self.chat_history.append("The Council is in session. What is the matter you bring before us?")
         self.main_input_box = TextInputBox(1560 - 40 - 500, 40, 500, int(self.screen_height * 0.2), self.font)
         self.create_advocate_button = Button(self.screen_width - 220, self.screen_height - 60, 200, 40, "Create Advocate")
         self.toggle_switches = self._create_toggle_switches()
+        # Maps an agent key to the chat_history index of its reply in progress;
+        # keys, not names, since two advocates may share a name
+        self.open_replies = {}
+
+        # Dirty-region tracking: only what changed is repainted and pushed to the display
+        self.custom_sprites = {}
+        self._seat_agents()
+        self.sprites_dirty = True
+        self.needs_full_redraw = True
+
+        # Transcript viewport: None follows the newest line, otherwise
+        # (entry index, line index) is the line shown at the top
+        self.text_color = (0, 0, 0)
+        self.text_padding = 10
+        self.text_width = self.dialogue_box_rect.width - 2 * self.text_padding
+        self.line_height = self.font.get_linesize()
+        self.viewport_lines = max(1, (self.dialogue_box_rect.height - 2 * self.text_padding) // self.line_height)
+        self.scroll_anchor = None
+        self.drawn_transcript = None
+
+        # F3 toggles a live metrics overlay; None means it needs drawing (or clearing)
+        self.show_metrics = False
+        self.metrics_area = self._metrics_rect()
+        self.metrics_font = pygame.font.Font(None, 22)
+        self.metrics_drawn_at = None
+
+    def _load_images(self):
+        """Takes resources from the shared asset cache; the display mode is owned by main.
+
+        Images the preloader has not decoded yet are drawn as flat placeholders
+        and swapped for the real ones once they arrive.
+        """
+        self.background_image = assets.get(BACKGROUND_IMAGE, (self.screen_width, self.screen_height),
+                                           placeholder=(58, 44, 36))
+        self.dialogue_box_image = assets.get(DIALOGUE_BOX_IMAGE, (self.screen_width * 0.8, 150), alpha=True,
+                                             placeholder=(236, 226, 204, 230))
+        self.sprites = {
+            name: assets.get(path, SPRITE_SIZE, alpha=True, placeholder=(0, 0, 0, 60))
+            for name, path in SPRITE_IMAGES.items()
+        }
+        self.assets_pending = not assets.ready(CHAT_ASSETS)
+
+    def invalidate(self):
+        """Forces a full repaint on the next draw, e.g. after switching views."""
+        self.needs_full_redraw = True
 
-    def _create_toggle_switches(self):
+    def _create_toggle_switches(self, previous=()):
+        # Agents that were already on screen keep their on/off state
+        was_on = {toggle.key: toggle.is_on for toggle in previous}
         toggles = []
         x, y = 40, 40
-        for agent in self.agents.values():
-            toggles.append(ToggleSwitch(x, y, 150, 30, agent.profile.name))
+        for key, agent in self.agents.items():
+            # Wrap to a new row before running into the input box
+            if x + 150 > self.main_input_box.rect.left - 20:
+                x, y = 40, y + 40
+            toggles.append(ToggleSwitch(x, y, 150, 30, agent.profile.name, is_on=was_on.get(key, True), key=key))
             x += 160
         return toggles
 
+    def _seat_agents(self):
+        """Maps each agent key to a sprite position: built-ins keep theirs, custom advocates fill the rows."""
+        self.builtin_seats = {}
+        custom = []
+        for key, agent in self.agents.items():
+            name = agent.profile.name
+            if name in SPRITE_POSITIONS and not key.startswith("custom") and name not in self.builtin_seats.values():
+                self.builtin_seats[key] = name
+            else:
+                custom.append((key, agent))
+        self.seat_positions = {key: SPRITE_POSITIONS[name] for key, name in self.builtin_seats.items()}
+        (x, y), (dx, dy) = CUSTOM_SEAT_ORIGIN, CUSTOM_SEAT_STEP
+        # Advocates beyond the last seat still get a toggle, just no sprite
+        for i, (key, agent) in enumerate(custom[:CUSTOM_SEATS_PER_ROW * CUSTOM_SEAT_ROWS]):
+            self.seat_positions[key] = (x + dx * (i % CUSTOM_SEATS_PER_ROW), y + dy * (i // CUSTOM_SEATS_PER_ROW))
+            if key not in self.custom_sprites:
+                self.custom_sprites[key] = advocate_sprite(agent.profile.name, key)
+        rects = [pygame.Rect(pos, SPRITE_SIZE) for pos in (*SPRITE_POSITIONS.values(), *self.seat_positions.values())]
+        self.sprite_area = rects[0].unionall(rects[1:])
+
+    def _metrics_rect(self):
+        """The F3 overlay sits below the last row of toggles."""
+        top = max((toggle.rect.bottom for toggle in self.toggle_switches), default=40) + 20
+        return pygame.Rect(40, top, 460, 140)
+
+    def set_agents(self, agents):
+        """Swaps in a new agent set, keeping the transcript, input and loaded assets."""
+        self.agents = agents
+        self.agent_keys = {id(agent): key for key, agent in agents.items()}
+        self.toggle_switches = self._create_toggle_switches(self.toggle_switches)
+        self._seat_agents()
+        self.metrics_area = self._metrics_rect()
+        self.sprites_dirty = True
+        self.invalidate()
+
+    def key_of(self, agent):
+        """The key an agent object is seated under."""
+        return self.agent_keys[id(agent)]
+
+    def append_reply(self, key, text):
+        """Appends a chunk of an agent's reply, starting a new entry on the first chunk."""
+        index = self.open_replies.get(key)
+        if index is None:
+            self.open_replies[key] = len(self.chat_history)
+            self.chat_history.append(f"{self.agents[key].profile.name}: {text}")
+        else:
+            self.chat_history[index] += text
+
+    def finish_reply(self, key):
+        self.open_replies.pop(key, None)
+
+    def interrupt_reply(self, key):
+        """Closes a reply that was cancelled part way; what was shown stays, marked as cut off."""
+        index = self.open_replies.pop(key, None)
+        if index is not None:
+            self.chat_history[index] += " (interrupted)"
+
     def handle_event(self, event):
         self.main_input_box.handle_event(event)
         for toggle in self.toggle_switches:
-            toggle.handle_event(event)
+            if toggle.handle_event(event):
+                self.sprites_dirty = True
+        if event.type == pygame.MOUSEWHEEL and self.dialogue_area.collidepoint(pygame.mouse.get_pos()):
+            self.scroll(-event.y * 3)
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_PAGEUP:
+            self.scroll(-self.viewport_lines)
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_PAGEDOWN:
+            self.scroll(self.viewport_lines)
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+            self.show_metrics = not self.show_metrics
+            self.metrics_drawn_at = None
+
+    # --- Transcript viewport ---
+
+    def _layout(self, index):
+        return _text_layouts.get(self.chat_history[index], self.font, self.text_width, self.text_color)
+
+    def _lines_from_bottom(self, count):
+        """Returns the last `count` (entry, line) positions, oldest first."""
+        positions = []
+        index = len(self.chat_history) - 1
+        while index >= 0 and len(positions) < count:
+            lines = len(self._layout(index).lines)
+            for line in range(lines - 1, -1, -1):
+                positions.append((index, line))
+                if len(positions) == count:
+                    break
+            index -= 1
+        positions.reverse()
+        return positions
+
+    def _lines_from(self, anchor, count):
+        """Returns up to `count` (entry, line) positions starting at anchor."""
+        positions = []
+        index, line = anchor
+        while index < len(self.chat_history) and len(positions) < count:
+            lines = len(self._layout(index).lines)
+            while line < lines and len(positions) < count:
+                positions.append((index, line))
+                line += 1
+            index, line = index + 1, 0
+        return positions
+
+    def _visible_lines(self):
+        if self.scroll_anchor is None:
+            return self._lines_from_bottom(self.viewport_lines)
+        return self._lines_from(self.scroll_anchor, self.viewport_lines)
+
+    def scroll(self, delta):
+        """Scrolls the transcript by `delta` lines; negative is towards older entries."""
+        visible = self._visible_lines()
+        if not visible:
+            return
+        index, line = visible[0]
+        if delta < 0:
+            for _ in range(-delta):
+                if line > 0:
+                    line -= 1
+                    continue
+                # Step back to the last line of the previous non-empty entry
+                previous = index - 1
+                while previous >= 0 and not self._layout(previous).lines:
+                    previous -= 1
+                if previous < 0:
+                    break
+                index, line = previous, len(self._layout(previous).lines) - 1
+            self.scroll_anchor = (index, line)
+        else:
+            following = self._lines_from((index, line), delta + self.viewport_lines + 1)
+            if len(following) <= delta + self.viewport_lines:
+                # Reached the newest line: go back to following the conversation
+                self.scroll_anchor = None
+            else:
+                self.scroll_anchor = following[delta]
+
+    @property
+    def dirty(self) -> bool:
+        """True when the next draw would repaint something."""
+        return (self.needs_full_redraw or self.sprites_dirty or self._metrics_due
+                or (self.assets_pending and assets.ready(CHAT_ASSETS))
+                or self._transcript_state() != self.drawn_transcript
+                or self.main_input_box.dirty
+                or any(toggle.dirty for toggle in self.toggle_switches))
+
+    @property
+    def _metrics_due(self) -> bool:
+        if self.metrics_drawn_at is None:
+            return True
+        return self.show_metrics and time.monotonic() - self.metrics_drawn_at >= METRICS_REFRESH_SECONDS
+
+    def _transcript_state(self):
+        return (self.chat_history.version, self.scroll_anchor)
+
+    def _restore_background(self, screen, rect):
+        screen.blit(self.background_image, rect, rect)
+
+    def _redraw_overlapping(self, screen, rect, dirty_rects):
+        """Redraws the widgets that sit on top of a repainted region, such as the button over the dialogue box."""
+        for widget in (self.main_input_box, self.create_advocate_button, *self.toggle_switches):
+            if widget.rect.colliderect(rect):
+                widget.draw(screen)
+                dirty_rects.append(widget.rect)
 
     def draw(self, screen):
-        screen.blit(self.background_image, (0, 0))
-        screen.blit(self.dialogue_box_image, (self.screen_width * 0.1, 675))
-        
-        if self.chat_history:
-            render_wrapped_text(self.chat_history[-1], self.font, (0, 0, 0), self.dialogue_box_rect, screen)
-
-        self.main_input_box.draw(screen)
-        self.create_advocate_button.draw(screen)
+        """Repaints what changed and returns the list of updated screen rects."""
+        if self.assets_pending and assets.ready(CHAT_ASSETS):
+            self._load_images()
+            self.needs_full_redraw = True
+        if self.needs_full_redraw:
+            screen.blit(self.background_image, (0, 0))
+            self._draw_dialogue(screen)
+            self.main_input_box.draw(screen)
+            self.create_advocate_button.draw(screen)
+            for toggle in self.toggle_switches:
+                toggle.draw(screen)
+            self._draw_sprites(screen)
+            self._draw_metrics(screen)
+            self.needs_full_redraw = False
+            return [screen.get_rect()]
+
+        dirty_rects = []
+        if self._transcript_state() != self.drawn_transcript:
+            self._restore_background(screen, self.dialogue_area)
+            self._draw_dialogue(screen)
+            dirty_rects.append(self.dialogue_area)
+            self._redraw_overlapping(screen, self.dialogue_area, dirty_rects)
+        if self.main_input_box.dirty:
+            self.main_input_box.draw(screen)
+            dirty_rects.append(self.main_input_box.rect)
         for toggle in self.toggle_switches:
-            toggle.draw(screen)
-        
-        self._draw_sprites(screen)
+            if toggle.dirty:
+                self._restore_background(screen, toggle.rect)
+                toggle.draw(screen)
+                dirty_rects.append(toggle.rect)
+        if self.sprites_dirty:
+            self._restore_background(screen, self.sprite_area)
+            self._draw_sprites(screen)
+            dirty_rects.append(self.sprite_area)
+        if self._metrics_due:
+            self._restore_background(screen, self.metrics_area)
+            self._draw_metrics(screen)
+            dirty_rects.append(self.metrics_area)
+        return dirty_rects
+
+    def _draw_dialogue(self, screen):
+        """Draws only the transcript lines inside the viewport."""
+        screen.blit(self.dialogue_box_image, self.dialogue_area)
+        self.drawn_transcript = self._transcript_state()
+        x = self.dialogue_box_rect.x + self.text_padding
+        y = self.dialogue_box_rect.y + self.text_padding
+        for index, line in self._visible_lines():
+            screen.blit(self._layout(index).surface(line, self.font, self.text_color), (x, y))
+            y += self.line_height
 
     def _draw_sprites(self, screen):
-        sprite_positions = {
-            "Dr. Sam Iqbal": (760, 530),
-            "Amara Ndlovu": (860, 415),
-            "Jamie Reyes": (650, 415),
-            "Jordan Chex": (760, 305),
-        }
         for toggle in self.toggle_switches:
-            if toggle.is_on and toggle.label in self.sprites:
-                screen.blit(self.sprites[toggle.label], sprite_positions[toggle.label])
+            if toggle.is_on and toggle.key in self.seat_positions:
+                if toggle.key in self.builtin_seats:
+                    sprite = self.sprites[self.builtin_seats[toggle.key]]
+                else:
+                    sprite = self.custom_sprites[toggle.key]
+                screen.blit(sprite, self.seat_positions[toggle.key])
+        self.sprites_dirty = False
+
+    def _metrics_lines(self):
+        def ms(name, q):
+            return metrics.merged(name).quantile(q) * 1000
+        return [
+            f"LLM latency p50/p95: {ms('council_latency_seconds', 0.5):.0f} / {ms('council_latency_seconds', 0.95):.0f} ms",
+            f"First token p50/p95: {ms('council_ttft_seconds', 0.5):.0f} / {ms('council_ttft_seconds', 0.95):.0f} ms",
+            f"Queue wait p95: {ms('council_queue_wait_seconds', 0.95):.1f} ms",
+            f"SQLite op p95: {ms('sqlite_op_seconds', 0.95):.2f} ms",
+            f"Frame p50/p95: {ms('gui_frame_seconds', 0.5):.1f} / {ms('gui_frame_seconds', 0.95):.1f} ms",
+            "Calls ok/cached/error: {:.0f} / {:.0f} / {:.0f}".format(
+                *(metrics.total("council_calls_total", outcome=outcome) for outcome in ("ok", "cached", "error"))
+            ),
+        ]
+
+    def _draw_metrics(self, screen):
+        self.metrics_drawn_at = time.monotonic()
+        if not self.show_metrics:
+            return
+        panel = pygame.Surface(self.metrics_area.size, pygame.SRCALPHA)
+        panel.fill((0, 0, 0, 170))
+        y = 8
+        for line in self._metrics_lines():
+            panel.blit(self.metrics_font.render(line, True, (230, 230, 230)), (10, y))
+            y += self.metrics_font.get_linesize()
+        screen.blit(panel, self.metrics_area)
 
 # --- Utility Functions ---
 
+class TextLayout:
+    """Wrapped lines of one text, with each line's surface rendered on first use."""
+    def __init__(self, text, lines):
+        self.text = text
+        # (offset into text where the line starts, line text)
+        self.lines = lines
+        self.surfaces = [None] * len(lines)
+
+    def surface(self, index, font, color):
+        rendered = self.surfaces[index]
+        if rendered is None:
+            rendered = self.surfaces[index] = font.render(self.lines[index][1], True, color)
+        return rendered
+
+
+class TextLayoutCache:
+    """Bounded LRU of text layouts keyed by (text, font, width, colour).
+
+    Text that only grows at the end, such as a streamed reply, is laid out
+    incrementally: the previous layout for the same font, width and colour is
+    reused up to its last line, and only the tail is wrapped and rendered.
+    """
+    def __init__(self, capacity=64, word_cache_size=20000):
+        self.capacity = capacity
+        self.word_cache_size = word_cache_size
+        self.layouts = OrderedDict()
+        # Latest layout per (font, width, colour), the candidate for incremental layout
+        self.latest = {}
+        self.word_widths = {}
+
+    def _word_width(self, font, word):
+        key = (font, word)
+        width = self.word_widths.get(key)
+        if width is None:
+            if len(self.word_widths) >= self.word_cache_size:
+                self.word_widths.clear()
+            width = self.word_widths[key] = font.size(word)[0]
+        return width
+
+    def _wrap(self, text, font, max_width, base=0, force_first=False):
+        """Greedy word wrap; widths are summed per word instead of re-measuring each line.
+
+        force_first places the first word without a fit check, as happens to a
+        word carried over from an overflowing line.
+        """
+        space_width = self._word_width(font, " ")
+        lines = []
+        pos = 0
+        for para in text.split("\n"):
+            line, line_width, line_start = "", 0, pos
+            word_pos = pos
+            for word in para.split(" "):
+                if word:
+                    width = self._word_width(font, word)
+                    candidate_width = width if not line else line_width + space_width + width
+                    if candidate_width <= max_width or force_first:
+                        force_first = False
+                        if not line:
+                            line_start = word_pos
+                        line = word if not line else f"{line} {word}"
+                        line_width = candidate_width
+                    else:
+                        lines.append((base + (line_start if line else word_pos), line))
+                        line, line_width, line_start = word, width, word_pos
+                word_pos += len(word) + 1
+            if line:
+                lines.append((base + line_start, line))
+            pos += len(para) + 1
+        return lines
+
+    def get(self, text, font, max_width, color):
+        color = tuple(color)
+        key = (text, font, max_width, color)
+        layout = self.layouts.get(key)
+        if layout is not None:
+            self.layouts.move_to_end(key)
+            return layout
+
+        slot = (font, max_width, color)
+        previous = self.layouts.get(self.latest.get(slot))
+        if previous is not None and previous.lines and text.startswith(previous.text):
+            # Only the last line can change when text is appended; re-wrap from its start.
+            # An empty line in front of it shares its offset and is redone with it.
+            keep = len(previous.lines) - 1
+            restart = previous.lines[keep][0]
+            while keep and previous.lines[keep - 1][0] == restart:
+                keep -= 1
+            # The restart word was carried over unless it opens its paragraph
+            before = restart - 1
+            while before >= 0 and text[before] == " ":
+                before -= 1
+            carried_over = before >= 0 and text[before] != "\n"
+            tail = self._wrap(text[restart:], font, max_width, restart, force_first=carried_over)
+            layout = TextLayout(text, previous.lines[:keep] + tail)
+            layout.surfaces[:keep] = previous.surfaces[:keep]
+        else:
+            layout = TextLayout(text, self._wrap(text, font, max_width))
+
+        self.layouts[key] = layout
+        self.latest[slot] = key
+        if len(self.layouts) > self.capacity:
+            self.layouts.popitem(last=False)
+        return layout
+
+
+_text_layouts = TextLayoutCache()
+
 def render_wrapped_text(text, font, color, rect, surface):
     padding = 10
     x, y = rect.x + padding, rect.y + padding
     max_width = rect.width - 2 * padding
     line_height = font.get_linesize()
-    paragraphs = text.split("\n")
-
-    for para in paragraphs:
-        words = para.split(" ")
-        line = ""
-        for word in words:
-            candidate = f"{line} {word}".strip()
-            if font.size(candidate)[0] <= max_width:
-                line = candidate
-            else:
-                if y + line_height > rect.bottom - padding: return
-                surface.blit(font.render(line, True, color), (x, y))
-                y += line_height
-                line = word
-        if line:
-            if y + line_height > rect.bottom - padding: return
-            surface.blit(font.render(line, True, color), (x, y))
-            y += line_height
+    layout = _text_layouts.get(text, font, max_width, color)
 
+    for index in range(len(layout.lines)):
+        if y + line_height > rect.bottom - padding: return
+        surface.blit(layout.surface(index, font, color), (x, y))
+        y += line_height
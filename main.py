@@ -2,84 +2,100 @@
 
 import os
 import sys
-import uuid
-import pygame
-import csv
+import time
+
+# Cold-start clock: everything from here to the first frame counts as startup
+STARTED = time.perf_counter()
+
+from advocates import AdvocateRegistry, build_system_prompt, load_active_advocates, save_advocate
 from agent import JusticeAgent
-from config import AGENTS, AgentProfile
-from gui import ChatGUI, CreationForm
-
-CSV_FILE = "advocates.csv"
-
-# --- ADVOCATE DATA HANDLING ---
-
-def build_system_prompt(answers: dict) -> str:
-    """Constructs a coherent system prompt from user answers."""
-    return f"""
-You are an advocate for the justice framework known as '{answers['name']}'.
-Your Core Philosophy: {answers['definition']}
-Your Core Values: Your guiding principles are {answers['values']}.
-Your Personality: You are {answers['tone']}. You engage in dialogue with this personality, consistently reflecting your core philosophy and values in your reasoning and communication style.
-Your Goal: To represent the '{answers['name']}' perspective clearly and persuasively in the Council of Justice.
-""".strip()
-
-def save_to_csv(data: dict):
-    """Saves the custom advocate's data to a CSV file."""
-    uid = str(uuid.uuid4())
-    file_exists = os.path.isfile(CSV_FILE)
-    
-    row = {
-        "uid": uid,
-        "name": data['name'],
-        "definition": data['definition'],
-        "values": data['values'],
-        "tone": data['tone'],
-        "system_prompt": data['system_prompt']
-    }
-
-    with open(CSV_FILE, 'a', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=row.keys())
-        if not file_exists:
-            writer.writeheader()
-        writer.writerow(row)
-        
-    print(f"✅ Saved your advocate under ID: {uid}\n")
-    return uid
-
-def load_latest_advocate() -> AgentProfile | None:
-    """Loads the most recently created advocate from the CSV file."""
-    if not os.path.isfile(CSV_FILE):
-        return None
-    
-    with open(CSV_FILE, 'r', newline='', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        advocates = list(reader)
-        if not advocates:
-            return None
-        
-        latest_advocate_data = advocates[-1]
-        print(f"✅ Loaded most recent advocate: {latest_advocate_data['name']}")
-        return AgentProfile(
-            name=latest_advocate_data['name'],
-            system_prompt=latest_advocate_data['system_prompt']
-        )
+from backends import BACKENDS, DEFAULT_CASSETTE, make_backend, start_warm_up
+from cache import CACHE_MODES, ResponseCache
+from config import AGENTS, RATE_LIMIT_BURST, RATE_LIMIT_PER_SECOND, ROUND_TOKEN_BUDGET, AgentProfile
+from memory import ChatMemory
+from metrics import metrics
+from deliberation import DeliberationEngine
+from dispatcher import CouncilDispatcher, DEFAULT_MAX_CONCURRENCY
+# pygame and the GUI modules are imported inside main(), so CLI paths such
+# as --list_sessions (and anything importing this module) never load them
 
 # --- MAIN APPLICATION ---
 
+def list_sessions(memory: ChatMemory):
+    sessions = memory.list_sessions()
+    if not sessions:
+        print("No saved sessions.")
+    for session in sessions:
+        updated = time.strftime("%Y-%m-%d %H:%M", time.localtime(session.updated_at))
+        print(f"{session.id}  {updated}  {session.turn_count:>4} turns  {session.name or ''}")
+
+def find_advocates(registry: AdvocateRegistry, prefix: str):
+    found = registry.search(prefix) if prefix else registry.recent()
+    if not found:
+        print("No matching advocates.")
+    for info in found:
+        created = time.strftime("%Y-%m-%d %H:%M", time.localtime(info.created_at))
+        print(f"{info.uid}  {created}  {'seated' if info.active else '      '}  {info.name}")
+
+def seat_advocates(registry: AdvocateRegistry, keys: str, seated: bool):
+    """Seats (or unseats) comma-separated advocates, by uid or name, for this and later runs."""
+    for key in filter(None, keys.split(",")):
+        info = registry.resolve(key)
+        if info is None:
+            sys.exit(f"Unknown advocate: {key}")
+        registry.set_active(info.uid, seated)
+
+def resume_transcript(chat_gui, memory: ChatMemory, session_id: str, limit: int = 50):
+    """Shows the tail of a resumed session in the transcript."""
+    for turn in memory.get_last(session_id, limit, minutes=None):
+        speaker = "You" if turn.role == "user" else turn.agent
+        chat_gui.chat_history.append(f"{speaker}: {turn.content}")
+
+def interrupt(chat_gui, stopped_agents):
+    """Marks the replies of cancelled calls as cut off in the transcript."""
+    for agent in stopped_agents:
+        chat_gui.interrupt_reply(chat_gui.key_of(agent))
+
+# Longest the idle loop sleeps before checking for work again
+IDLE_WAKEUP_MS = 250
+
 def main():
     import argparse
     parser = argparse.ArgumentParser()
     parser.add_argument("--max_tokens", type=int, default=100, help="Maximum number of tokens for agent responses.")
+    parser.add_argument("--max_concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY, help="Maximum number of agents querying the LLM at the same time.")
+    parser.add_argument("--no_stream", action="store_true", help="Wait for complete replies instead of streaming them into the dialogue box.")
+    parser.add_argument("--cache", choices=CACHE_MODES, default="off", help="Response cache: 'on' reads and stores replies, 'readonly' only serves stored ones.")
+    parser.add_argument("--backend", choices=BACKENDS, default="gemini", help="LLM backend: Gemini, an offline fake, or a cassette to record to / replay from.")
+    parser.add_argument("--cassette", default=DEFAULT_CASSETTE, help="Cassette file used by the record and replay backends.")
+    parser.add_argument("--hedge_after", type=float, default=None, help="Seconds before a slow Gemini call gets a hedged duplicate request (off by default).")
+    parser.add_argument("--rate_limit", type=float, default=RATE_LIMIT_PER_SECOND, help="Gemini requests per second allowed for this API key; throttled calls recover up to this rate.")
+    parser.add_argument("--rate_burst", type=int, default=RATE_LIMIT_BURST, help="Gemini requests allowed at once on top of --rate_limit.")
+    parser.add_argument("--fps", type=int, default=60, help="Frame-rate cap while the window is changing.")
+    parser.add_argument("--rounds", type=int, default=1, help="Rounds of council debate per message; above 1 agents respond to each other.")
+    parser.add_argument("--round_token_budget", type=int, default=ROUND_TOKEN_BUDGET, help="Output tokens shared by all agents in one debate round.")
+    parser.add_argument("--session", help="Name (or id) of the case to open; it is resumed if it already exists.")
+    parser.add_argument("--list_sessions", action="store_true", help="List saved sessions and exit.")
+    parser.add_argument("--find_advocates", nargs="?", const="", metavar="PREFIX", help="List saved advocates (newest first, or those whose name starts with PREFIX) and exit.")
+    parser.add_argument("--seat", default="", help="Comma-separated advocate uids or names to seat in the council.")
+    parser.add_argument("--unseat", default="", help="Comma-separated advocate uids or names to remove from the council.")
+    parser.add_argument("--startup_probe", action="store_true", help="Print cold-start timings and exit once the first frame is on screen.")
+    parser.add_argument("--metrics_out", help="Write call, SQLite and frame metrics here on exit (.prom for Prometheus text, JSON otherwise). F3 shows them live.")
     args = parser.parse_args()
 
-    pygame.init()
-    pygame.key.set_repeat(300, 30)
-    
-    SCREEN_WIDTH, SCREEN_HEIGHT = 1560, 878
-    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    if args.list_sessions:
+        list_sessions(ChatMemory.shared())
+        return
+    registry = AdvocateRegistry.shared()
+    if args.find_advocates is not None:
+        find_advocates(registry, args.find_advocates)
+        return
+    seat_advocates(registry, args.seat, True)
+    seat_advocates(registry, args.unseat, False)
 
     # --- Initial State Setup ---
-    if not os.getenv("GOOGLE_API_KEY") and not os.getenv("OPENAI_API_KEY"):
+    needs_key = args.backend in ("gemini", "record")
+    if needs_key and not os.getenv("GOOGLE_API_KEY") and not os.getenv("OPENAI_API_KEY"):
         print("""
         ERROR: API KEY NOT FOUND.
         Please set either the GOOGLE_API_KEY or OPENAI_API_KEY environment variable in your terminal.
@@ -89,19 +105,58 @@ def main():
         """)
         sys.exit(1)
 
-    agents = {key: JusticeAgent(profile) for key, profile in AGENTS.items()}
-    custom_advocate_profile = load_latest_advocate()
-    if custom_advocate_profile:
-        agents["custom"] = JusticeAgent(custom_advocate_profile)
+    imports_done = time.perf_counter()
+    import pygame
+    from assets import assets
+    from gui import CHAT_ASSETS, ChatGUI, CreationForm
+    gui_imported = time.perf_counter()
+
+    pygame.init()
+    pygame.key.set_repeat(300, 30)
+    # Start decoding images now; the first frame shows placeholders for any still loading
+    assets.preload(CHAT_ASSETS)
+    
+    SCREEN_WIDTH, SCREEN_HEIGHT = 1560, 878
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("Justice Council")
+
+    # One user's own cases: related turns may come from any of them
+    memory = ChatMemory.shared(recall_scope="all")
+    cache = ResponseCache(mode=args.cache) if args.cache != "off" else None
+    backend = make_backend(args.backend, args.cassette, hedge_after=args.hedge_after,
+                           rate_limit=args.rate_limit, rate_burst=args.rate_burst)
+    agents = {key: JusticeAgent(profile, cache=cache, backend=backend) for key, profile in AGENTS.items()}
+    # Only seated advocates are loaded; the rest of the registry stays on disk
+    for uid, profile in load_active_advocates():
+        agents[f"custom:{uid}"] = JusticeAgent(profile, cache=cache, backend=backend)
+    # The Gemini SDK import and client setup happen off the main thread, while the window comes up
+    start_warm_up(backend, [agent.profile.system_prompt for agent in agents.values()], args.max_tokens)
 
     app_state = "CHAT"
-    chat_gui = ChatGUI(agents, SCREEN_WIDTH, SCREEN_HEIGHT)
+    chat_gui = ChatGUI(agents, SCREEN_WIDTH, SCREEN_HEIGHT, memory)
+    # One session per chat window (or per named case), so agents see earlier turns.
+    # An unnamed one is only created with its first message, so idle launches leave no trace
+    session_id = None
+    if args.session:
+        session_id = memory.open_session(args.session)
+        resume_transcript(chat_gui, memory, session_id)
     creation_form = CreationForm(SCREEN_WIDTH, SCREEN_HEIGHT)
+    dispatcher = CouncilDispatcher(args.max_concurrency, stream=not args.no_stream)
 
     # --- Main Loop ---
+    clock = pygame.time.Clock()
     running = True
+    first_frame = None
     while running:
-        events = pygame.event.get()
+        active_view = chat_gui if app_state == "CHAT" else creation_form
+        if not dispatcher.busy and not active_view.dirty:
+            # Nothing is changing: sleep until input arrives instead of spinning
+            first = pygame.event.wait(IDLE_WAKEUP_MS)
+            events = [first] if first.type != pygame.NOEVENT else []
+            events += pygame.event.get()
+        else:
+            events = pygame.event.get()
+        frame_start = time.perf_counter()
         for event in events:
             if event.type == pygame.QUIT:
                 running = False
@@ -112,6 +167,7 @@ def main():
                 chat_gui.handle_event(event)
                 if chat_gui.create_advocate_button.is_clicked(event):
                     app_state = "CREATION"
+                    creation_form.invalidate()
                     break
                 if event.type == pygame.KEYDOWN and chat_gui.main_input_box.active:
                     if event.key == pygame.K_RETURN:
@@ -126,21 +182,38 @@ def main():
                             chat_gui.chat_history.append("No agents are active.")
                             continue
 
-                        session_id = str(uuid.uuid4())
-                        for agent in active_agents:
-                            agent.memory.add(session_id, "User", "user", user_input)
+                        # A new message supersedes the turn still in flight; its late replies are dropped
+                        interrupt(chat_gui, dispatcher.cancel())
 
-                        custom_agent = agents.get("custom")
-                        if custom_agent and custom_agent in active_agents:
-                            reply = custom_agent.generate_response(session_id, max_tokens=args.max_tokens)
-                            chat_gui.chat_history.append(f"{custom_agent.profile.name}: {reply}")
+                        # Agents share one store, so the user's turn is recorded once
+                        if session_id is None:
+                            session_id = memory.create_session()
+                        memory.add(session_id, "User", "user", user_input)
 
-                        for agent in active_agents:
-                            if not custom_agent or agent.profile.name != custom_agent.profile.name:
-                                cross_reply = agent.generate_response(session_id, max_tokens=args.max_tokens)
-                                chat_gui.chat_history.append(f"{agent.profile.name}: {cross_reply}")
-            
-            chat_gui.draw(screen)
+                        # All agents answer concurrently; replies are collected below as they land.
+                        if args.rounds > 1:
+                            engine = DeliberationEngine(active_agents, rounds=args.rounds,
+                                                        round_token_budget=args.round_token_budget,
+                                                        max_tokens=args.max_tokens, executor=dispatcher.executor)
+                            dispatcher.submit_deliberation(engine, session_id)
+                        else:
+                            dispatcher.submit_turn(active_agents, session_id, max_tokens=args.max_tokens)
+
+            # Switching an agent off mid-turn cancels its call
+            if events and dispatcher.busy:
+                switched_off = [agent for agent, toggle in zip(chat_gui.agents.values(), chat_gui.toggle_switches)
+                                if not toggle.is_on]
+                if switched_off:
+                    interrupt(chat_gui, dispatcher.cancel(switched_off))
+
+            for agent, text, done in dispatcher.poll():
+                key = chat_gui.key_of(agent)
+                if text:
+                    chat_gui.append_reply(key, text)
+                if done:
+                    chat_gui.finish_reply(key)
+
+            dirty_rects = chat_gui.draw(screen)
 
         elif app_state == "CREATION":
             # --- CREATION STATE LOGIC ---
@@ -151,27 +224,42 @@ def main():
                     if all(new_advocate_data.values()):
                         system_prompt = build_system_prompt(new_advocate_data)
                         new_advocate_data['system_prompt'] = system_prompt
-                        save_to_csv(new_advocate_data)
+                        uid = save_advocate(new_advocate_data)
                         
-                        # Create and add the new agent
+                        # Seat the new agent alongside any other custom advocates
                         new_profile = AgentProfile(name=new_advocate_data['name'], system_prompt=system_prompt)
-                        agents["custom"] = JusticeAgent(new_profile)
+                        agents[f"custom:{uid}"] = JusticeAgent(new_profile, cache=cache, backend=backend)
                         
-                        # Re-initialize the chat GUI with the new agent list
-                        chat_gui = ChatGUI(agents, SCREEN_WIDTH, SCREEN_HEIGHT)
+                        # Update the chat GUI in place with the new agent list
+                        chat_gui.set_agents(agents)
                         app_state = "CHAT"
                         break
             
-            creation_form.draw(screen)
+            dirty_rects = creation_form.draw(screen)
 
-        pygame.display.flip()
+        if dirty_rects:
+            pygame.display.update(dirty_rects)
+            metrics.observe("gui_frame_seconds", time.perf_counter() - frame_start)
+            if first_frame is None:
+                first_frame = time.perf_counter()
+                metrics.observe("startup_first_frame_seconds", first_frame - STARTED)
+                if args.startup_probe:
+                    print(f"Startup: imports {(imports_done - STARTED) * 1e3:.0f} ms, "
+                          f"pygame+gui {(gui_imported - imports_done) * 1e3:.0f} ms, "
+                          f"first frame {(first_frame - STARTED) * 1e3:.0f} ms")
+                    running = False
+        clock.tick(args.fps)
 
     # --- Shutdown ---
-    if agents:
-        # Clear the database on exit
-        any_agent = next(iter(agents.values()))
-        any_agent.memory.clear_all()
-        print(" DB cleared.")
+    # Calls still in flight are cancelled and given a moment to stop before memory closes
+    dispatcher.shutdown(wait=False)
+    memory.prune()
+    memory.close()
+    if cache:
+        print(f" Response cache: {cache.stats()}")
+        cache.close()
+    if args.metrics_out:
+        metrics.export(args.metrics_out)
 
     pygame.quit()
 
@@ -1,7 +1,27 @@
 # justice_agents/memory.py
+import atexit
+import os
 import sqlite3
+import threading
 import time
-from typing import List, Dict
+import uuid
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import List, Dict, NamedTuple
+
+from config import (
+    MEMORY_MAX_BYTES,
+    MEMORY_MAX_ROWS,
+    MEMORY_PRUNE_INTERVAL,
+    MEMORY_RETENTION_SECONDS,
+    RECALL_ENABLED,
+    RECALL_SCOPE,
+    RECALL_TOP_K,
+    SESSION_CACHE_SESSIONS,
+    SESSION_CACHE_TURNS,
+)
+from metrics import metrics
+from recall import RecallIndex, recall_available
 
 _SCHEMA = """
 CREATE TABLE IF NOT EXISTS messages (
@@ -12,40 +32,618 @@ CREATE TABLE IF NOT EXISTS messages (
   content TEXT NOT NULL,
   created_at REAL NOT NULL
 );
-CREATE INDEX IF NOT EXISTS idx_session_time
-  ON messages(session_id, created_at);
+DROP INDEX IF EXISTS idx_session_time;
+-- Covers get_last: rows are found and returned without touching the table.
+CREATE INDEX IF NOT EXISTS idx_session_recent
+  ON messages(session_id, created_at, agent, role, content);
+-- Serves get_range: a session's turns between two ids, without walking other sessions' rows.
+CREATE INDEX IF NOT EXISTS idx_session_id ON messages(session_id, id);
+-- Rolling summary of the turns that have left a session's context window.
+CREATE TABLE IF NOT EXISTS summaries (
+  session_id TEXT PRIMARY KEY,
+  summary TEXT NOT NULL,
+  last_id INTEGER NOT NULL,
+  updated_at REAL NOT NULL
+);
+-- Chat transcript entries paged out of the GUI's in-memory window.
+CREATE TABLE IF NOT EXISTS transcript (
+  view_id TEXT NOT NULL,
+  seq INTEGER NOT NULL,
+  text TEXT NOT NULL,
+  created_at REAL NOT NULL,
+  PRIMARY KEY (view_id, seq)
+) WITHOUT ROWID;
+-- One row per chat or named case; messages reference it by session_id.
+CREATE TABLE IF NOT EXISTS sessions (
+  id TEXT PRIMARY KEY,
+  name TEXT UNIQUE,
+  created_at REAL NOT NULL,
+  updated_at REAL NOT NULL,
+  turn_count INTEGER NOT NULL DEFAULT 0
+);
 """
 
+
+class Turn(NamedTuple):
+    """One stored message, as returned by ChatMemory.get_last."""
+    id: int
+    agent: str
+    role: str
+    content: str
+
+
+class SessionInfo(NamedTuple):
+    id: str
+    name: str | None
+    created_at: float
+    updated_at: float
+    turn_count: int
+
+
+class _HotSession:
+    """The newest turns of one session, kept in RAM alongside their timestamps."""
+    __slots__ = ("turns", "complete", "summary")
+
+    def __init__(self, rows, complete):
+        self.turns = deque(rows, maxlen=SESSION_CACHE_TURNS)
+        # True when the deque holds every turn the session has
+        self.complete = complete
+        # (summary, last_id) once read or written; None until then
+        self.summary = None
+
+# Inserts are held this long so that replies landing together share one commit.
+FLUSH_INTERVAL = 0.05
+# Rows deleted per statement when trimming to the byte cap.
+_PRUNE_CHUNK = 500
+# Seconds after opening before the first retention pass, and before the
+# recall index is opened (its NumPy import stays out of the cold start).
+_STARTUP_PRUNE_DELAY = 5.0
+# Messages embedded per step when the recall index catches up with the table.
+_RECALL_BACKFILL_CHUNK = 2000
+
 class ChatMemory:
-    """SQLite-backed memory (~30-minute rolling window)."""
-    def __init__(self, db_path="./justice_memory.db"):
+    """SQLite-backed memory of council sessions.
+
+    One store is shared per database file (see `shared`). Writes are buffered
+    and committed by a background flusher, so a burst of inserts costs a
+    single transaction; every read flushes first, so callers always see
+    their own writes. The same thread periodically prunes expired rows and
+    trims the table to its row and byte caps.
+
+    When NumPy is installed, every committed message is also added to a
+    RecallIndex beside the database (see `related`). `recall_scope` says
+    whether prompts built on this store may recall other sessions' turns.
+    """
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, db_path="./justice_memory.db", flush_interval: float = FLUSH_INTERVAL,
+                 retention_seconds: float = MEMORY_RETENTION_SECONDS, max_rows: int = MEMORY_MAX_ROWS,
+                 max_bytes: int = MEMORY_MAX_BYTES, prune_interval: float = MEMORY_PRUNE_INTERVAL,
+                 recall: bool = RECALL_ENABLED, recall_scope: str = RECALL_SCOPE):
         self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        # Incremental auto-vacuum lets pruning hand pages back to the OS
+        # without a full VACUUM. Existing files need one VACUUM to switch over.
+        if self.conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            self.conn.execute("VACUUM")
+        # WAL lets readers proceed while a commit is in progress, and
+        # synchronous=NORMAL drops the per-commit fsync of the WAL file.
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
         self.conn.executescript(_SCHEMA)
         self.conn.commit()
-        self.clear_all()
+        # Agents run on worker threads; one writer lock serialises the connection.
+        self.lock = threading.RLock()
+        self.flush_interval = flush_interval
+        self.retention_seconds = retention_seconds
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.prune_interval = prune_interval
+        # The first prune waits out startup so it never competes with the first frame
+        self._next_prune = time.monotonic() + min(prune_interval, _STARTUP_PRUNE_DELAY)
+        self.pending = []
+        # session_id -> _HotSession, least recently used first
+        self.hot = OrderedDict()
+        self._batch_depth = 0
+        self._wakeup = threading.Condition(self.lock)
+        self._closed = False
+        self._flusher = threading.Thread(target=self._flush_loop, name="memory-flush", daemon=True)
+        self._flusher.start()
+        self.recall = None
+        # "session" recalls turns of the prompt's own session only; "all" searches every session
+        self.recall_scope = recall_scope
+        self.recall_path = os.path.splitext(db_path)[0] + ".recall"
+        self._recall_lock = threading.Lock()
+        self._recall_opener = None
+        if recall and recall_available():
+            self._recall_opener = threading.Timer(_STARTUP_PRUNE_DELAY, self.open_recall)
+            self._recall_opener.daemon = True
+            self._recall_opener.start()
+
+    @classmethod
+    def shared(cls, db_path="./justice_memory.db", **options) -> "ChatMemory":
+        """Returns the process-wide store for db_path, opening it on first use.
+
+        `options` go to the constructor, so they only apply to the call that opens the store.
+        """
+        key = os.path.abspath(db_path)
+        with cls._instances_lock:
+            memory = cls._instances.get(key)
+            if memory is None or memory._closed:
+                memory = cls._instances[key] = cls(db_path, **options)
+            return memory
+
+    @classmethod
+    def close_all(cls):
+        with cls._instances_lock:
+            instances = list(cls._instances.values())
+            cls._instances.clear()
+        for memory in instances:
+            memory.close()
+
+    def _flush_loop(self):
+        with self.lock:
+            while not self._closed:
+                if time.monotonic() >= self._next_prune and not self._batch_depth:
+                    self._flush_locked()
+                    with metrics.timer("sqlite_op_seconds", op="prune"):
+                        self._prune_locked()
+                    self._next_prune = time.monotonic() + self.prune_interval
+                    continue
+                if not self.pending or self._batch_depth:
+                    self._wakeup.wait(max(0.0, self._next_prune - time.monotonic()))
+                    continue
+                # Give the rest of the burst a moment to arrive, then commit it together
+                deadline = time.monotonic() + self.flush_interval
+                while not self._closed and (remaining := deadline - time.monotonic()) > 0:
+                    self._wakeup.wait(remaining)
+                if not self._batch_depth:
+                    self._flush_locked()
+
+    def _flush_locked(self):
+        if not self.pending:
+            return
+        rows, self.pending = self.pending, []
+        with metrics.timer("sqlite_op_seconds", op="flush"), self.conn:
+            self.conn.executemany(
+                "INSERT INTO messages (session_id, agent, role, content, created_at) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            # One transaction holds the write lock, so the batch got consecutive ids
+            last_id = self.conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+            touched = {}
+            for offset, (session_id, agent, role, content, created_at) in enumerate(rows):
+                touched[session_id] = (touched.get(session_id, (0, 0))[0] + 1, created_at)
+                hot = self.hot.get(session_id)
+                if hot is not None:
+                    turn = Turn(last_id - len(rows) + 1 + offset, agent, role, content)
+                    hot.turns.append((turn, created_at))
+                    if len(hot.turns) == hot.turns.maxlen:
+                        hot.complete = False
+            self.conn.executemany(
+                "UPDATE sessions SET turn_count = turn_count + ?, updated_at = ? WHERE id = ?",
+                [(count, updated_at, session_id) for session_id, (count, updated_at) in touched.items()],
+            )
+        if self.recall is not None:
+            self.recall.add(list(range(last_id - len(rows) + 1, last_id + 1)), [row[3] for row in rows],
+                            [row[0] for row in rows])
+
+    def flush(self):
+        """Commits every buffered insert in a single transaction."""
+        with self.lock:
+            self._flush_locked()
+
+    @contextmanager
+    def batch(self):
+        """Groups every add() inside the block into one transaction."""
+        with self.lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self.lock:
+                self._batch_depth -= 1
+                if not self._batch_depth:
+                    self._flush_locked()
+
+    def _data_bytes(self) -> int:
+        page_size = self.conn.execute("PRAGMA page_size").fetchone()[0]
+        used = (self.conn.execute("PRAGMA page_count").fetchone()[0]
+                - self.conn.execute("PRAGMA freelist_count").fetchone()[0])
+        return used * page_size
+
+    def _prune_locked(self, now: float = None) -> int:
+        now = time.time() if now is None else now
+        deleted = 0
+        # Ids of every removed message, so the recall index can drop exactly those rows
+        removed_ids = []
+        # Named cases are meant to be resumed, so age alone never removes them;
+        # only the row and byte caps below can trim their oldest turns
+        with self.conn:
+            removed_ids += (row[0] for row in self.conn.execute(
+                """DELETE FROM messages WHERE created_at < ?
+                   AND session_id NOT IN (SELECT id FROM sessions WHERE name IS NOT NULL)
+                   RETURNING id""",
+                (now - self.retention_seconds,),
+            ))
+            deleted += self.conn.execute(
+                """DELETE FROM summaries WHERE updated_at < ?
+                   AND session_id NOT IN (SELECT id FROM sessions WHERE name IS NOT NULL)""",
+                (now - self.retention_seconds,),
+            ).rowcount
+            self.conn.execute(
+                "DELETE FROM transcript WHERE created_at < ?",
+                (now - self.retention_seconds,),
+            )
+            self.conn.execute(
+                "DELETE FROM sessions WHERE updated_at < ? AND name IS NULL",
+                (now - self.retention_seconds,),
+            )
+            # AUTOINCREMENT ids follow insertion order, so the row cap keeps the newest ids
+            removed_ids += (row[0] for row in self.conn.execute(
+                """DELETE FROM messages WHERE id <= (
+                     SELECT id FROM messages ORDER BY id DESC LIMIT 1 OFFSET ?)
+                   RETURNING id""",
+                (self.max_rows,),
+            ))
+        while self._data_bytes() > self.max_bytes:
+            with self.conn:
+                removed = [row[0] for row in self.conn.execute(
+                    "DELETE FROM messages WHERE id IN (SELECT id FROM messages ORDER BY id LIMIT ?) RETURNING id",
+                    (_PRUNE_CHUNK,),
+                )]
+            if not removed:
+                break
+            removed_ids += removed
+        deleted += len(removed_ids)
+        if deleted:
+            self.hot.clear()
+            self.conn.execute("PRAGMA incremental_vacuum")
+        if removed_ids and self.recall is not None:
+            # Named sessions keep their old turns, so the survivors are not simply the newest
+            # ids: the index is told exactly which messages went
+            self.recall.discard(removed_ids)
+        return deleted
+
+    def prune(self, now: float = None) -> int:
+        """Applies the retention policy now; returns the number of rows removed."""
+        with self.lock:
+            self._flush_locked()
+            with metrics.timer("sqlite_op_seconds", op="prune"):
+                return self._prune_locked(now)
 
     def clear_all(self):
         """Clears all messages from the database."""
-        self.conn.execute("DELETE FROM messages")
-        self.conn.commit()
+        with self.lock:
+            self.pending = []
+            self.hot.clear()
+            self.conn.execute("DELETE FROM messages")
+            self.conn.execute("DELETE FROM summaries")
+            self.conn.execute("DELETE FROM transcript")
+            self.conn.execute("DELETE FROM sessions")
+            self.conn.commit()
+            if self.recall is not None:
+                self.recall.clear()
 
     def add(self, session_id: str, agent: str, role: str, content: str):
-        self.conn.execute(
-            "INSERT INTO messages (session_id, agent, role, content, created_at) VALUES (?, ?, ?, ?, ?)",
-            (session_id, agent, role, content, time.time()),
-        )
-        self.conn.commit()
+        with self.lock:
+            self.pending.append((session_id, agent, role, content, time.time()))
+            self._wakeup.notify()
 
     def get_recent(self, session_id: str, minutes: int = 30) -> List[Dict[str, str]]:
         cutoff = time.time() - minutes * 60
-        rows = self.conn.execute(
-            """SELECT agent, role, content FROM messages
-               WHERE session_id = ? AND created_at >= ?
-               ORDER BY created_at ASC""",
-            (session_id, cutoff),
-        ).fetchall()
+        with self.lock:
+            self._flush_locked()
+            rows = self.conn.execute(
+                """SELECT agent, role, content FROM messages
+                   WHERE session_id = ? AND created_at >= ?
+                   ORDER BY created_at ASC""",
+                (session_id, cutoff),
+            ).fetchall()
         return [{"agent": a, "role": r, "content": c} for (a, r, c) in rows]
 
+    def get_last(self, session_id: str, limit: int, minutes: int | None = 30) -> List[Turn]:
+        """Returns the newest `limit` turns of a session, oldest first.
+
+        Turns from the last `minutes` only; None means no time limit. Recent
+        turns of active sessions are served from RAM; otherwise the window is
+        cut in SQL, so the cost depends on `limit` rather than on how long the
+        session has run.
+        """
+        cutoff = time.time() - minutes * 60 if minutes is not None else 0.0
+        with self.lock:
+            self._flush_locked()
+            hot = self.hot.get(session_id)
+            if hot is None and limit <= SESSION_CACHE_TURNS:
+                hot = self._load_hot(session_id)
+            if hot is not None and (hot.complete or len(hot.turns) >= limit):
+                self.hot.move_to_end(session_id)
+                turns = [turn for turn, created_at in hot.turns if created_at >= cutoff]
+                return turns[-limit:] if limit else []
+            with metrics.timer("sqlite_op_seconds", op="get_last"):
+                rows = self.conn.execute(
+                    """SELECT id, agent, role, content FROM messages
+                       WHERE session_id = ? AND created_at >= ?
+                       ORDER BY created_at DESC LIMIT ?""",
+                    (session_id, cutoff, limit),
+                ).fetchall()
+        rows.reverse()
+        return list(map(Turn._make, rows))
+
+    def _load_hot(self, session_id: str) -> _HotSession:
+        with metrics.timer("sqlite_op_seconds", op="load_hot"):
+            rows = self.conn.execute(
+                """SELECT id, agent, role, content, created_at FROM messages
+                   WHERE session_id = ?
+                   ORDER BY created_at DESC LIMIT ?""",
+                (session_id, SESSION_CACHE_TURNS),
+            ).fetchall()
+        rows.reverse()
+        hot = _HotSession(
+            ((Turn(*row[:4]), row[4]) for row in rows),
+            complete=len(rows) < SESSION_CACHE_TURNS,
+        )
+        self.hot[session_id] = hot
+        if len(self.hot) > SESSION_CACHE_SESSIONS:
+            self.hot.popitem(last=False)
+        return hot
+
+    # --- Sessions ---
+
+    def create_session(self, name: str = None) -> str:
+        """Registers a new session and returns its id."""
+        session_id = str(uuid.uuid4())
+        now = time.time()
+        with self.lock, metrics.timer("sqlite_op_seconds", op="create_session"):
+            with self.conn:
+                self.conn.execute(
+                    "INSERT INTO sessions (id, name, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                    (session_id, name, now, now),
+                )
+        return session_id
+
+    def find_session(self, key: str) -> SessionInfo | None:
+        """Looks a session up by id or by name."""
+        with self.lock:
+            self._flush_locked()
+            row = self.conn.execute(
+                """SELECT id, name, created_at, updated_at, turn_count FROM sessions
+                   WHERE id = ? OR name = ?""",
+                (key, key),
+            ).fetchone()
+        return SessionInfo._make(row) if row else None
+
+    def get_session(self, session_id: str) -> SessionInfo | None:
+        """Looks a session up by id only, for callers that must not accept a name."""
+        with self.lock:
+            self._flush_locked()
+            row = self.conn.execute(
+                "SELECT id, name, created_at, updated_at, turn_count FROM sessions WHERE id = ?", (session_id,),
+            ).fetchone()
+        return SessionInfo._make(row) if row else None
+
+    def open_session(self, name: str) -> str:
+        """Returns the id of the session called `name`, creating it if needed."""
+        session = self.find_session(name)
+        return session.id if session else self.create_session(name)
+
+    def list_sessions(self, limit: int = 50) -> List[SessionInfo]:
+        """Returns the most recently active sessions first."""
+        with self.lock:
+            self._flush_locked()
+            rows = self.conn.execute(
+                """SELECT id, name, created_at, updated_at, turn_count FROM sessions
+                   ORDER BY updated_at DESC LIMIT ?""",
+                (limit,),
+            ).fetchall()
+        return list(map(SessionInfo._make, rows))
+
+    def get_range(self, session_id: str, after_id: int, before_id: int) -> List[Turn]:
+        """Returns the turns of a session with after_id < id < before_id, oldest first.
+
+        The (session_id, id) index makes this cost the number of turns in
+        the gap, whatever other sessions wrote in between.
+        """
+        with self.lock:
+            self._flush_locked()
+            with metrics.timer("sqlite_op_seconds", op="get_range"):
+                rows = self.conn.execute(
+                    """SELECT id, agent, role, content FROM messages INDEXED BY idx_session_id
+                       WHERE session_id = ? AND id > ? AND id < ?
+                       ORDER BY id ASC""",
+                    (session_id, after_id, before_id),
+                ).fetchall()
+        return list(map(Turn._make, rows))
+
+    def get_summary(self, session_id: str) -> tuple[str, int]:
+        """Returns (summary, last_id), where the summary covers every turn up to last_id.
+
+        Served from RAM for sessions whose recent turns are cached.
+        """
+        with self.lock:
+            hot = self.hot.get(session_id)
+            if hot is not None and hot.summary is not None:
+                return hot.summary
+            with metrics.timer("sqlite_op_seconds", op="get_summary"):
+                row = self.conn.execute(
+                    "SELECT summary, last_id FROM summaries WHERE session_id = ?",
+                    (session_id,),
+                ).fetchone()
+            summary = tuple(row) if row else ("", 0)
+            if hot is not None:
+                hot.summary = summary
+        return summary
+
+    def set_summary(self, session_id: str, summary: str, last_id: int):
+        """Stores a session's summary unless a newer one is already saved."""
+        with self.lock, metrics.timer("sqlite_op_seconds", op="set_summary"):
+            with self.conn:
+                self.conn.execute(
+                    """INSERT INTO summaries (session_id, summary, last_id, updated_at)
+                       VALUES (?, ?, ?, ?)
+                       ON CONFLICT(session_id) DO UPDATE SET
+                         summary = excluded.summary,
+                         last_id = excluded.last_id,
+                         updated_at = excluded.updated_at
+                       WHERE excluded.last_id > summaries.last_id""",
+                    (session_id, summary, last_id, time.time()),
+                )
+            hot = self.hot.get(session_id)
+            if hot is not None and hot.summary is not None and last_id > hot.summary[1]:
+                hot.summary = (summary, last_id)
+
+    def save_transcript(self, view_id: str, rows: list[tuple[int, str]]):
+        """Stores (seq, text) transcript entries for a view, replacing any with the same seq."""
+        now = time.time()
+        with self.lock, metrics.timer("sqlite_op_seconds", op="save_transcript"):
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO transcript (view_id, seq, text, created_at) VALUES (?, ?, ?, ?)",
+                    [(view_id, seq, text, now) for seq, text in rows],
+                )
+
+    def load_transcript(self, view_id: str, start: int, end: int) -> list[tuple[int, str]]:
+        """Returns the (seq, text) entries of a view with start <= seq < end."""
+        with self.lock, metrics.timer("sqlite_op_seconds", op="load_transcript"):
+            return self.conn.execute(
+                """SELECT seq, text FROM transcript
+                   WHERE view_id = ? AND seq >= ? AND seq < ?
+                   ORDER BY seq""",
+                (view_id, start, end),
+            ).fetchall()
+
     def delete_session(self, session_id: str):
-        self.conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
-        self.conn.commit()
+        with self.lock:
+            self.pending = [row for row in self.pending if row[0] != session_id]
+            self.hot.pop(session_id, None)
+            self.conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            self.conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+            self.conn.execute("DELETE FROM summaries WHERE session_id = ?", (session_id,))
+            self.conn.commit()
+
+    def merge(self, db_path: str) -> int:
+        """Copies every session, message and summary of another store file into this one.
+
+        Used to fold the per-process shards of a sharded batch run back
+        together. Message ids are shifted past this store's newest id, so
+        summaries keep pointing at the right turns. Returns the number of
+        messages copied.
+        """
+        with self.lock, metrics.timer("sqlite_op_seconds", op="merge"):
+            self._flush_locked()
+            self.hot.clear()
+            offset = self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM messages").fetchone()[0]
+            self.conn.execute("ATTACH DATABASE ? AS shard", (db_path,))
+            try:
+                with self.conn:
+                    copied = self.conn.execute(
+                        """INSERT INTO messages (id, session_id, agent, role, content, created_at)
+                           SELECT id + ?, session_id, agent, role, content, created_at
+                           FROM shard.messages ORDER BY id""",
+                        (offset,),
+                    ).rowcount
+                    self.conn.execute("INSERT OR IGNORE INTO sessions SELECT * FROM shard.sessions")
+                    self.conn.execute(
+                        """INSERT OR REPLACE INTO summaries (session_id, summary, last_id, updated_at)
+                           SELECT session_id, summary, last_id + ?, updated_at FROM shard.summaries""",
+                        (offset,),
+                    )
+                newest = self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM messages").fetchone()[0]
+            finally:
+                self.conn.execute("DETACH DATABASE shard")
+        if self.recall is not None:
+            self._embed_range(self.recall, offset, newest)
+        return copied
+
+    # --- Recall ---
+
+    def open_recall(self) -> RecallIndex | None:
+        """Opens the recall index and embeds any messages it has not seen yet.
+
+        Called once on a timer thread shortly after startup. The catch-up
+        takes the store lock one chunk at a time, so reads and writes carry
+        on meanwhile; messages committed after the index is attached are
+        added by the flusher as usual.
+        """
+        with self._recall_lock:
+            if self.recall is not None or self._closed:
+                return self.recall
+            index = RecallIndex(self.recall_path)
+            after = index.last_id
+            with self.lock:
+                self._flush_locked()
+                newest, oldest = self.conn.execute(
+                    "SELECT COALESCE(MAX(id), 0), COALESCE(MIN(id), 0) FROM messages"
+                ).fetchone()
+                if after > newest:
+                    # The index outlived the database it was built from
+                    index.clear()
+                    after = 0
+                self.recall = index
+            index.discard_below(oldest)
+            self._embed_range(index, after, newest)
+            return index
+
+    def _embed_range(self, index: RecallIndex, after: int, newest: int):
+        """Adds the stored messages with after < id <= newest to the index, a chunk at a time."""
+        while after < newest and not self._closed:
+            with self.lock:
+                rows = self.conn.execute(
+                    "SELECT id, content, session_id FROM messages WHERE id > ? AND id <= ? ORDER BY id LIMIT ?",
+                    (after, newest, _RECALL_BACKFILL_CHUNK),
+                ).fetchall()
+            if not rows:
+                break
+            index.add([row[0] for row in rows], [row[1] for row in rows], [row[2] for row in rows])
+            after = rows[-1][0]
+
+    def get_turns(self, ids: list[int], session_id: str = None) -> List[Turn]:
+        """Returns the stored turns with these ids, in the given order; ids no longer stored are skipped.
+
+        With session_id, turns of any other session are skipped too.
+        """
+        if not ids:
+            return []
+        query = f"SELECT id, agent, role, content FROM messages WHERE id IN ({','.join('?' * len(ids))})"
+        params = list(ids)
+        if session_id is not None:
+            # Unary + keeps the planner on the id lookup instead of walking the session's index
+            query += " AND +session_id = ?"
+            params.append(session_id)
+        with self.lock, metrics.timer("sqlite_op_seconds", op="get_turns"):
+            rows = self.conn.execute(query, params).fetchall()
+        found = {row[0]: Turn._make(row) for row in rows}
+        return [found[turn_id] for turn_id in ids if turn_id in found]
+
+    def related(self, text: str, k: int = RECALL_TOP_K, exclude=(), session_id: str = None) -> List[Turn]:
+        """Returns up to k stored turns most similar to text; best first.
+
+        Only turns of session_id are searched when it is given, and turns of
+        any session otherwise. Empty until the recall index is open (or
+        without NumPy). Turns whose ids are in `exclude` are skipped.
+        """
+        if self.recall is None or not text:
+            return []
+        with metrics.timer("recall_query_seconds"):
+            hits = self.recall.search([text], k, exclude, session=session_id)[0]
+        # Tags are hashes, so the store has the final say on which session a turn belongs to
+        return self.get_turns([turn_id for turn_id, _ in hits], session_id)
+
+    def close(self):
+        if self._recall_opener is not None:
+            self._recall_opener.cancel()
+        with self.lock:
+            if self._closed:
+                return
+            self._flush_locked()
+            self._closed = True
+            self._wakeup.notify_all()
+        self._flusher.join()
+        with self._recall_lock:
+            if self.recall is not None:
+                self.recall.close()
+        self.conn.close()
+
+
+atexit.register(ChatMemory.close_all)
@@ -0,0 +1,408 @@
+# justice_agents/recall.py
+"""Semantic recall of earlier turns from a local vector index.
+
+Every stored message gets a hashed bag-of-words embedding: words are hashed
+into RECALL_DIM signed buckets, weighted by log term frequency and
+L2-normalised, so a dot product is a cosine similarity. No model and no
+vocabulary are needed, and a message's vector never changes once written;
+queries are weighted by each bucket's inverse document frequency, kept as
+a running count, so rare words decide the match.
+Vectors are stored as int8 (scaled by 127) in a matrix memory-mapped beside
+the database, and grow with every ChatMemory flush.
+
+Small indexes are searched exactly. From RECALL_TRAIN_ROWS rows on, a
+spherical k-means over a sample splits the rows into RECALL_LISTS lists
+(an inverted-file index); the k-means runs on IDF-weighted rows, so lists
+follow topics rather than common words. A query scans the lists whose centroids are
+nearest to it until it has about RECALL_CANDIDATES rows, so its cost is
+bounded by that budget rather than by the size of the index, and top-k
+stays under a millisecond at 100k+ rows. Every row also carries a 64-bit
+tag of its session, and the rows of each session are kept in their own
+posting, so a search confined to one session only ever touches that
+session's rows, within the same candidate budget. NumPy is optional: without it recall is off and agents get the
+plain recent window.
+"""
+import hashlib
+import importlib.util
+import os
+import re
+import shutil
+import threading
+import zlib
+from math import log
+
+from config import RECALL_CANDIDATES, RECALL_DIM, RECALL_LISTS, RECALL_MIN_SCORE, RECALL_TRAIN_ROWS
+
+# Imported on first use: NumPy costs ~100 ms, which the GUI's cold start should not pay
+np = None
+
+_WORD = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+_STOPWORDS = frozenset("""
+a an and are as at be been but by can do does for from had has have he her his i if in is it its me my no not
+of on or our she so than that the their them then there they this to us was we were what when which who will
+with would you your
+""".split())
+# Stored vectors are unit vectors scaled to int8: a quarter of float32's
+# size, and much cheaper than float16 to widen for a search
+_SCALE = 127.0
+# Rows embedded for the k-means sample, and rows allocated when the index is created
+_TRAIN_SAMPLE = 8192
+_INITIAL_CAPACITY = 4096
+_TRAIN_ITERATIONS = 8
+
+
+def recall_available() -> bool:
+    """True if NumPy is installed; checked without importing it."""
+    return importlib.util.find_spec("numpy") is not None
+
+
+def _numpy():
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+    return np
+
+
+def _features(text: str, dim: int):
+    """Yields (bucket, weight) for each distinct content word of text."""
+    counts = {}
+    for word in _WORD.findall(text.lower()):
+        if len(word) > 1 and word not in _STOPWORDS:
+            counts[word] = counts.get(word, 0) + 1
+    for word, count in counts.items():
+        digest = zlib.crc32(word.encode())
+        # The top bit signs the weight, so bucket collisions cancel out on average
+        yield digest % dim, (1.0 + log(count)) * (1.0 if digest & 0x80000000 else -1.0)
+
+
+def embed(texts: list[str], dim: int = RECALL_DIM):
+    """Returns unit-length hashed embeddings, one float32 row per text."""
+    _numpy()
+    vectors = np.zeros((len(texts), dim), np.float32)
+    for row, text in enumerate(texts):
+        for bucket, weight in _features(text, dim):
+            vectors[row, bucket] += weight
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors
+
+
+def session_tag(session_id: str) -> int:
+    """The 64-bit tag a session's rows carry in the index."""
+    return int.from_bytes(hashlib.blake2b(session_id.encode("utf-8"), digest_size=8).digest(), "little", signed=True)
+
+
+def _kmeans(sample, k: int, iterations: int = _TRAIN_ITERATIONS):
+    """Spherical k-means: unit-length centroids, rows assigned by cosine."""
+    rng = np.random.default_rng(0)
+    centroids = sample[rng.choice(len(sample), k, replace=False)]
+    for _ in range(iterations):
+        assigned = np.argmax(sample @ centroids.T, axis=1)
+        members = np.zeros((len(sample), k), np.float32)
+        members[np.arange(len(sample)), assigned] = 1.0
+        sums = members.T @ sample
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        # A list that lost all its rows keeps its old centroid
+        centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+    return centroids.astype(np.float32)
+
+
+class RecallIndex:
+    """Memory-mapped embeddings of stored messages, searchable by cosine similarity.
+
+    Rows are keyed by message id. `discard` and `discard_below` hide rows
+    the memory has pruned; they are dropped for good the next time the
+    matrix is resized.
+    """
+    def __init__(self, path: str, dim: int = RECALL_DIM, lists: int = RECALL_LISTS,
+                 candidates: int = RECALL_CANDIDATES, train_rows: int = RECALL_TRAIN_ROWS):
+        _numpy()
+        self.path = path
+        self.dim = dim
+        self.lists = lists
+        self.candidates = candidates
+        self.train_rows = train_rows
+        self.lock = threading.RLock()
+        self._train_lock = threading.Lock()
+        self.floor = 0
+        # Bumped whenever rows are dropped or moved, so a training pass can tell its row numbers went stale
+        self.generation = 0
+        os.makedirs(path, exist_ok=True)
+        try:
+            self._open()
+        except (OSError, ValueError):
+            self._reset()
+        if self.vectors.shape[1] != dim:
+            self._reset()
+
+    # --- Storage ---
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _open(self):
+        self.maps = [np.lib.format.open_memmap(self._file(name), mode="r+")
+                     for name in ("vectors.npy", "ids.npy", "lists.npy", "sessions.npy")]
+        # Plain ndarray views of the maps: indexing the memmap subclass costs more than the scan
+        self.vectors, self.ids, self.assigned, self.tags = (array.view(np.ndarray) for array in self.maps)
+        # Message ids start at 1, so the first zero id marks the end of the rows
+        empty = np.flatnonzero(self.ids == 0)
+        self.count = int(empty[0]) if len(empty) else len(self.ids)
+        # Rows with a nonzero weight in each bucket, for the query-side IDF
+        self.df = np.lib.format.open_memmap(self._file("df.npy"), mode="r+")
+        if os.path.exists(self._file("router.npy")):
+            self.centroids = np.load(self._file("centroids.npy"))
+            self.router = np.load(self._file("router.npy"))
+        else:
+            self.centroids = self.router = None
+        self.trained_rows = self.count
+        self._index_lists()
+        self._index_sessions()
+
+    def _reset(self):
+        """Starts over with an empty index, e.g. after the embedding width changed."""
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.makedirs(self.path, exist_ok=True)
+        self._write(_INITIAL_CAPACITY, None)
+        np.save(self._file("df.npy"), np.zeros(self.dim, np.int64))
+        self.centroids = self.router = None
+        self._open()
+
+    def _write(self, capacity: int, keep):
+        """Rewrites the four matrices at `capacity`, keeping rows `keep` (None for none)."""
+        kept = 0 if keep is None else len(keep)
+        for name, attribute, dtype, width, fill in (("vectors.npy", "vectors", np.int8, (self.dim,), 0),
+                                                    ("ids.npy", "ids", np.int64, (), 0),
+                                                    ("lists.npy", "assigned", np.int16, (), -1),
+                                                    ("sessions.npy", "tags", np.int64, (), 0)):
+            scratch = self._file(name + ".tmp")
+            array = np.lib.format.open_memmap(scratch, mode="w+", dtype=dtype, shape=(capacity, *width))
+            if kept:
+                array[:kept] = getattr(self, attribute)[keep]
+            array[kept:] = fill
+            array.flush()
+            del array
+            os.replace(scratch, self._file(name))
+
+    def _reserve(self, extra: int):
+        """Makes room for `extra` more rows, dropping discarded ones before growing."""
+        if self.count + extra <= len(self.ids):
+            return
+        keep = np.flatnonzero(self.ids[:self.count] >= max(1, self.floor))
+        capacity = len(self.ids)
+        while len(keep) + extra > capacity * 3 // 4:
+            capacity *= 2
+        moved, trained_rows = len(keep) < self.count, self.trained_rows
+        self._write(capacity, keep)
+        self._open()
+        self.trained_rows = trained_rows
+        if moved:
+            self.generation += 1
+
+    def _index_lists(self):
+        """Groups row numbers by list, for scanning only the probed lists."""
+        self.postings = []
+        self.pending = {}
+        if self.centroids is None:
+            self.sizes = np.zeros(0, np.int64)
+            return
+        assigned = self.assigned[:self.count]
+        order = np.argsort(assigned, kind="stable")
+        bounds = np.searchsorted(assigned[order], np.arange(len(self.centroids) + 1))
+        self.postings = [order[bounds[i]:bounds[i + 1]] for i in range(len(self.centroids))]
+        self.sizes = np.diff(bounds)
+
+    def _posting(self, number: int):
+        rows = self.pending.pop(number, None)
+        if rows:
+            self.postings[number] = np.concatenate([self.postings[number], np.asarray(rows, np.int64)])
+        return self.postings[number]
+
+    def _index_sessions(self):
+        """Groups row numbers by session tag, for searches confined to one session."""
+        self.session_pending = {}
+        tags = self.tags[:self.count]
+        order = np.argsort(tags, kind="stable")
+        unique, starts = np.unique(tags[order], return_index=True)
+        self.session_postings = dict(zip(unique.tolist(), np.split(order, starts[1:]))) if self.count else {}
+
+    def _session_posting(self, tag: int):
+        rows = self.session_pending.pop(tag, None)
+        posting = self.session_postings.get(tag, np.zeros(0, np.int64))
+        if rows:
+            posting = self.session_postings[tag] = np.concatenate([posting, np.asarray(rows, np.int64)])
+        return posting
+
+    @property
+    def last_id(self) -> int:
+        with self.lock:
+            return max(0, int(np.abs(self.ids[:self.count]).max())) if self.count else 0
+
+    # --- Writes ---
+
+    def add(self, ids: list[int], texts: list[str], sessions: list[str]):
+        """Embeds and appends messages of the given sessions; called by ChatMemory as it commits them."""
+        if not ids:
+            return
+        vectors = embed(texts, self.dim)
+        tags = [session_tag(session_id) for session_id in sessions]
+        with self.lock:
+            self._reserve(len(ids))
+            start, end = self.count, self.count + len(ids)
+            self.vectors[start:end] = np.rint(vectors * _SCALE)
+            self.tags[start:end] = tags
+            for row, tag in zip(range(start, end), tags):
+                self.session_pending.setdefault(tag, []).append(row)
+            self.df += np.count_nonzero(vectors, axis=0)
+            if self.centroids is not None:
+                lists = np.argmax(vectors @ self.router.T, axis=1)
+                self.assigned[start:end] = lists
+                for row, number in zip(range(start, end), lists.tolist()):
+                    self.pending.setdefault(number, []).append(row)
+                self.sizes += np.bincount(lists, minlength=len(self.sizes))
+            # Ids last: a row only counts once its vector is in place
+            self.ids[start:end] = ids
+            self.count = end
+            due = self.count >= self.train_rows and (
+                self.centroids is None or self.count >= 4 * self.trained_rows)
+        if due and not self._train_lock.locked():
+            threading.Thread(target=self.train, name="recall-train", daemon=True).start()
+
+    def discard(self, ids):
+        """Hides the rows of these message ids (deleted from the store).
+
+        Their ids are negated, which search treats like ids below the floor;
+        the rows are dropped for good the next time the matrix is resized.
+        """
+        with self.lock:
+            rows = np.flatnonzero(np.isin(self.ids[:self.count], np.fromiter(ids, np.int64)))
+            self.ids[rows] = -self.ids[rows]
+
+    def discard_below(self, min_id: int):
+        """Hides every row whose message id is below min_id (pruned from the store)."""
+        with self.lock:
+            self.floor = max(self.floor, min_id)
+
+    def clear(self):
+        with self.lock:
+            self._reset()
+            self.floor = 0
+            self.generation += 1
+
+    def _idf(self):
+        return (np.log((1.0 + self.count) / (1.0 + self.df)) + 1.0).astype(np.float32)
+
+    def train(self):
+        """Fits the list centroids to a sample of the rows and reassigns every row.
+
+        Runs on a background thread as the index grows; searches meanwhile
+        use the previous lists (or an exact scan).
+        """
+        with self._train_lock:
+            with self.lock:
+                count, generation = self.count, self.generation
+                if count < 2:
+                    return
+                rows = np.random.default_rng(count).choice(count, min(count, _TRAIN_SAMPLE), replace=False)
+                sample = self.vectors[np.sort(rows)].astype(np.float32) * self._idf()
+                idf = self._idf()
+            sample /= np.maximum(np.linalg.norm(sample, axis=1, keepdims=True), 1e-12)
+            centroids = _kmeans(sample, min(self.lists, len(sample) // 8 or 1))
+            # A row's norm does not change which centroid it is nearest to, so
+            # stored rows are routed by their IDF-weighted form without rescaling them
+            router = centroids * idf
+            assigned = np.empty(count, np.int16)
+            for start in range(0, count, _TRAIN_SAMPLE):
+                with self.lock:
+                    if self.generation != generation:
+                        return
+                    chunk = self.vectors[start:min(count, start + _TRAIN_SAMPLE)].astype(np.float32)
+                assigned[start:start + len(chunk)] = np.argmax(chunk @ router.T, axis=1)
+            with self.lock:
+                if self.generation != generation:
+                    return
+                self.assigned[:count] = assigned
+                if self.count > count:
+                    late = self.vectors[count:self.count].astype(np.float32)
+                    self.assigned[count:self.count] = np.argmax(late @ router.T, axis=1)
+                self.centroids, self.router = centroids, router
+                np.save(self._file("centroids.npy"), centroids)
+                np.save(self._file("router.npy"), router)
+                self.trained_rows = self.count
+                self._index_lists()
+
+    # --- Search ---
+
+    def search(self, queries: list[str], k: int, exclude=(), min_score: float = RECALL_MIN_SCORE,
+               session: str = None):
+        """Returns, per query, up to k (message_id, score) pairs, best first.
+
+        A batch shares one embedding pass and one routing product; an exact
+        scan (before the lists are fitted) also shares the pass over the
+        rows. Ids in `exclude` (e.g. turns already in the prompt) are never
+        returned. With `session`, only that session's rows are searched:
+        all of them if they fit the candidate budget, otherwise those in
+        the lists nearest the query.
+        """
+        if not queries:
+            return []
+        vectors = embed(queries, self.dim)
+        with self.lock:
+            if not self.count:
+                return [[] for _ in queries]
+            vectors *= self._idf()
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            np.divide(vectors, norms, out=vectors, where=norms > 0)
+            if session is not None:
+                columns = self._session_columns(vectors, self._session_posting(session_tag(session)))
+            elif self.centroids is None:
+                ids = self.ids[:self.count].copy()
+                scores = self.vectors[:self.count].astype(np.float32) @ (vectors.T / _SCALE)
+                columns = [(ids, column) for column in scores.T]
+            else:
+                columns = []
+                for vector, nearness in zip(vectors, vectors @ self.centroids.T):
+                    # Nearest lists first, until the candidate budget is spent
+                    ranked = np.argsort(-nearness)
+                    taken = np.searchsorted(np.cumsum(self.sizes[ranked]), self.candidates, side="right")
+                    rows = np.concatenate([self._posting(number) for number in ranked[:max(1, taken)].tolist()])
+                    columns.append((self.ids[rows], self.vectors[rows].astype(np.float32) @ (vector / _SCALE)))
+            floor = self.floor
+        excluded = np.fromiter(exclude, np.int64) if exclude else None
+        return [self._top(ids, scores, k, floor, excluded, min_score) for ids, scores in columns]
+
+    def _session_columns(self, vectors, rows):
+        """Scores one session's rows against each query, spending at most the candidate budget."""
+        if len(rows) <= self.candidates or self.centroids is None:
+            ids = self.ids[rows]
+            scores = self.vectors[rows].astype(np.float32) @ (vectors.T / _SCALE)
+            return [(ids, column) for column in scores.T]
+        lists = self.assigned[rows]
+        columns = []
+        for vector, nearness in zip(vectors, vectors @ self.centroids.T):
+            # The session's rows in the nearest lists, until the candidate budget is spent
+            rank = np.empty(len(nearness), np.int64)
+            rank[np.argsort(-nearness)] = np.arange(len(nearness))
+            row_rank = rank[lists]
+            cutoff = np.searchsorted(np.cumsum(np.bincount(row_rank, minlength=len(nearness))),
+                                     self.candidates, side="right")
+            chosen = rows[row_rank < max(1, cutoff)]
+            columns.append((self.ids[chosen], self.vectors[chosen].astype(np.float32) @ (vector / _SCALE)))
+        return columns
+
+    @staticmethod
+    def _top(ids, scores, k: int, floor: int, excluded, min_score: float) -> list[tuple[int, float]]:
+        # Discarded rows carry negated ids
+        hidden = ids < max(1, floor)
+        if excluded is not None:
+            hidden |= np.isin(ids, excluded)
+        scores[hidden] = -1.0
+        top = np.argpartition(-scores, k)[:k] if len(scores) > k else np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        return [(int(ids[i]), float(scores[i])) for i in top if scores[i] >= min_score]
+
+    def close(self):
+        with self.lock:
+            for array in (*self.maps, self.df):
+                array.flush()
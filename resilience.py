@@ -0,0 +1,174 @@
+# justice_agents/resilience.py
+"""Rate limiting, retry and circuit breaking for LLM calls.
+
+These are the building blocks ResilientBackend (see backends.py) puts
+around a backend: a token bucket shared by every caller of one API key and
+model, jittered exponential backoff for transient errors, and a circuit
+breaker that fails fast while the service is down. A call that cannot get
+a token in time fails with RateLimited rather than queueing without end.
+"""
+import random
+import threading
+import time
+
+from config import (BREAKER_FAILURES, BREAKER_RESET_SECONDS, RATE_LIMIT_BURST, RATE_LIMIT_PER_SECOND,
+                    RETRY_BASE_DELAY, RETRY_MAX_DELAY)
+
+# HTTP statuses worth retrying, and the exception class names google.api_core uses for them
+_TRANSIENT_CODES = {408, 429, 500, 502, 503, 504}
+_TRANSIENT_NAMES = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "DeadlineExceeded",
+    "InternalServerError", "BadGateway", "GatewayTimeout", "Aborted",
+}
+_THROTTLE_NAMES = {"ResourceExhausted", "TooManyRequests"}
+
+
+def _code(error: Exception):
+    code = getattr(error, "code", None)
+    return code if isinstance(code, int) else None
+
+
+def is_throttle(error: Exception) -> bool:
+    """True for quota and rate-limit errors."""
+    return type(error).__name__ in _THROTTLE_NAMES or _code(error) == 429
+
+
+def is_transient(error: Exception) -> bool:
+    """True for errors a later attempt may not hit: timeouts, overload, 5xx."""
+    return (
+        isinstance(error, (TimeoutError, ConnectionError))
+        or type(error).__name__ in _TRANSIENT_NAMES
+        or _code(error) in _TRANSIENT_CODES
+    )
+
+
+def backoff_delay(attempt: int, base: float = RETRY_BASE_DELAY, cap: float = RETRY_MAX_DELAY) -> float:
+    """Full-jitter exponential backoff, so retrying callers spread out instead of stampeding."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class TokenBucket:
+    """Thread-safe token bucket whose rate adapts to throttling.
+
+    Each throttle halves the refill rate, and each success wins back a
+    twentieth of the configured rate, so callers settle just under the quota
+    the service actually grants.
+    """
+    def __init__(self, rate: float = RATE_LIMIT_PER_SECOND, burst: int = RATE_LIMIT_BURST,
+                 min_rate: float = None):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate or rate / 16
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self) -> bool:
+        """Takes a token if one is available right now."""
+        with self.lock:
+            self._refill(time.monotonic())
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def acquire(self, timeout: float = None) -> bool:
+        """Waits for a token; returns False if none arrived within timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if deadline is not None:
+                if now >= deadline:
+                    return False
+                wait = min(wait, deadline - now)
+            time.sleep(wait)
+
+    def configure(self, rate: float, burst: int = RATE_LIMIT_BURST):
+        """Sets the quota the bucket recovers to, e.g. from a command-line flag."""
+        with self.lock:
+            self._refill(time.monotonic())
+            self.max_rate = self.rate = rate
+            self.min_rate = rate / 16
+            self.burst = max(1, burst)
+            self.tokens = min(self.tokens, self.burst)
+
+    def throttle(self):
+        with self.lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+
+    def recover(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def rate_limiter(key: str, model: str, rate: float = RATE_LIMIT_PER_SECOND,
+                 burst: int = RATE_LIMIT_BURST) -> TokenBucket:
+    """Returns the bucket shared by every caller of one (API key, model) pair."""
+    with _limiters_lock:
+        bucket = _limiters.get((key, model))
+        if bucket is None:
+            bucket = _limiters[(key, model)] = TokenBucket(rate, burst)
+        return bucket
+
+
+class RateLimited(RuntimeError):
+    """Raised when no rate-limit token arrived within the caller's deadline."""
+
+
+class CircuitOpen(RuntimeError):
+    """Raised instead of calling a service that keeps failing."""
+
+
+class CircuitBreaker:
+    """Closed until `failures` transient errors in a row, then open for `reset_seconds`.
+
+    After that one probe call is let through (half-open): success closes the
+    circuit and failure opens it again. A probe that never reports back is
+    replaced after another reset_seconds.
+    """
+    def __init__(self, failures: int = BREAKER_FAILURES, reset_seconds: float = BREAKER_RESET_SECONDS):
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failed = 0
+        self.opened_at = 0.0
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.state == "closed":
+                return True
+            now = time.monotonic()
+            if now - self.opened_at < self.reset_seconds:
+                return False
+            # Half-open: this caller is the probe, and the clock restarts for the next one
+            self.state = "half_open"
+            self.opened_at = now
+            return True
+
+    def success(self):
+        with self.lock:
+            self.state = "closed"
+            self.failed = 0
+
+    def failure(self):
+        with self.lock:
+            self.failed += 1
+            if self.state == "half_open" or self.failed >= self.failures:
+                self.state = "open"
+                self.opened_at = time.monotonic()
@@ -0,0 +1,455 @@
+# justice_agents/server.py
+"""Serves the Justice Council over HTTP and WebSocket for many concurrent users.
+
+    python server.py --port 8765 --backend fake
+
+HTTP (JSON bodies; message replies stream back as NDJSON):
+    GET  /health
+    GET  /agents
+    GET  /metrics                        Prometheus text (/metrics.json for JSON)
+    POST /sessions                       {"name": optional}
+    POST /sessions/<id>/messages         {"text": "...", "agents": [keys], "max_tokens": n}
+
+WebSocket at /ws: send {"text": "...", "session_id": optional, "agents": optional}
+and receive {"type": "session" | "chunk" | "done" | "error", ...} frames.
+
+Every user talks to their own session; the agents, the LLM backend with its
+client cache, the worker pool and the ChatMemory store are shared. A session
+id is its own access key, so ids are never listed. When the
+backend is saturated new messages are refused with 503 instead of queueing
+without bound.
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import sqlite3
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+from advocates import AdvocateRegistry, load_active_advocates
+from agent import CallCancelled, JusticeAgent
+from backends import BACKENDS, DEFAULT_CASSETTE, make_backend
+from cache import CACHE_MODES, ResponseCache
+from config import AGENTS, RATE_LIMIT_BURST, RATE_LIMIT_PER_SECOND
+from memory import ChatMemory
+from metrics import metrics
+from resilience import RateLimited
+
+_WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+# Requests larger than this are refused outright
+MAX_BODY_BYTES = 64 * 1024
+# Largest max_tokens a request may ask for; bigger values are clamped to it
+MAX_TOKENS_LIMIT = 1024
+# Threads for SQLite work, kept apart from the LLM pool so storage never waits behind model calls
+STORAGE_WORKERS = 4
+
+
+class Saturated(Exception):
+    """Raised when a message would exceed the backend's admission limit."""
+
+
+class HTTPError(Exception):
+    def __init__(self, status: HTTPStatus, message: str = None):
+        super().__init__(message or status.phrase)
+        self.status = status
+
+
+class CouncilServer:
+    def __init__(self, agents: dict, memory: ChatMemory, max_concurrency: int = 32,
+                 max_queue: int = 256, max_tokens: int = 100, make_agent=None,
+                 max_tokens_limit: int = MAX_TOKENS_LIMIT):
+        self.agents = agents
+        # Builds agents for `custom:<uid>` keys that are not seated yet, on first request
+        self.make_agent = make_agent
+        self.memory = memory
+        self.max_tokens = max_tokens
+        self.max_tokens_limit = max_tokens_limit
+        # Blocking LLM calls run here; the semaphore caps them, and admission
+        # control caps how many may wait behind it
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="serve")
+        # SQLite calls (sessions, messages, the advocate registry) never run on the event loop
+        self.storage = ThreadPoolExecutor(max_workers=STORAGE_WORKERS, thread_name_prefix="serve-db")
+        self.slots = asyncio.Semaphore(max_concurrency)
+        self.capacity = max_concurrency + max_queue
+        self.admitted = 0
+        # session id -> [lock, turns holding or waiting for it]
+        self.session_locks = {}
+
+    # --- Council ---
+
+    async def _db(self, function, *args):
+        """Runs a blocking storage call on the storage pool."""
+        return await asyncio.get_running_loop().run_in_executor(self.storage, function, *args)
+
+    def _message(self, request) -> tuple[str, list | None, int]:
+        """Validates a message request; returns (text, agent keys or None, max_tokens)."""
+        if not isinstance(request, dict):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "The message must be a JSON object.")
+        text = request.get("text")
+        if not isinstance(text, str) or not text:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "A non-empty 'text' is required.")
+        keys = request.get("agents")
+        if keys is not None and not (isinstance(keys, list) and all(isinstance(key, str) for key in keys)):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "'agents' must be a list of agent keys.")
+        max_tokens = request.get("max_tokens", self.max_tokens)
+        if max_tokens is None:
+            max_tokens = self.max_tokens
+        if isinstance(max_tokens, bool) or not isinstance(max_tokens, int):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "'max_tokens' must be an integer.")
+        # Clamped rather than refused: the cap bounds cost and the backend's client cache
+        return text, keys, min(max(1, max_tokens), self.max_tokens_limit)
+
+    async def _select(self, keys) -> list:
+        if not keys:
+            return list(self.agents.items())
+        unknown = [key for key in keys if key not in self.agents and not await self._load_advocate(key)]
+        if unknown:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"Unknown agent(s): {', '.join(unknown)}")
+        return [(key, self.agents[key]) for key in keys]
+
+    async def _load_advocate(self, key: str) -> bool:
+        """Adds the registry advocate named by a `custom:<uid>` key; False if there is none."""
+        if self.make_agent is None or not key.startswith("custom:"):
+            return False
+        profile = await self._db(lambda uid: AdvocateRegistry.shared().profile(uid), key.removeprefix("custom:"))
+        if profile is None:
+            return False
+        self.agents[key] = self.make_agent(profile)
+        return True
+
+    async def _stream_agent(self, key, agent, session_id, max_tokens, emit):
+        """Streams one agent's reply through emit(); runs the blocking generator on the pool."""
+        loop = asyncio.get_running_loop()
+        chunks = asyncio.Queue()
+        stop = threading.Event()
+        limited = False
+
+        def produce():
+            nonlocal limited
+            try:
+                for chunk in agent.stream_response(session_id, max_tokens=max_tokens, cancelled=stop.is_set):
+                    loop.call_soon_threadsafe(chunks.put_nowait, chunk)
+            except CallCancelled:
+                pass
+            except RateLimited:
+                limited = True
+            finally:
+                loop.call_soon_threadsafe(chunks.put_nowait, None)
+
+        queued = time.perf_counter()
+        async with self.slots:
+            metrics.observe("council_queue_wait_seconds", time.perf_counter() - queued, agent=agent.profile.name)
+            producer = loop.run_in_executor(self.executor, produce)
+            try:
+                while (chunk := await chunks.get()) is not None:
+                    await emit({"type": "chunk", "agent": key, "name": agent.profile.name, "text": chunk})
+                await producer
+            finally:
+                # A client that went away stops the call at its next chunk, and its reply is not stored
+                stop.set()
+        if limited:
+            # The API quota is the bottleneck, so the client hears the same thing as for a full server
+            await emit({"type": "error", "agent": key, "name": agent.profile.name,
+                        "error": "The council is at capacity; retry shortly.", "retry_after": 1})
+        await emit({"type": "done", "agent": key, "name": agent.profile.name})
+
+    async def converse(self, session_id: str, text: str, agent_keys=None, max_tokens: int = None, emit=None):
+        """Records the user's message and streams every selected agent's reply through emit()."""
+        selected = await self._select(agent_keys)
+        if self.admitted + len(selected) > self.capacity:
+            raise Saturated()
+        self.admitted += len(selected)
+        # One turn at a time per session; different sessions run in parallel. The lock is
+        # dropped only once no turn holds or awaits it, so a late arrival cannot get a fresh one
+        entry = self.session_locks.get(session_id)
+        if entry is None:
+            entry = self.session_locks[session_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                await self._db(self.memory.add, session_id, "User", "user", text)
+                await asyncio.gather(*(
+                    self._stream_agent(key, agent, session_id, max_tokens or self.max_tokens, emit)
+                    for key, agent in selected
+                ))
+        finally:
+            self.admitted -= len(selected)
+            entry[1] -= 1
+            if not entry[1]:
+                del self.session_locks[session_id]
+
+    # --- HTTP ---
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            method, path, headers, body = await self._read_request(reader)
+            if path == "/ws" and headers.get("upgrade", "").lower() == "websocket":
+                await self._websocket(reader, writer, headers)
+            else:
+                await self._route(method, path, body, writer)
+        except HTTPError as e:
+            await self._respond(writer, e.status, {"error": str(e)})
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        head = await reader.readuntil(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, path, _ = lines[0].split(" ", 2)
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST)
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            length = -1
+        if length < 0:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Content-Length must be a non-negative integer.")
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+        body = await reader.readexactly(length) if length else b""
+        return method, path.split("?", 1)[0], headers, body
+
+    @staticmethod
+    def _json_body(body: bytes) -> dict:
+        try:
+            request = json.loads(body) if body else {}
+        except json.JSONDecodeError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Body must be JSON.")
+        if not isinstance(request, dict):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Body must be a JSON object.")
+        return request
+
+    async def _respond(self, writer, status: HTTPStatus, payload, extra_headers: str = "",
+                       content_type: str = "application/json"):
+        data = payload.encode("utf-8") if isinstance(payload, str) else json.dumps(payload).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status.value} {status.phrase}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(data)}\r\n{extra_headers}Connection: close\r\n\r\n".encode("latin-1") + data
+        )
+        await writer.drain()
+
+    async def _route(self, method, path, body, writer):
+        parts = [p for p in path.split("/") if p]
+        if method == "GET" and parts == ["health"]:
+            return await self._respond(writer, HTTPStatus.OK, {"ok": True, "admitted": self.admitted})
+        if method == "GET" and parts == ["agents"]:
+            return await self._respond(writer, HTTPStatus.OK, [
+                {"key": key, "name": agent.profile.name} for key, agent in self.agents.items()
+            ])
+        if method == "GET" and parts == ["metrics"]:
+            return await self._respond(writer, HTTPStatus.OK, metrics.to_prometheus(),
+                                       content_type="text/plain; version=0.0.4")
+        if method == "GET" and parts == ["metrics.json"]:
+            return await self._respond(writer, HTTPStatus.OK, metrics.to_json())
+        if parts == ["sessions"] and method == "POST":
+            name = self._json_body(body).get("name")
+            if name is not None and not isinstance(name, str):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "'name' must be a string.")
+            try:
+                session_id = await self._db(self.memory.create_session, name)
+            except sqlite3.IntegrityError:
+                raise HTTPError(HTTPStatus.CONFLICT, "A session with that name already exists.")
+            return await self._respond(writer, HTTPStatus.CREATED, {"session_id": session_id})
+        if len(parts) == 3 and parts[0] == "sessions" and parts[2] == "messages" and method == "POST":
+            return await self._post_message(parts[1], self._json_body(body), writer)
+        raise HTTPError(HTTPStatus.NOT_FOUND)
+
+    async def _post_message(self, session_id, request, writer):
+        text, keys, max_tokens = self._message(request)
+        # By id only: a session id is its own access key, and names are guessable
+        if await self._db(self.memory.get_session, session_id) is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, "Unknown session.")
+        # Refused before any headers go out, so the client still gets a proper 503
+        if self.admitted + len(await self._select(keys)) > self.capacity:
+            return await self._respond(writer, HTTPStatus.SERVICE_UNAVAILABLE,
+                                       {"error": "The council is at capacity; retry shortly."}, "Retry-After: 1\r\n")
+
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+            b"Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n"
+        )
+
+        async def emit(event):
+            line = json.dumps(event).encode("utf-8") + b"\n"
+            writer.write(f"{len(line):x}\r\n".encode("latin-1") + line + b"\r\n")
+            # Waiting for the socket to drain slows producers down for slow readers
+            await writer.drain()
+
+        try:
+            await self.converse(session_id, text, keys, max_tokens, emit)
+        except Saturated:
+            await emit({"type": "error", "error": "The council is at capacity; retry shortly."})
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    # --- WebSocket ---
+
+    async def _websocket(self, reader, writer, headers):
+        key = headers.get("sec-websocket-key")
+        if not key:
+            raise HTTPError(HTTPStatus.BAD_REQUEST)
+        accept = base64.b64encode(hashlib.sha1((key + _WS_GUID).encode("latin-1")).digest()).decode("latin-1")
+        writer.write(
+            "HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n".encode("latin-1")
+        )
+        await writer.drain()
+
+        async def emit(event):
+            await self._ws_send(writer, json.dumps(event))
+
+        session_id = None
+        while True:
+            opcode, payload = await self._ws_receive(reader)
+            if opcode == 0x8:  # close
+                writer.write(self._ws_frame(0x8, payload[:2]))
+                await writer.drain()
+                return
+            if opcode == 0x9:  # ping
+                writer.write(self._ws_frame(0xA, payload))
+                await writer.drain()
+                continue
+            if opcode != 0x1:
+                continue
+            try:
+                request = json.loads(payload)
+            except json.JSONDecodeError:
+                await emit({"type": "error", "error": "Messages must be JSON."})
+                continue
+            if not isinstance(request, dict):
+                await emit({"type": "error", "error": "Messages must be JSON objects."})
+                continue
+            try:
+                if request.get("session_id") and request["session_id"] != session_id:
+                    if not isinstance(request["session_id"], str):
+                        raise HTTPError(HTTPStatus.BAD_REQUEST, "'session_id' must be a string.")
+                    if await self._db(self.memory.get_session, request["session_id"]) is None:
+                        await emit({"type": "error", "error": "Unknown session."})
+                        continue
+                    session_id = request["session_id"]
+                if session_id is None:
+                    name = request.get("name")
+                    if name is not None and not isinstance(name, str):
+                        raise HTTPError(HTTPStatus.BAD_REQUEST, "'name' must be a string.")
+                    try:
+                        session_id = await self._db(self.memory.create_session, name)
+                    except sqlite3.IntegrityError:
+                        raise HTTPError(HTTPStatus.CONFLICT, "A session with that name already exists.")
+                    await emit({"type": "session", "session_id": session_id})
+                if not request.get("text"):
+                    continue
+                await self.converse(session_id, *self._message(request), emit)
+            except Saturated:
+                await emit({"type": "error", "error": "The council is at capacity; retry shortly.", "retry_after": 1})
+            except HTTPError as e:
+                await emit({"type": "error", "error": str(e)})
+
+    @staticmethod
+    def _ws_frame(opcode: int, payload: bytes) -> bytes:
+        length = len(payload)
+        if length < 126:
+            header = struct.pack("!BB", 0x80 | opcode, length)
+        elif length < 1 << 16:
+            header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+        else:
+            header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+        return header + payload
+
+    async def _ws_send(self, writer, text: str):
+        writer.write(self._ws_frame(0x1, text.encode("utf-8")))
+        await writer.drain()
+
+    async def _ws_receive(self, reader):
+        """Reads one (possibly fragmented) client message; returns (opcode, payload)."""
+        message, message_opcode = b"", None
+        while True:
+            first, second = await reader.readexactly(2)
+            final, opcode = first & 0x80, first & 0x0F
+            length = second & 0x7F
+            if length == 126:
+                length = struct.unpack("!H", await reader.readexactly(2))[0]
+            elif length == 127:
+                length = struct.unpack("!Q", await reader.readexactly(8))[0]
+            if length > MAX_BODY_BYTES:
+                raise ConnectionError("WebSocket frame too large")
+            mask = await reader.readexactly(4) if second & 0x80 else b"\0\0\0\0"
+            data = bytes(b ^ mask[i % 4] for i, b in enumerate(await reader.readexactly(length)))
+            if opcode >= 0x8:
+                # Control frames may arrive between fragments and are handled at once
+                return opcode, data
+            if opcode:
+                message_opcode = opcode
+            message += data
+            if final:
+                return message_opcode, message
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8765):
+        server = await asyncio.start_server(self.handle, host, port, limit=MAX_BODY_BYTES)
+        async with server:
+            await server.serve_forever()
+
+
+def build_agents(cache=None, backend=None) -> dict:
+    """One shared agent per profile; all per-user state lives in the session.
+
+    Only the seated advocates are built up front; any other registry advocate
+    is loaded when a request first names it.
+    """
+    agents = {key: JusticeAgent(profile, cache=cache, backend=backend) for key, profile in AGENTS.items()}
+    for uid, profile in load_active_advocates():
+        agents[f"custom:{uid}"] = JusticeAgent(profile, cache=cache, backend=backend)
+    return agents
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the Justice Council over HTTP and WebSocket.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max_concurrency", type=int, default=32, help="LLM calls running at once.")
+    parser.add_argument("--max_queue", type=int, default=256, help="LLM calls allowed to wait before new messages are refused.")
+    parser.add_argument("--max_tokens", type=int, default=100, help="Default maximum tokens per reply.")
+    parser.add_argument("--max_tokens_limit", type=int, default=MAX_TOKENS_LIMIT, help="Largest max_tokens a request may ask for; bigger values are clamped.")
+    parser.add_argument("--backend", choices=BACKENDS, default="gemini", help="LLM backend.")
+    parser.add_argument("--cassette", default=DEFAULT_CASSETTE, help="Cassette file for the record and replay backends.")
+    parser.add_argument("--hedge_after", type=float, default=None, help="Seconds before a slow Gemini call gets a hedged duplicate request (off by default).")
+    parser.add_argument("--rate_limit", type=float, default=RATE_LIMIT_PER_SECOND, help="Gemini requests per second allowed for this API key; throttled calls recover up to this rate.")
+    parser.add_argument("--rate_burst", type=int, default=RATE_LIMIT_BURST, help="Gemini requests allowed at once on top of --rate_limit.")
+    parser.add_argument("--cache", choices=CACHE_MODES, default="off", help="Response cache mode.")
+    args = parser.parse_args()
+
+    cache = ResponseCache(mode=args.cache) if args.cache != "off" else None
+    backend = make_backend(args.backend, args.cassette, hedge_after=args.hedge_after,
+                           rate_limit=args.rate_limit, rate_burst=args.rate_burst)
+    # Sessions belong to different users, so turns are recalled from their own session only;
+    # opened before the agents share it
+    memory = ChatMemory.shared(recall_scope="session")
+    agents = build_agents(cache, backend)
+
+    async def run():
+        server = CouncilServer(agents, memory, args.max_concurrency, args.max_queue, args.max_tokens,
+                               make_agent=lambda profile: JusticeAgent(profile, cache=cache, backend=backend),
+                               max_tokens_limit=args.max_tokens_limit)
+        print(f"Justice Council listening on http://{args.host}:{args.port}")
+        await server.serve(args.host, args.port)
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
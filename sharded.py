@@ -0,0 +1,224 @@
+# justice_agents/sharded.py
+"""Batch runs spread over several processes, for very large scenario sweeps.
+
+    python sharded.py scenarios.jsonl --out results.jsonl --processes 8 --workers 8
+
+Takes the same scenario files and agent selection as batch.py. Scenarios
+are handed out in chunks to a pool of worker processes, so prompt
+building, JSON encoding and SQLite writes no longer share one GIL. Each
+process answers its chunks with its own threads (--workers each), against
+its own memory shard (batch_memory.shard-<n>.db next to --db). The shards
+are merged into --db at the end.
+
+Results are written in input order: scenario by scenario, and in the
+order of --agents within each scenario. The output is therefore the same
+for any number of processes. Progress and throughput go to stderr every
+--progress_every seconds.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from itertools import islice
+
+from agent import JusticeAgent
+from backends import BACKENDS, DEFAULT_CASSETTE, make_backend
+from batch import BATCH_DB_PATH, read_scenarios, run_job, select_profiles
+from cache import CACHE_MODES, ResponseCache
+from config import RATE_LIMIT_BURST, RATE_LIMIT_PER_SECOND
+from memory import ChatMemory
+
+# Scenarios per chunk: big enough to amortise the trip to a worker, small
+# enough that a chunk waiting on a slow reply holds up little output
+DEFAULT_CHUNK_SIZE = 64
+PROGRESS_INTERVAL = 10.0
+
+
+def shard_path(db_path: str, number: int) -> str:
+    """The memory shard used by worker `number`, e.g. batch_memory.shard-3.db."""
+    stem, ext = os.path.splitext(db_path)
+    return f"{stem}.shard-{number}{ext or '.db'}"
+
+
+def remove_shard(path: str):
+    for name in (path, path + "-wal", path + "-shm"):
+        if os.path.exists(name):
+            os.remove(name)
+
+
+def iter_chunks(scenarios, size: int):
+    """Yields (chunk_index, [(scenario_id, prompt), ...]) in input order."""
+    scenarios = iter(scenarios)
+    index = 0
+    while chunk := list(islice(scenarios, size)):
+        yield index, chunk
+        index += 1
+
+
+# --- Worker processes ---
+
+class _Shard:
+    """Per-process state of a sharded run: its agents, memory shard and thread pool."""
+    def __init__(self, number: int, options: dict):
+        self.number = number
+        self.db_path = shard_path(options["db"], number)
+        self.max_tokens = options["max_tokens"]
+        self.keep_sessions = options["keep_sessions"]
+        # Shards are scratch stores: nothing would ever query a recall index built here
+        self.memory = ChatMemory.shared(self.db_path, recall=False)
+        cache = ResponseCache(mode=options["cache"]) if options["cache"] != "off" else None
+        # Every process has its own bucket, so each gets an even share of the API key's quota
+        backend = make_backend(options["backend"], options["cassette"], hedge_after=options["hedge_after"],
+                               rate_limit=options["rate_limit"] / options["processes"],
+                               rate_burst=max(1, options["rate_burst"] // options["processes"]),
+                               **options["backend_options"])
+        self.agents = {key: JusticeAgent(profile, db_path=self.db_path, cache=cache, backend=backend)
+                       for key, profile in options["profiles"].items()}
+        self.pool = ThreadPoolExecutor(max_workers=options["workers"], thread_name_prefix=f"shard{number}")
+
+    def run(self, scenarios) -> bytes:
+        jobs = [(agent, key, scenario_id, prompt)
+                for scenario_id, prompt in scenarios for key, agent in self.agents.items()]
+        # map() yields in submission order, so the chunk comes back already sorted
+        records = self.pool.map(lambda job: run_job(*job, self.max_tokens, self.keep_sessions), jobs)
+        payload = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+        # Worker processes exit without running atexit hooks, so nothing may stay buffered
+        self.memory.flush()
+        return payload.encode("utf-8")
+
+
+_shard = None
+
+
+def _start_worker(counter, options: dict):
+    global _shard
+    with counter.get_lock():
+        number = counter.value
+        counter.value += 1
+    _shard = _Shard(number, options)
+
+
+def _run_chunk(index: int, scenarios) -> tuple[int, bytes, int]:
+    return index, _shard.run(scenarios), len(scenarios) * len(_shard.agents)
+
+
+# --- Coordinator ---
+
+def _report(done: int, total: int | None, started: float):
+    elapsed = time.perf_counter() - started
+    rate = done / elapsed if elapsed else 0.0
+    if total:
+        eta = (total - done) / rate if rate else float("inf")
+        print(f"{done:,}/{total:,} replies ({done / total:.1%})  {rate:,.0f}/s  ETA {eta / 60:,.1f} min",
+              file=sys.stderr)
+    else:
+        print(f"{done:,} replies  {rate:,.0f}/s", file=sys.stderr)
+
+
+def run_sharded(scenarios, profiles: dict, out_path: str, options: dict, processes: int = None,
+                chunk_size: int = DEFAULT_CHUNK_SIZE, total: int = None,
+                progress_every: float = PROGRESS_INTERVAL) -> int:
+    """Runs every (scenario, profile) job over a process pool; returns the number written.
+
+    `options` configures each worker (see main). Chunks finish in any
+    order but are written to out_path in input order. Once the pool is
+    done, the memory shards are merged into options["db"].
+    """
+    processes = max(1, processes or os.cpu_count() or 1)
+    options = dict(options, profiles=profiles, processes=processes)
+    shards = [shard_path(options["db"], number) for number in range(processes)]
+    for path in shards:
+        remove_shard(path)
+
+    chunks = iter_chunks(scenarios, chunk_size)
+    # Chunks may run ahead of the oldest unwritten one by this much, which bounds the reorder buffer
+    window = processes * 4
+    ready = {}
+    next_index = next_write = written = 0
+    started = last_report = time.perf_counter()
+    # Spawned workers start clean, instead of forking this process mid-flight
+    context = multiprocessing.get_context("spawn")
+    counter = context.Value("i", 0)
+    with open(out_path, "wb") as out, \
+            ProcessPoolExecutor(max_workers=processes, mp_context=context,
+                                initializer=_start_worker, initargs=(counter, options)) as pool:
+        def submit():
+            nonlocal next_index
+            submitted = set()
+            for index, chunk in islice(chunks, max(0, next_write + window - next_index)):
+                submitted.add(pool.submit(_run_chunk, index, chunk))
+                next_index = index + 1
+            return submitted
+
+        pending = submit()
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, payload, count = future.result()
+                ready[index] = (payload, count)
+            while next_write in ready:
+                payload, count = ready.pop(next_write)
+                out.write(payload)
+                written += count
+                next_write += 1
+            out.flush()
+            pending |= submit()
+            if progress_every and time.perf_counter() - last_report >= progress_every:
+                _report(written, total, started)
+                last_report = time.perf_counter()
+
+    memory = ChatMemory.shared(options["db"], recall=False)
+    for path in shards:
+        if os.path.exists(path):
+            memory.merge(path)
+        remove_shard(path)
+    memory.close()
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run large scenario files through the Justice Council on several processes.")
+    parser.add_argument("scenarios", help="Path to a .jsonl or .csv file of scenarios.")
+    parser.add_argument("--out", default="results.jsonl", help="Output JSONL path.")
+    parser.add_argument("--agents", default="all", help="Comma-separated profile keys from config.AGENTS, or 'all'.")
+    parser.add_argument("--advocates", default="", help="Custom advocates to include: 'all', 'latest', 'active' or comma-separated uids or names.")
+    parser.add_argument("--processes", type=int, default=None, help="Worker processes (default: one per core).")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent agent calls within each process.")
+    parser.add_argument("--chunk_size", type=int, default=DEFAULT_CHUNK_SIZE, help="Scenarios handed to a worker at a time.")
+    parser.add_argument("--max_tokens", type=int, default=100, help="Maximum number of tokens for agent responses.")
+    parser.add_argument("--cache", choices=CACHE_MODES, default="off", help="Response cache mode.")
+    parser.add_argument("--backend", choices=BACKENDS, default="gemini", help="LLM backend.")
+    parser.add_argument("--cassette", default=DEFAULT_CASSETTE, help="Cassette file for the record and replay backends.")
+    parser.add_argument("--hedge_after", type=float, default=None, help="Seconds before a slow Gemini call gets a hedged duplicate request (off by default).")
+    parser.add_argument("--rate_limit", type=float, default=RATE_LIMIT_PER_SECOND, help="Gemini requests per second allowed for this API key; throttled calls recover up to this rate.")
+    parser.add_argument("--rate_burst", type=int, default=RATE_LIMIT_BURST, help="Gemini requests allowed at once on top of --rate_limit.")
+    parser.add_argument("--fake_latency", type=float, default=None, help="With --backend fake, make every call take exactly this many seconds (0 measures the council's own overhead).")
+    parser.add_argument("--db", default=BATCH_DB_PATH, help="Memory database the shards are merged into.")
+    parser.add_argument("--keep_sessions", action="store_true", help="Keep each job's session (and so merge it into --db) instead of deleting it once the reply is written.")
+    parser.add_argument("--progress_every", type=float, default=PROGRESS_INTERVAL, help="Seconds between progress reports on stderr (0 for none).")
+    args = parser.parse_args()
+
+    backend_options = {}
+    if args.backend == "fake" and args.fake_latency is not None:
+        backend_options = {"latency": args.fake_latency, "latency_jitter": 0.0, "tokens_per_second": float("inf")}
+    options = {
+        "db": args.db, "max_tokens": args.max_tokens, "keep_sessions": args.keep_sessions,
+        "workers": args.workers, "cache": args.cache, "backend": args.backend, "cassette": args.cassette,
+        "hedge_after": args.hedge_after, "rate_limit": args.rate_limit, "rate_burst": args.rate_burst,
+        "backend_options": backend_options,
+    }
+    profiles = select_profiles(args.agents, args.advocates)
+    total = sum(1 for _ in read_scenarios(args.scenarios)) * len(profiles)
+    start = time.perf_counter()
+    written = run_sharded(read_scenarios(args.scenarios), profiles, args.out, options,
+                          processes=args.processes, chunk_size=args.chunk_size, total=total,
+                          progress_every=args.progress_every)
+    elapsed = time.perf_counter() - start
+    print(f"Wrote {written} replies to {args.out} in {elapsed:.1f}s ({written / max(elapsed, 1e-9):,.0f} replies/s).")
+
+
+if __name__ == "__main__":
+    main()
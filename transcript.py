@@ -0,0 +1,84 @@
+# justice_agents/transcript.py
+import uuid
+from collections import OrderedDict, deque
+
+# Entries kept in RAM before the oldest are paged out to ChatMemory
+TRANSCRIPT_MAX_ENTRIES = 200
+# Entries moved per page-out or page-in
+TRANSCRIPT_PAGE = 50
+
+
+class Transcript:
+    """Append-mostly chat transcript with bounded memory use.
+
+    Entries are addressed by absolute index, like a list, but only the newest
+    `max_entries` stay in RAM. Older ones are written to ChatMemory a page at
+    a time and read back on demand, into a small LRU of recently viewed
+    pages, when the user scrolls up to them.
+    """
+    def __init__(self, memory=None, max_entries: int = TRANSCRIPT_MAX_ENTRIES, page: int = TRANSCRIPT_PAGE):
+        self.memory = memory
+        self.view_id = str(uuid.uuid4())
+        self.max_entries = max_entries
+        self.page = page
+        self.recent = deque()
+        # Absolute index of recent[0]; everything before it is paged out
+        self.first = 0
+        self.paged_in = OrderedDict()
+        # Bumped on every change so views can tell when to repaint
+        self.version = 0
+
+    def __len__(self):
+        return self.first + len(self.recent)
+
+    def _index(self, index: int) -> int:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("transcript index out of range")
+        return index
+
+    def append(self, text: str):
+        self.recent.append(text)
+        self.version += 1
+        if len(self.recent) > self.max_entries + self.page:
+            self._page_out()
+
+    def _page_out(self):
+        rows = [(self.first + i, self.recent.popleft()) for i in range(self.page)]
+        self.first += self.page
+        if self.memory is not None:
+            self.memory.save_transcript(self.view_id, rows)
+
+    def _page_in(self, index: int):
+        if self.memory is None:
+            return
+        start = index - index % self.page
+        for seq, text in self.memory.load_transcript(self.view_id, start, min(start + self.page, self.first)):
+            self.paged_in[seq] = text
+        while len(self.paged_in) > self.max_entries:
+            self.paged_in.popitem(last=False)
+
+    def __getitem__(self, index: int) -> str:
+        index = self._index(index)
+        if index >= self.first:
+            return self.recent[index - self.first]
+        if index not in self.paged_in:
+            self._page_in(index)
+        # Entries lost without a memory store, or pruned from it, read back as empty
+        if index not in self.paged_in:
+            return ""
+        self.paged_in.move_to_end(index)
+        return self.paged_in[index]
+
+    def __setitem__(self, index: int, text: str):
+        index = self._index(index)
+        self.version += 1
+        if index >= self.first:
+            self.recent[index - self.first] = text
+            return
+        # A long-running stream can outlive its entry's stay in RAM
+        if index in self.paged_in:
+            self.paged_in[index] = text
+        if self.memory is not None:
+            self.memory.save_transcript(self.view_id, [(index, text)])